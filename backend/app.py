@@ -1,32 +1,112 @@
+import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+
+# The project modules read their settings from the environment when imported,
+# so .env has to be loaded before any of them.
+load_dotenv()
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import FileResponse
 
+import db
+from db.writer import history_writer
+from llm.cache import result_cache
+from llm.similarity import NEAR_DUPLICATE_INDEX, near_duplicates
+from routers.profiling import LOOP_LAG_MONITOR, loop_monitor
 from routers.routes import api_router
+from routers.static import (
+    FRONTEND_WATCH,
+    Asset,
+    AssetIndex,
+    asset_response,
+    watch_frontend,
+)
+from routers.warmup import DB_MODULES, WARMUP_LLM, import_modules, warmup
+
+
+def warm_llm() -> None:
+    from llm.agent import TextAnalysisLangchain
+
+    # A throwaway agent also loads what the SDK imports on its first client; it
+    # makes no network call.
+    TextAnalysisLangchain(gemini_key="warm-up")
+
+
+async def warm_db() -> None:
+    await import_modules(DB_MODULES)
+    from db.cache_store import PostgresResultStore
+    from db.session import init_db
+
+    await asyncio.to_thread(init_db)
+    result_cache.store = PostgresResultStore()
+
+
+async def warm_near_duplicates() -> None:
+    # Lookups meanwhile only find what was analyzed since startup.
+    await warmup.settled("db")
+    from db.history_store import load_near_duplicates
+
+    await asyncio.to_thread(load_near_duplicates, near_duplicates)
 
-load_dotenv()
 
-app = FastAPI()
+def persist_history(rows: list[dict]) -> None:
+    # Rows queue up in memory until the schema is ready.
+    if not warmup.wait("db"):
+        raise RuntimeError("History storage is not ready.")
+    from db.history_store import insert_history_batch
+
+    insert_history_batch(rows)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    if LOOP_LAG_MONITOR:
+        loop_monitor.start()
+    # Startup only schedules the slow work, so the first request is served as
+    # soon as the app is imported; /api/ready reports when it is all done.
+    if WARMUP_LLM:
+        warmup.start("llm", lambda: asyncio.to_thread(warm_llm))
+    if NEAR_DUPLICATE_INDEX:
+        near_duplicates.start()
+    if db.is_configured():
+        warmup.start("db", warm_db)
+        if NEAR_DUPLICATE_INDEX:
+            warmup.start("near_duplicates", warm_near_duplicates)
+        history_writer.start(persist_history)
+    watcher = None
+    if FRONTEND_WATCH:
+        watcher = asyncio.create_task(
+            watch_frontend(FRONTEND_DIST_DIR, replace_frontend_assets)
+        )
+    yield
+    if watcher is not None:
+        watcher.cancel()
+        await asyncio.gather(watcher, return_exceptions=True)
+    # Persist analyses still waiting in the write-behind queue.
+    await history_writer.stop()
+    await warmup.stop()
+    await loop_monitor.stop()
+    await near_duplicates.stop()
+    if db.is_configured():
+        from db.session import async_engine
+
+        await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 FRONTEND_DIST_DIR = Path(__file__).resolve().parent / "frontend_dist"
-FRONTEND_INDEX_FILE = FRONTEND_DIST_DIR / "index.html"
-LONG_CACHE_SUFFIXES = {
-    ".js",
-    ".css",
-    ".png",
-    ".jpg",
-    ".jpeg",
-    ".gif",
-    ".ico",
-    ".svg",
-    ".webp",
-    ".avif",
-    ".woff",
-    ".woff2",
-}
+# Scanned once; requests are served from this in-memory index.
+frontend_assets = AssetIndex.scan(FRONTEND_DIST_DIR)
+
+
+def replace_frontend_assets(index: AssetIndex) -> None:
+    global frontend_assets
+    frontend_assets = index
+
 
 # FastAPI Documentation: CORS (Cross-Origin Resource Sharing)
 origins = [
@@ -49,32 +129,18 @@ app.add_middleware(GZipMiddleware, minimum_size=1000)
 app.include_router(api_router)
 
 
-def resolve_frontend_asset(path: str) -> Path | None:
-    if not FRONTEND_DIST_DIR.exists():
-        return None
-
-    candidate = (FRONTEND_DIST_DIR / path).resolve()
-    dist_root = FRONTEND_DIST_DIR.resolve()
-
-    if candidate == dist_root or dist_root not in candidate.parents:
-        return None
-
-    if candidate.is_file():
-        return candidate
-
-    return None
-
-
-def build_asset_response(asset: Path) -> FileResponse:
-    response = FileResponse(asset)
-    if asset.suffix.lower() in LONG_CACHE_SUFFIXES:
-        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
-    return response
+def frontend_response(asset: Asset, request: Request):
+    return asset_response(
+        asset,
+        accept_encoding=request.headers.get("accept-encoding"),
+        if_none_match=request.headers.get("if-none-match"),
+    )
 
 
 @app.get("/", include_in_schema=False)
-async def serve_frontend_index():
-    if not FRONTEND_INDEX_FILE.exists():
+async def serve_frontend_index(request: Request):
+    index = frontend_assets.index_html
+    if index is None:
         raise HTTPException(
             status_code=404,
             detail=(
@@ -83,24 +149,21 @@ async def serve_frontend_index():
             ),
         )
 
-    response = FileResponse(FRONTEND_INDEX_FILE)
-    response.headers["Cache-Control"] = "no-cache"
-    return response
+    return frontend_response(index, request)
 
 
 @app.get("/{full_path:path}", include_in_schema=False)
-async def serve_frontend_app(full_path: str):
-    asset = resolve_frontend_asset(full_path)
+async def serve_frontend_app(full_path: str, request: Request):
+    asset = frontend_assets.get(full_path)
     if asset:
-        return build_asset_response(asset)
+        return frontend_response(asset, request)
 
     # Missing asset-like paths should 404 instead of returning index.html.
     if Path(full_path).suffix:
         raise HTTPException(status_code=404, detail="Not found")
 
-    if FRONTEND_INDEX_FILE.exists():
-        response = FileResponse(FRONTEND_INDEX_FILE)
-        response.headers["Cache-Control"] = "no-cache"
-        return response
+    index = frontend_assets.index_html
+    if index is not None:
+        return frontend_response(index, request)
 
     raise HTTPException(status_code=404, detail="Not found")
@@ -0,0 +1,92 @@
+"""Accuracy and latency of the local detector against a labeled sample set.
+
+Run from ``backend/``::
+
+    python -m benchmarks.detector [--samples PATH] [--repeat N]
+"""
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+from llm.detector import LOCAL_DETECT_MIN_CONFIDENCE, detect_text
+
+DEFAULT_SAMPLES = Path(__file__).resolve().parent / "data" / "detector_samples.jsonl"
+
+
+def load_samples(path: Path) -> list[dict]:
+    with path.open(encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def run(samples: list[dict], repeat: int, min_confidence: float) -> dict:
+    latencies_ms: list[float] = []
+    correct = {"language": 0, "genre": 0, "correction_needed": 0}
+    confident = confident_correct = 0
+    misses: list[dict] = []
+
+    for sample in samples:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            detection = detect_text(sample["text"])
+            latencies_ms.append((time.perf_counter() - start) * 1000)
+
+        for field in correct:
+            if getattr(detection, field) == sample[field]:
+                correct[field] += 1
+
+        language_ok = detection.language == sample["language"]
+        correction_ok = detection.correction_needed == sample["correction_needed"]
+        if detection.confidence >= min_confidence:
+            confident += 1
+            confident_correct += language_ok and correction_ok
+        if not (language_ok and correction_ok):
+            misses.append(
+                {
+                    "expected": [sample["language"], sample["correction_needed"]],
+                    "got": [detection.language, detection.correction_needed],
+                    "confidence": detection.confidence,
+                    "text": sample["text"][:60],
+                }
+            )
+
+    total = len(samples)
+    return {
+        "samples": total,
+        "accuracy": {field: hits / total for field, hits in correct.items()},
+        "min_confidence": min_confidence,
+        "llm_skipped_share": confident / total,
+        "accuracy_when_skipped": confident_correct / confident if confident else None,
+        "latency_ms": {
+            "mean": statistics.fmean(latencies_ms),
+            "p50": percentile(latencies_ms, 50),
+            "p95": percentile(latencies_ms, 95),
+            "p99": percentile(latencies_ms, 99),
+        },
+        "misses": misses,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=Path, default=DEFAULT_SAMPLES)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument(
+        "--min-confidence", type=float, default=LOCAL_DETECT_MIN_CONFIDENCE
+    )
+    args = parser.parse_args()
+
+    report = run(load_samples(args.samples), args.repeat, args.min_confidence)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
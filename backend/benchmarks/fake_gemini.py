@@ -0,0 +1,202 @@
+"""Local stand-in for the Gemini REST API, for load tests.
+
+Answers the ``generateContent`` and ``streamGenerateContent`` calls the agent
+makes, with configurable latency (including a slow tail), streaming token rate
+and injected errors. Point the backend at it with ``GEMINI_BASE_URL``. Run from
+``backend/``::
+
+    FAKE_GEMINI_TOKENS_PER_SECOND=80 uvicorn benchmarks.fake_gemini:app --port 8090
+
+Requests are classified by what they ask for: a JSON response schema is a
+detection, the proofreading system prompt is a correction and anything else is
+an interpretation (streamed, or in one piece for the ``ainvoke`` fallback).
+"""
+
+import asyncio
+import json
+import os
+import random
+from dataclasses import dataclass, fields
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "the text develops its argument through a careful sequence of images "
+    "while the vocabulary shifts register between formal and colloquial usage"
+).split()
+
+
+@dataclass
+class FakeGeminiConfig:
+    detect_latency: float = 0.3
+    correct_latency: float = 1.0
+    # Time before the first streamed chunk of an interpretation.
+    interpret_latency: float = 0.6
+    tokens_per_second: float = 120.0
+    interpret_tokens: int = 400
+    chunk_tokens: int = 8
+    # Each latency is scaled by a uniform factor in [1 - jitter, 1 + jitter].
+    jitter: float = 0.2
+    # Share of requests whose latency is multiplied by slow_factor, to give the
+    # latency distribution a tail (what request hedging is meant to cut).
+    slow_rate: float = 0.0
+    slow_factor: float = 10.0
+    # Share of requests answered with a 503 after their latency.
+    error_rate: float = 0.0
+    # Share of streams cut off half-way through.
+    stream_abort_rate: float = 0.0
+    detected_language: str = "FR"
+    correction_needed: bool = False
+    seed: int | None = None
+
+    @classmethod
+    def from_env(cls, prefix: str = "FAKE_GEMINI_") -> "FakeGeminiConfig":
+        values = {}
+        for field in fields(cls):
+            raw = os.getenv(prefix + field.name.upper())
+            if raw is None:
+                continue
+            if field.type is bool:
+                values[field.name] = raw.lower() == "true"
+            elif field.type is str:
+                values[field.name] = raw
+            elif field.type is float:
+                values[field.name] = float(raw)
+            else:
+                values[field.name] = int(raw)
+        return cls(**values)
+
+
+def _response(text: str) -> dict:
+    return {
+        "candidates": [
+            {
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0,
+            }
+        ],
+        "usageMetadata": {
+            "promptTokenCount": 0,
+            "candidatesTokenCount": len(text.split()),
+            "totalTokenCount": len(text.split()),
+        },
+    }
+
+
+def _system_prompt(body: dict) -> str:
+    parts = body.get("systemInstruction", {}).get("parts", [])
+    return "".join(part.get("text", "") for part in parts)
+
+
+def _user_text(body: dict) -> str:
+    return "".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+
+
+def create_app(config: FakeGeminiConfig | None = None) -> FastAPI:
+    config = config or FakeGeminiConfig.from_env()
+    rng = random.Random(config.seed)
+    fake = FastAPI(title="Fake Gemini")
+    fake.state.config = config
+    fake.state.requests = {"detect": 0, "correct": 0, "interpret": 0, "errors": 0}
+
+    async def delay(seconds: float) -> None:
+        if rng.random() < config.slow_rate:
+            seconds *= config.slow_factor
+        if seconds > 0:
+            await asyncio.sleep(
+                seconds * rng.uniform(1 - config.jitter, 1 + config.jitter)
+            )
+
+    def error() -> JSONResponse:
+        fake.state.requests["errors"] += 1
+        return JSONResponse(
+            status_code=503,
+            content={
+                "error": {
+                    "code": 503,
+                    "message": "Injected failure from the fake Gemini server.",
+                    "status": "UNAVAILABLE",
+                }
+            },
+        )
+
+    def interpretation() -> list[str]:
+        words = [WORDS[i % len(WORDS)] for i in range(config.interpret_tokens)]
+        size = max(1, config.chunk_tokens)
+        return [
+            " ".join(words[start : start + size]) + " "
+            for start in range(0, len(words), size)
+        ]
+
+    @fake.get("/stats")
+    async def stats():
+        return fake.state.requests
+
+    @fake.post("/{version}/models/{target}")
+    async def generate(version: str, target: str, request: Request):
+        _model, _, method = target.partition(":")
+        body = await request.json()
+        generation = body.get("generationConfig", {})
+
+        if method == "streamGenerateContent":
+            kind = "interpret"
+        elif generation.get("responseMimeType") == "application/json":
+            kind = "detect"
+        elif "proofreader" in _system_prompt(body):
+            kind = "correct"
+        else:
+            kind = "interpret"
+        fake.state.requests[kind] += 1
+
+        if method == "streamGenerateContent":
+            await delay(config.interpret_latency)
+            if rng.random() < config.error_rate:
+                return error()
+            return StreamingResponse(
+                stream(interpretation()), media_type="text/event-stream"
+            )
+
+        latency = {
+            "detect": config.detect_latency,
+            "correct": config.correct_latency,
+        }.get(kind, config.interpret_latency)
+        await delay(latency)
+        if rng.random() < config.error_rate:
+            return error()
+
+        if kind == "detect":
+            text = json.dumps(
+                {
+                    "language": config.detected_language,
+                    "genre": "news",
+                    "correction_needed": config.correction_needed,
+                }
+            )
+        elif kind == "correct":
+            text = _user_text(body)
+        else:
+            text = "".join(interpretation())
+            await asyncio.sleep(config.interpret_tokens / config.tokens_per_second)
+        return _response(text)
+
+    async def stream(chunks: list[str]):
+        abort_at = len(chunks) // 2 if rng.random() < config.stream_abort_rate else None
+        interval = max(1, config.chunk_tokens) / config.tokens_per_second
+        for index, chunk in enumerate(chunks):
+            if index == abort_at:
+                fake.state.requests["errors"] += 1
+                raise ConnectionError("Injected stream abort")
+            if index:
+                await asyncio.sleep(interval)
+            yield f"data: {json.dumps(_response(chunk))}\r\n\r\n"
+
+    return fake
+
+
+app = create_app()
@@ -0,0 +1,129 @@
+"""Latency of History listing at increasing page depths: keyset versus OFFSET.
+
+Needs the POSTGRES_* environment variables and writes to that database: the
+``history`` table is topped up to ``--rows`` synthetic rows (through the
+History writer, which compresses their texts) before measuring. Run from
+``backend/``::
+
+    python -m benchmarks.history_pagination [--rows 1000000] [--page-size 20]
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import func, select, text
+
+from db.history import encode_cursor, history_page_query
+from llm.registry import hash_api_key
+
+# Every seeded row belongs to one key, the worst case for a per-owner listing.
+OWNER = hash_api_key("bench-key")
+
+WORDS = [
+    "market", "poem", "contract", "river", "clause", "harvest", "letter",
+    "invoice", "sonnet", "tribunal", "weather", "recipe", "treaty", "novel",
+]  # fmt: skip
+
+
+def seed_rows(start: int, stop: int) -> list[dict]:
+    return [
+        {
+            "owner": OWNER,
+            "prompt": f"Sample {g} about {WORDS[g % len(WORDS)]} "
+            + "lorem ipsum dolor sit amet " * 20,
+            "result": f"Interpretation {g} " + "consectetur adipiscing elit " * 200,
+            "target_language": "EN",
+            "model": "gemini-2.5-flash",
+        }
+        for g in range(start, stop + 1)
+    ]
+
+
+def seed(session, rows: int, batch: int = 1_000) -> int:
+    """Top the table up to ``rows`` through the regular (compressing) writer."""
+    from db.history_store import insert_history_batch
+
+    existing = session.execute(
+        select(func.count()).select_from(text("history")).where(text("owner = :owner")),
+        {"owner": OWNER},
+    ).scalar_one()
+    for start in range(existing + 1, rows + 1, batch):
+        insert_history_batch(seed_rows(start, min(rows, start + batch - 1)))
+    session.execute(text("ANALYZE history"))
+    session.commit()
+    return max(rows, existing)
+
+
+def timed(session, statement, params=None, repeat: int = 5) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        session.execute(statement, params or {}).all()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def cursor_at(session, depth: int) -> str | None:
+    if depth == 0:
+        return None
+    row = session.execute(
+        text(
+            "SELECT timestamp, id FROM history WHERE owner = :owner "
+            "ORDER BY timestamp DESC, id DESC OFFSET :depth LIMIT 1"
+        ),
+        {"owner": OWNER, "depth": depth - 1},
+    ).one()
+    return encode_cursor(row.timestamp, row.id)
+
+
+def run(session, rows: int, page_size: int) -> dict:
+    offset_sql = text(
+        "SELECT id, preview, target_language, model, "
+        "timestamp FROM history WHERE owner = :owner "
+        "ORDER BY timestamp DESC, id DESC LIMIT :limit OFFSET :offset"
+    )
+    depths = [0, 1_000, 10_000, 100_000, rows // 2, rows - page_size]
+    pages = []
+    for depth in sorted({d for d in depths if 0 <= d < rows}):
+        cursor = cursor_at(session, depth)
+        pages.append(
+            {
+                "depth": depth,
+                "keyset_ms": timed(
+                    session, history_page_query(OWNER, page_size, cursor)
+                ),
+                "offset_ms": timed(
+                    session,
+                    offset_sql,
+                    {"owner": OWNER, "limit": page_size + 1, "offset": depth},
+                ),
+            }
+        )
+
+    searches = {
+        query: timed(session, history_page_query(OWNER, page_size, None, query))
+        for query in ("treaty", "sonnet harvest", '"Sample 4242"')
+    }
+    return {"rows": rows, "page_size": page_size, "pages": pages, "search_ms": searches}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=20)
+    args = parser.parse_args()
+
+    load_dotenv()
+    from db.session import SessionLocal, init_db
+
+    init_db()
+    with SessionLocal() as session:
+        rows = seed(session, args.rows)
+        print(json.dumps(run(session, rows, args.page_size), indent=2))
+
+
+if __name__ == "__main__":
+    main()
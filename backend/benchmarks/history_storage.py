@@ -0,0 +1,219 @@
+"""Storage saved by deduplicating and compressing History texts.
+
+Seeds a synthetic History: prompts are drawn from the benchmark samples and
+recombined into new articles, a share of them submitted again (the same
+article analyzed twice, in which case the result is usually the cached one),
+and every result is a Markdown interpretation several times the prompt's size,
+laid out like the real ones. Reports the bytes stored as plain text, after
+deduplication, and zstd-compressed without and with a dictionary trained on the
+first texts, plus the per-text compression and decompression cost. Run from
+``backend/``::
+
+    python -m benchmarks.history_storage [--rows 5000] [--repeat-rate 0.3]
+        [--dict-size 65536] [--dict-samples 500] [--output PATH] [--database]
+
+Synthetic interpretations repeat more than real ones, so the compression
+ratios are an upper bound, and the plain-text baseline leaves out the pglz
+compression TOAST applied to the old text columns. ``--database`` also inserts
+the seeded rows through the History writer (POSTGRES_* environment variables)
+and reports ``db.blobs.storage_report`` and the on-disk size of the tables.
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from pathlib import Path
+
+from benchmarks.detector import DEFAULT_SAMPLES, load_samples, percentile
+from benchmarks.load import RESULTS_DIR, git_commit
+from db.compression import (
+    HISTORY_DICT_SAMPLES,
+    HISTORY_DICT_SIZE,
+    HistoryCodec,
+    summarize_storage,
+)
+
+OCR_SAMPLES = DEFAULT_SAMPLES.parent / "ocr_samples.jsonl"
+
+SECTIONS = (
+    "## Overview",
+    "### Key Vocabulary and Expressions",
+    "### Sentence Architecture",
+    "### Rhetorical Devices",
+    "### Cultural and Historical Context",
+    "### Logical Connections",
+    "## Structure and Authorial Intent",
+)
+FRAMES = (
+    "The expression **{a}** frames the passage: it links {b} to {c} and sets the "
+    "register for what follows.",
+    "Note how *{a}* is placed before {b}; the author delays {c} to build tension.",
+    "Here **{a}** works as a connector, so the reader expects a contrast with {b}.",
+    "The choice of {a} rather than {b} signals a formal, slightly ironic tone "
+    "towards {c}.",
+    "Etymologically, **{a}** goes back to a Latin root; compare {b} and {c}.",
+    "In context, {a} should be read as a concession, which the clause about {b} "
+    "then qualifies.",
+)
+_WORD = re.compile(r"\w{4,}")
+_SENTENCE = re.compile(r"(?<=[.!?。！？])\s+")
+
+
+def article_pool(paths: list) -> list[str]:
+    return [sample["text"] for path in paths for sample in load_samples(path)]
+
+
+def new_article(rng: random.Random, pool: list[str], serial: int) -> str:
+    sentences = [s for text in rng.sample(pool, 3) for s in _SENTENCE.split(text)]
+    rng.shuffle(sentences)
+    paragraphs = [" ".join(sentences[i : i + 3]) for i in range(0, len(sentences), 3)]
+    return f"Article {serial}\n\n" + "\n\n".join(paragraphs)
+
+
+def interpretation(rng: random.Random, article: str) -> str:
+    words = _WORD.findall(article) or ["text"]
+    sentences = _SENTENCE.split(article)
+    parts = []
+    for heading in SECTIONS:
+        parts.append(heading)
+        quoted = rng.choice(sentences)
+        parts.append(f"> {quoted}")
+        for _ in range(rng.randint(3, 6)):
+            frame = rng.choice(FRAMES)
+            parts.append(
+                frame.format(
+                    a=rng.choice(words), b=rng.choice(words), c=rng.choice(words)
+                )
+            )
+    return "\n\n".join(parts)
+
+
+def seed_history(rows: int, repeat_rate: float, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    pool = article_pool([DEFAULT_SAMPLES, OCR_SAMPLES])
+    history: list[dict] = []
+    for serial in range(rows):
+        if history and rng.random() < repeat_rate:
+            previous = rng.choice(history)
+            prompt = previous["prompt"]
+            # Usually served from the result cache; otherwise analyzed afresh.
+            if rng.random() < 0.8:
+                result = previous["result"]
+            else:
+                result = interpretation(rng, prompt)
+        else:
+            prompt = new_article(rng, pool, serial)
+            result = interpretation(rng, prompt)
+        history.append({"prompt": prompt, "result": result, "target_language": "EN"})
+    return history
+
+
+def compressed_sizes(codec: HistoryCodec, texts: list[str]) -> dict:
+    sizes, compress_us, decompress_us = [], [], []
+    for text in texts:
+        start = time.perf_counter()
+        data, dictionary_id = codec.compress(text)
+        compress_us.append((time.perf_counter() - start) * 1e6)
+        start = time.perf_counter()
+        codec.decompress(data, dictionary_id)
+        decompress_us.append((time.perf_counter() - start) * 1e6)
+        sizes.append(len(data))
+    return {
+        "bytes": sum(sizes),
+        "compress_us_p50": round(percentile(compress_us, 50), 1),
+        "decompress_us_p50": round(percentile(decompress_us, 50), 1),
+        "decompress_us_p99": round(percentile(decompress_us, 99), 1),
+    }
+
+
+def offline_report(history: list[dict], dict_size: int, dict_samples: int) -> dict:
+    texts = [row[field] for row in history for field in ("prompt", "result")]
+    unique = list(dict.fromkeys(texts))
+    logical = sum(len(text.encode("utf-8")) for text in texts)
+    unique_bytes = sum(len(text.encode("utf-8")) for text in unique)
+
+    plain = compressed_sizes(HistoryCodec(), unique)
+    codec = HistoryCodec()
+    dictionary = codec.train(unique[:dict_samples], dict_size)
+    codec.add_dictionary(1, dictionary)
+    trained = compressed_sizes(codec, unique)
+
+    return {
+        "rows": len(history),
+        "texts": len(texts),
+        "unique_texts": len(unique),
+        "mean_prompt_bytes": round(
+            sum(len(row["prompt"].encode("utf-8")) for row in history) / len(history)
+        ),
+        "mean_result_bytes": round(
+            sum(len(row["result"].encode("utf-8")) for row in history) / len(history)
+        ),
+        "zstd": {
+            **plain,
+            **summarize_storage(logical, unique_bytes, plain["bytes"], 0),
+        },
+        "zstd_dictionary": {
+            **trained,
+            "dictionary_samples": dict_samples,
+            **summarize_storage(
+                logical, unique_bytes, trained["bytes"], len(dictionary)
+            ),
+        },
+    }
+
+
+def database_report(history: list[dict], batch: int = 200) -> dict:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    from sqlalchemy import text
+
+    from db.blobs import storage_report
+    from db.history_store import insert_history_batch
+    from db.session import SessionLocal, init_db
+
+    init_db()
+    for start in range(0, len(history), batch):
+        insert_history_batch(history[start : start + batch])
+    with SessionLocal() as session:
+        sizes = {
+            table: session.execute(
+                text("SELECT pg_total_relation_size(:table)"), {"table": table}
+            ).scalar_one()
+            for table in ("history", "history_blob", "history_dictionary")
+        }
+        return {**storage_report(session), "relation_bytes": sizes}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat-rate", type=float, default=0.3)
+    parser.add_argument("--dict-size", type=int, default=HISTORY_DICT_SIZE)
+    parser.add_argument("--dict-samples", type=int, default=HISTORY_DICT_SAMPLES)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--database", action="store_true")
+    args = parser.parse_args()
+
+    history = seed_history(args.rows, args.repeat_rate)
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "repeat_rate": args.repeat_rate,
+        "dict_size": args.dict_size,
+        **offline_report(history, args.dict_size, args.dict_samples),
+    }
+    if args.database:
+        report["database"] = database_report(history)
+
+    output = args.output or RESULTS_DIR / f"history-storage-{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(json.dumps(report, indent=2))
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
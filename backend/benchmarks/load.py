@@ -0,0 +1,277 @@
+"""Load test of the analyze endpoints against the fake Gemini server.
+
+Starts ``benchmarks.fake_gemini`` and the backend (pointed at it through
+``GEMINI_BASE_URL``) as subprocesses, drives ``/api/analyze`` and
+``/api/analyze/stream`` at increasing concurrency and writes throughput, time to
+first byte, time to first chunk and latency percentiles to a JSON file, named
+after the current commit by default. Run from ``backend/``::
+
+    python -m benchmarks.load [--concurrency 1,4,16,64] [--requests 64]
+        [--fake tokens_per_second=60 --fake error_rate=0.05] [--output PATH]
+
+The backend is started without per-key rate limits and with model slots well
+above the tested concurrency: every request carries the same key, so the
+default admission limits would be measured rather than the server. Pass
+``--admission-limits`` to keep them. Pass ``--target URL`` to load an already
+running backend instead.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+
+from benchmarks.detector import DEFAULT_SAMPLES, load_samples, percentile
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+ENDPOINTS = ("analyze", "stream")
+BENCH_KEY = "bench-key"
+# Lifts admission control (``llm.admission``) out of the way of the harness.
+UNLIMITED_ADMISSION = {
+    "ADMISSION_KEY_RATE": "0",
+    "ADMISSION_MODEL_LIMITS": "gemini-2.5-flash=4096,gemini-2.5-pro=4096",
+    "ADMISSION_DEFAULT_LIMIT": "4096",
+}
+
+
+@dataclass
+class Sample:
+    ok: bool
+    latency: float
+    ttfb: float
+    ttfc: float | None = None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=BACKEND_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def start_server(module: str, port: int, env: dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            module,
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+    )
+
+
+async def wait_ready(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Server at {url} did not come up")
+            await asyncio.sleep(0.2)
+
+
+async def call_analyze(client: httpx.AsyncClient, payload: dict) -> Sample:
+    started = time.perf_counter()
+    async with client.stream("POST", "/api/analyze", json=payload) as response:
+        ttfb = time.perf_counter() - started
+        body = await response.aread()
+    latency = time.perf_counter() - started
+    ok = response.status_code == 200 and json.loads(body).get("success", False)
+    return Sample(ok, latency, ttfb)
+
+
+async def call_stream(client: httpx.AsyncClient, payload: dict) -> Sample:
+    started = time.perf_counter()
+    ttfc = None
+    ok = False
+    async with client.stream("POST", "/api/analyze/stream", json=payload) as response:
+        ttfb = time.perf_counter() - started
+        buffer = ""
+        async for text in response.aiter_text():
+            buffer += text
+            *frames, buffer = buffer.split("\n\n")
+            for frame in frames:
+                if "event: chunk" in frame and ttfc is None:
+                    ttfc = time.perf_counter() - started
+                elif "event: done" in frame:
+                    ok = True
+                elif "event: error" in frame:
+                    ok = False
+    return Sample(ok, time.perf_counter() - started, ttfb, ttfc)
+
+
+def summarize(values: list[float]) -> dict[str, float] | None:
+    if not values:
+        return None
+    millis = [value * 1000 for value in values]
+    return {
+        "mean": round(statistics.fmean(millis), 2),
+        "p50": round(percentile(millis, 50), 2),
+        "p95": round(percentile(millis, 95), 2),
+        "p99": round(percentile(millis, 99), 2),
+    }
+
+
+async def run_level(
+    base_url: str, endpoint: str, concurrency: int, requests: int, texts: list[str]
+) -> dict:
+    call = call_analyze if endpoint == "analyze" else call_stream
+    run_id = uuid.uuid4().hex[:8]
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)
+
+    async with httpx.AsyncClient(
+        base_url=base_url,
+        headers={"X-Gemini-Key": BENCH_KEY},
+        timeout=None,
+        limits=limits,
+    ) as client:
+
+        async def one(index: int) -> Sample:
+            # A unique suffix keeps every request out of the result cache.
+            text = f"{texts[index % len(texts)]}\n\n[{run_id}-{index}]"
+            payload = {"text": text, "user_language": "EN"}
+            async with semaphore:
+                try:
+                    return await call(client, payload)
+                except httpx.HTTPError:
+                    return Sample(False, 0.0, 0.0)
+
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    ok = [sample for sample in samples if sample.ok]
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": requests - len(ok),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 3),
+        "latency_ms": summarize([sample.latency for sample in ok]),
+        "ttfb_ms": summarize([sample.ttfb for sample in ok]),
+        "ttfc_ms": summarize([s.ttfc for s in ok if s.ttfc is not None]),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    texts = [sample["text"] for sample in load_samples(args.samples)]
+    fake_env = {
+        f"FAKE_GEMINI_{key.upper()}": value
+        for key, value in (item.split("=", 1) for item in args.fake)
+    }
+    backend_env = {} if args.admission_limits else dict(UNLIMITED_ADMISSION)
+    processes: list[subprocess.Popen] = []
+    base_url = args.target
+    try:
+        if base_url is None:
+            fake_port, backend_port = free_port(), free_port()
+            processes.append(
+                start_server("benchmarks.fake_gemini:app", fake_port, fake_env)
+            )
+            backend_env["GEMINI_BASE_URL"] = f"http://127.0.0.1:{fake_port}"
+            processes.append(start_server("app:app", backend_port, backend_env))
+            base_url = f"http://127.0.0.1:{backend_port}"
+            await wait_ready(f"http://127.0.0.1:{fake_port}/stats")
+        await wait_ready(f"{base_url}/api/cache/stats")
+
+        results = []
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                requests = max(args.requests, concurrency)
+                result = await run_level(
+                    base_url, endpoint, concurrency, requests, texts
+                )
+                print(json.dumps(result), file=sys.stderr)
+                results.append(result)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            with contextlib.suppress(subprocess.TimeoutExpired):
+                process.wait(timeout=10)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "target": args.target or "local",
+        "fake_gemini": fake_env,
+        "admission": "default" if args.admission_limits else "unlimited",
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", help="Base URL of a running backend")
+    parser.add_argument(
+        "--concurrency",
+        type=lambda raw: [int(level) for level in raw.split(",")],
+        default=[1, 4, 16, 64],
+    )
+    parser.add_argument("--requests", type=int, default=64, help="Per level")
+    parser.add_argument(
+        "--endpoints",
+        type=lambda raw: raw.split(","),
+        default=list(ENDPOINTS),
+    )
+    parser.add_argument(
+        "--fake",
+        action="append",
+        default=[],
+        metavar="FIELD=VALUE",
+        help="Fake Gemini setting, e.g. tokens_per_second=60 (repeatable)",
+    )
+    parser.add_argument(
+        "--admission-limits",
+        action="store_true",
+        help="Keep the backend's default admission limits (local runs only)",
+    )
+    parser.add_argument("--samples", type=Path, default=DEFAULT_SAMPLES)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    output = args.output or RESULTS_DIR / f"load-{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""Accuracy, memory and query latency of the near-duplicate index.
+
+Accuracy: indexes synthetic articles recombined from the benchmark samples,
+then queries variants of them as they reach the app when reposted elsewhere
+(other quotes, spacing and line breaks; a footer; one sentence rewritten) and
+articles never indexed, which often share sentences with indexed ones. Reports
+the share of variants finding their article, the share of new articles matching
+one and the share of those matches that are false (an exact shingle Jaccard
+below the threshold; recombined articles can be near-duplicates), and the
+signature cost per text.
+
+Scale: fills an index with ``--documents`` random signatures, which cost the
+index the same as real ones, and reports the memory per document, both as
+counted by the index and as the growth of the process's resident set, the
+insertion rate, the slowest insertion (one that rebuilds the band runs), and
+the query latency for misses and for near-duplicates (a
+stored signature with 10% of its slots changed), also while a rebuild runs in
+another thread. Run from ``backend/``::
+
+    python -m benchmarks.near_duplicates [--documents 1000000] [--queries 2000]
+        [--articles 2000] [--threshold 0.8] [--output PATH]
+"""
+
+import argparse
+import json
+import random
+import resource
+import threading
+import time
+from pathlib import Path
+
+from benchmarks.detector import DEFAULT_SAMPLES, percentile
+from benchmarks.history_storage import OCR_SAMPLES, article_pool, new_article
+from benchmarks.load import RESULTS_DIR, git_commit
+from llm.cache import make_cache_key
+from llm.similarity import (
+    NEAR_DUPLICATE_BANDS,
+    NEAR_DUPLICATE_PERMUTATIONS,
+    NEAR_DUPLICATE_THRESHOLD,
+    NearDuplicateIndex,
+    analysis_scope,
+    minhash_signature,
+    shingles,
+)
+
+SCOPE = analysis_scope("bench-owner", "EN", "gemini-2.5-flash")
+FOOTER = (
+    "\n\nShare this article: Facebook · X · Email\n"
+    "© 2026 The Daily Courier. All rights reserved. Subscribe to our newsletter."
+)
+
+
+def reformat(text: str) -> str:
+    return (
+        text.replace(". ", ".\n")
+        .replace("'", "’")
+        .replace('"', "“")
+        .replace(" ", "  ")
+        .replace("\n\n", "\r\n \r\n")
+    )
+
+
+def rewrite_sentence(rng: random.Random, text: str) -> str:
+    sentences = text.split(". ")
+    i = rng.randrange(len(sentences))
+    sentences[i] = "The editors have since updated this paragraph"
+    return ". ".join(sentences)
+
+
+VARIANTS = {
+    "reformatted": lambda rng, text: reformat(text),
+    "footer": lambda rng, text: text + FOOTER,
+    "reformatted_footer": lambda rng, text: reformat(text) + FOOTER,
+    "sentence_rewritten": rewrite_sentence,
+}
+
+
+def accuracy_report(articles: int, threshold: float, seed: int = 11) -> dict:
+    rng = random.Random(seed)
+    pool = article_pool([DEFAULT_SAMPLES, OCR_SAMPLES])
+    texts = [new_article(rng, pool, serial) for serial in range(articles)]
+    index = NearDuplicateIndex(threshold=threshold, max_documents=articles)
+    by_key = {make_cache_key(text, "EN", "gemini-2.5-flash"): text for text in texts}
+
+    signature_us = []
+    for cache_key, text in by_key.items():
+        start = time.perf_counter()
+        signature = minhash_signature(text)
+        signature_us.append((time.perf_counter() - start) * 1e6)
+        index.add(signature, SCOPE, cache_key)
+
+    queried = texts[: min(500, articles)]
+    recall = {}
+    for name, variant in VARIANTS.items():
+        found = 0
+        for text in queried:
+            matches = index.find_text(variant(rng, text), SCOPE)
+            found += make_cache_key(text, "EN", "gemini-2.5-flash") in {
+                match.cache_key for match in matches
+            }
+        recall[name] = round(found / len(queried), 4)
+
+    unseen = [new_article(rng, pool, articles + i) for i in range(len(queried))]
+    matched = false_matches = 0
+    for text in unseen:
+        for match in index.find_text(text, SCOPE):
+            matched += 1
+            found, original = shingles(text), shingles(by_key[match.cache_key])
+            false_matches += len(found & original) / len(found | original) < threshold
+    return {
+        "articles": articles,
+        "mean_article_bytes": round(
+            sum(len(text.encode("utf-8")) for text in texts) / len(texts)
+        ),
+        "signature_us_p50": round(percentile(signature_us, 50), 1),
+        "signature_us_p99": round(percentile(signature_us, 99), 1),
+        "recall": recall,
+        "new_article_matches": round(matched / len(unseen), 4),
+        "false_match_rate": round(false_matches / max(1, matched), 4),
+    }
+
+
+def resident_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def perturbed(rng: random.Random, signature: bytes, share: float) -> bytes:
+    values = bytearray(signature)
+    for slot in rng.sample(range(len(values) // 2), int(len(values) // 2 * share)):
+        values[2 * slot : 2 * slot + 2] = rng.randbytes(2)
+    return bytes(values)
+
+
+def latencies(index: NearDuplicateIndex, signatures: list[bytes]) -> tuple:
+    micros, hits = [], 0
+    for signature in signatures:
+        start = time.perf_counter()
+        hits += bool(index.find(signature, SCOPE))
+        micros.append((time.perf_counter() - start) * 1e6)
+    return micros, hits
+
+
+def scale_report(documents: int, queries: int, threshold: float, seed: int = 5):
+    rng = random.Random(seed)
+    index = NearDuplicateIndex(threshold=threshold, max_documents=documents)
+    sample_every = max(1, documents // queries)
+    stored: list[bytes] = []
+
+    resident_before = resident_bytes()
+    slowest = build_seconds = 0.0
+    for doc in range(documents):
+        signature = rng.randbytes(index.signature_size)
+        cache_key = rng.randbytes(32).hex()
+        start = time.perf_counter()
+        index.add(signature, SCOPE, cache_key)
+        elapsed = time.perf_counter() - start
+        build_seconds += elapsed
+        slowest = max(slowest, elapsed)
+        if doc % sample_every == 0:
+            stored.append(signature)
+    resident_growth = resident_bytes() - resident_before - sum(map(len, stored))
+
+    misses = [rng.randbytes(index.signature_size) for _ in range(queries)]
+    near = [perturbed(rng, signature, 0.1) for signature in stored[:queries]]
+    miss_us, false_hits = latencies(index, misses)
+    near_us, near_hits = latencies(index, near)
+
+    for _ in range(index.merge_min):
+        index.add(rng.randbytes(index.signature_size), SCOPE, rng.randbytes(32).hex())
+    rebuild = threading.Thread(target=index.rebuild)
+    rebuild.start()
+    rebuilding_us = []
+    while rebuild.is_alive():
+        rebuilding_us.extend(latencies(index, near[:100])[0])
+    rebuild.join()
+    stats = index.stats()
+    return {
+        "documents": documents,
+        "build_seconds": round(build_seconds, 1),
+        "adds_per_second": round(documents / build_seconds),
+        "merges": stats["merges"],
+        "slowest_add_ms": round(slowest * 1000, 1),
+        "index_bytes_per_document": stats["bytes_per_document"],
+        "resident_bytes_per_document": round(resident_growth / documents),
+        "miss_us_p50": round(percentile(miss_us, 50), 1),
+        "miss_us_p99": round(percentile(miss_us, 99), 1),
+        "near_duplicate_us_p50": round(percentile(near_us, 50), 1),
+        "near_duplicate_us_p99": round(percentile(near_us, 99), 1),
+        "near_duplicate_recall": round(near_hits / len(near), 4),
+        "during_rebuild_us_p50": round(percentile(rebuilding_us, 50), 1),
+        "during_rebuild_us_p99": round(percentile(rebuilding_us, 99), 1),
+        "random_false_hits": false_hits,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--articles", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=NEAR_DUPLICATE_THRESHOLD)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "threshold": args.threshold,
+        "permutations": NEAR_DUPLICATE_PERMUTATIONS,
+        "bands": NEAR_DUPLICATE_BANDS,
+        "accuracy": accuracy_report(args.articles, args.threshold),
+        "scale": scale_report(args.documents, args.queries, args.threshold),
+    }
+
+    output = args.output or RESULTS_DIR / f"near-duplicates-{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(json.dumps(report, indent=2))
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
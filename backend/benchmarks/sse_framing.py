@@ -0,0 +1,144 @@
+"""Bytes on the wire, event counts and added latency of SSE framing options.
+
+Replays a synthetic stream of small token deltas through the same framing the
+stream endpoint uses, with delta coalescing and per-frame gzip each switched on
+and off. Run from ``backend/``::
+
+    python -m benchmarks.sse_framing [--deltas 1500] [--interval-ms 2]
+        [--window-ms 40] [--max-bytes 2048]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from benchmarks.detector import percentile
+from routers.sse import coalesce_chunks, gzip_frames, to_sse_event
+
+WORDS = (
+    "La phrase s'ouvre sur une image concrète puis glisse vers l'abstraction, "
+    "et le lecteur suit ce mouvement grâce aux connecteurs logiques du texte."
+).split()
+
+
+def make_deltas(count: int, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    deltas = []
+    for _ in range(count):
+        word = rng.choice(WORDS)
+        # Token-sized fragments: whole short words, pieces of longer ones.
+        size = rng.randint(2, 6)
+        deltas.append((" " + word)[:size] if len(word) > size else " " + word)
+    return deltas
+
+
+async def upstream(deltas: list[str], interval: float, sent_at: list[float]):
+    loop = asyncio.get_running_loop()
+    yield {"event": "stage", "stage": "interpret"}
+    for delta in deltas:
+        if interval:
+            await asyncio.sleep(interval)
+        sent_at.append(loop.time())
+        yield {"event": "chunk", "delta": delta}
+    yield {"event": "done", "result": "".join(deltas)}
+
+
+async def run_config(
+    deltas: list[str],
+    interval: float,
+    coalesce: bool,
+    compress: bool,
+    window: float,
+    max_bytes: int,
+) -> dict:
+    loop = asyncio.get_running_loop()
+    sent_at: list[float] = []
+    delays: list[float] = []
+    delivered = 0
+    events = upstream(deltas, interval, sent_at)
+    if coalesce:
+        events = coalesce_chunks(events, window=window, max_bytes=max_bytes)
+
+    async def frames():
+        nonlocal delivered
+        seq = 0
+        async for event in events:
+            seq += 1
+            name = event.pop("event")
+            if name == "chunk":
+                # Attribute the emitted text to the deltas it contains.
+                covered = len(event["delta"])
+                now = loop.time()
+                while covered > 0:
+                    covered -= len(deltas[delivered])
+                    delays.append(now - sent_at[delivered])
+                    delivered += 1
+            yield to_sse_event(name, event, event_id=f"Q2hhbmdlIG1lIHBsZWFzZQ:{seq}")
+
+    body = gzip_frames(frames()) if compress else frames()
+    wire_bytes = 0
+    writes = 0
+    cpu_started = time.process_time()
+    started = loop.time()
+    async for piece in body:
+        wire_bytes += len(piece if isinstance(piece, bytes) else piece.encode())
+        writes += 1
+    elapsed = loop.time() - started
+    cpu = time.process_time() - cpu_started
+
+    delays_ms = [delay * 1000 for delay in delays]
+    return {
+        "coalesce": coalesce,
+        "gzip": compress,
+        "events": writes - (1 if compress else 0),
+        "wire_bytes": wire_bytes,
+        "bytes_per_delta": round(wire_bytes / len(deltas), 2),
+        "events_per_sec": round(writes / elapsed, 1) if elapsed else None,
+        "cpu_us_per_delta": round(cpu / len(deltas) * 1e6, 2),
+        "added_latency_ms": {
+            "mean": round(statistics.fmean(delays_ms), 3),
+            "p95": round(percentile(delays_ms, 95), 3),
+            "max": round(max(delays_ms), 3),
+        },
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    deltas = make_deltas(args.deltas)
+    results = []
+    for coalesce in (False, True):
+        for compress in (False, True):
+            results.append(
+                await run_config(
+                    deltas,
+                    args.interval_ms / 1000,
+                    coalesce,
+                    compress,
+                    args.window_ms / 1000,
+                    args.max_bytes,
+                )
+            )
+    return {
+        "deltas": args.deltas,
+        "interval_ms": args.interval_ms,
+        "window_ms": args.window_ms,
+        "max_bytes": args.max_bytes,
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--deltas", type=int, default=1500)
+    parser.add_argument("--interval-ms", type=float, default=2.0)
+    parser.add_argument("--window-ms", type=float, default=40.0)
+    parser.add_argument("--max-bytes", type=int, default=2048)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Cold-start cost of the backend: import time per module and first requests.
+
+Profiles ``import app`` with ``python -X importtime`` and reports the slowest
+modules, then what the deferred LLM and database stacks cost when they are
+finally imported. Then starts the backend (pointed at ``benchmarks.fake_gemini``)
+from a fresh process several times, with and without the background LLM
+warm-up, and measures the time from process spawn to the first served
+response and to ``/api/ready`` turning 200, and the latency of the first
+analysis against an instant fake upstream. That analysis is sent
+``--think-time`` seconds after the first response, as when a woken instance
+first serves the page and the user then submits a text. Run from ``backend/``::
+
+    python -m benchmarks.startup [--runs 5] [--think-time 3.0] [--top 15]
+        [--output PATH]
+
+The database stack is profiled against placeholder credentials; nothing
+connects to it.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.load import (
+    BACKEND_DIR,
+    RESULTS_DIR,
+    free_port,
+    git_commit,
+    start_server,
+    wait_ready,
+)
+from routers.warmup import DB_MODULES, LLM_MODULES
+
+_IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+# Upstream latency would dwarf what startup adds to the first analysis.
+INSTANT_GEMINI = {
+    "FAKE_GEMINI_DETECT_LATENCY": "0",
+    "FAKE_GEMINI_CORRECT_LATENCY": "0",
+    "FAKE_GEMINI_INTERPRET_LATENCY": "0",
+    "FAKE_GEMINI_TOKENS_PER_SECOND": "1000000",
+}
+PLACEHOLDER_DB_ENV = {
+    "POSTGRES_USER": "bench",
+    "POSTGRES_PASSWORD": "bench",
+    "POSTGRES_DB": "bench",
+}
+
+
+def import_times(statement: str, env: dict[str, str] | None = None) -> list[dict]:
+    """Per-module import times of ``statement`` in a fresh interpreter."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **(env or {})},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            modules.append(
+                {
+                    "module": module,
+                    "depth": len(indent) // 2,
+                    "self_ms": int(self_us) / 1000,
+                    "cumulative_ms": int(cumulative_us) / 1000,
+                }
+            )
+    return modules
+
+
+def import_profile(top: int) -> dict:
+    app_modules = import_times("import app")
+    app_total = next(m for m in app_modules if m["module"] == "app")
+    slowest = sorted(app_modules, key=lambda m: m["cumulative_ms"], reverse=True)
+
+    deferred = {}
+    for name, modules in (("llm", LLM_MODULES), ("db", DB_MODULES)):
+        # Imported after the app, so only the cost the app did not already pay.
+        statement = "import app; " + "; ".join(f"import {m}" for m in modules)
+        profile = import_times(statement, PLACEHOLDER_DB_ENV)
+        deferred[name] = round(
+            sum(m["cumulative_ms"] for m in profile if m["module"] in modules), 1
+        )
+
+    return {
+        "app_import_ms": round(app_total["cumulative_ms"], 1),
+        "modules_loaded": len(app_modules),
+        "slowest_modules": [
+            {
+                "module": m["module"],
+                "cumulative_ms": round(m["cumulative_ms"], 1),
+                "self_ms": round(m["self_ms"], 1),
+            }
+            for m in slowest[:top]
+        ],
+        "deferred_import_ms": deferred,
+    }
+
+
+async def cold_start(
+    fake_url: str, warmup: bool, think_time: float
+) -> dict[str, float]:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = start_server(
+        "app:app",
+        port,
+        {"GEMINI_BASE_URL": fake_url, "WARMUP_LLM": str(warmup).lower()},
+    )
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            while True:
+                try:
+                    await client.get("/api/ready")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.005)
+            first_response = time.perf_counter() - started
+
+            async def first_analysis() -> float:
+                await asyncio.sleep(think_time)
+                sent = time.perf_counter()
+                response = await client.post(
+                    "/api/analyze",
+                    json={"text": "Bonjour tout le monde", "user_language": "EN"},
+                    headers={"X-Gemini-Key": "startup-benchmark"},
+                )
+                response.raise_for_status()
+                return time.perf_counter() - sent
+
+            async def ready() -> float:
+                while (await client.get("/api/ready")).status_code != 200:
+                    await asyncio.sleep(0.05)
+                return time.perf_counter() - started
+
+            analysis, warm = await asyncio.gather(first_analysis(), ready())
+    finally:
+        process.terminate()
+        with contextlib.suppress(subprocess.TimeoutExpired):
+            process.wait(timeout=10)
+
+    return {
+        "first_response": first_response,
+        "first_analysis_latency": analysis,
+        "ready": warm,
+    }
+
+
+def summarize(runs: list[dict[str, float]]) -> dict[str, dict[str, float]]:
+    return {
+        field: {
+            "mean_ms": round(statistics.fmean(run[field] for run in runs) * 1000, 1),
+            "min_ms": round(min(run[field] for run in runs) * 1000, 1),
+        }
+        for field in runs[0]
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    fake_port = free_port()
+    fake = start_server("benchmarks.fake_gemini:app", fake_port, INSTANT_GEMINI)
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    try:
+        await wait_ready(f"{fake_url}/stats")
+        cold_starts = {}
+        for warmup in (True, False):
+            runs = [
+                await cold_start(fake_url, warmup, args.think_time)
+                for _ in range(args.runs)
+            ]
+            cold_starts["warmup" if warmup else "lazy"] = summarize(runs)
+    finally:
+        fake.terminate()
+        with contextlib.suppress(subprocess.TimeoutExpired):
+            fake.wait(timeout=10)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "imports": import_profile(args.top),
+        "think_time": args.think_time,
+        "cold_start": cold_starts,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=3.0,
+        help="Seconds between the first response and the first analysis",
+    )
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    output = args.output or RESULTS_DIR / f"startup-{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(json.dumps(report["cold_start"], indent=2))
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+import os
+
+REQUIRED_ENV_VARS = ("POSTGRES_USER", "POSTGRES_PASSWORD", "POSTGRES_DB")
+
+HISTORY_PAGE_MAX = 100
+
+
+def is_configured() -> bool:
+    return all(os.getenv(name) for name in REQUIRED_ENV_VARS)
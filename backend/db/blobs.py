@@ -0,0 +1,164 @@
+import hashlib
+from collections import Counter
+
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from db.compression import (
+    HISTORY_DICT_SAMPLES,
+    HISTORY_DICT_SIZE,
+    history_codec,
+    summarize_storage,
+)
+from db.models import History, HistoryBlob, HistoryDictionary
+
+_blobs = HistoryBlob.__table__
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_dictionaries(
+    db: Session, dictionary_ids: set[int | None] | None = None
+) -> None:
+    """Load stored dictionaries into the codec: all of them, or the missing ids."""
+    statement = select(HistoryDictionary.id, HistoryDictionary.data)
+    if dictionary_ids is not None:
+        missing = history_codec.missing(dictionary_ids)
+        if not missing:
+            return
+        statement = statement.where(HistoryDictionary.id.in_(missing))
+    for dictionary_id, data in db.execute(statement):
+        history_codec.add_dictionary(dictionary_id, data)
+
+    if dictionary_ids is None:
+        history_codec.plain_blobs = db.scalar(
+            select(func.count()).where(HistoryBlob.dictionary_id.is_(None))
+        )
+        history_codec.loaded = True
+
+
+def train_dictionary(db: Session, samples: list[str]) -> int | None:
+    """Train, store and activate a dictionary; None with too few samples."""
+    if HISTORY_DICT_SIZE <= 0 or len(samples) < HISTORY_DICT_SAMPLES:
+        return None
+    data = history_codec.train(samples, HISTORY_DICT_SIZE)
+    dictionary_id = db.scalar(
+        insert(HistoryDictionary).values(data=data).returning(HistoryDictionary.id)
+    )
+    history_codec.add_dictionary(dictionary_id, data)
+    return dictionary_id
+
+
+def _maybe_train(db: Session) -> None:
+    if history_codec.active is not None or (
+        history_codec.plain_blobs < HISTORY_DICT_SAMPLES
+    ):
+        return
+    rows = db.execute(
+        select(HistoryBlob.data)
+        .where(HistoryBlob.dictionary_id.is_(None))
+        .limit(HISTORY_DICT_SAMPLES)
+    )
+    train_dictionary(db, [history_codec.decompress(data, None) for (data,) in rows])
+
+
+def store_blobs(db: Session, texts: list[str]) -> list[str]:
+    """Reference ``texts`` from History rows; returns their content hashes.
+
+    Texts already stored only gain references. New ones are compressed, with
+    the current dictionary, once per distinct text in the batch. A dictionary is
+    trained first once enough texts were stored without one.
+
+    The stored blobs are locked until the transaction ends, so a concurrent
+    ``release_blobs`` cannot delete one between the lookup and the increment;
+    a blob it deleted first is not found and is stored again.
+    """
+    if not history_codec.loaded:
+        load_dictionaries(db)
+    _maybe_train(db)
+
+    hashes = [content_hash(text) for text in texts]
+    references = Counter(hashes)
+    existing = set(
+        db.scalars(
+            select(HistoryBlob.hash)
+            .where(HistoryBlob.hash.in_(references))
+            # Locked in hash order, like release_blobs, so writers cannot deadlock.
+            .order_by(HistoryBlob.hash)
+            .with_for_update()
+        )
+    )
+    if existing:
+        db.execute(
+            update(_blobs)
+            .where(_blobs.c.hash == bindparam("blob_hash"))
+            .values(refcount=_blobs.c.refcount + bindparam("references")),
+            [{"blob_hash": h, "references": references[h]} for h in sorted(existing)],
+        )
+
+    new = {h: text for h, text in zip(hashes, texts) if h not in existing}
+    if new:
+        rows = []
+        for blob_hash, text in sorted(new.items()):
+            data, dictionary_id = history_codec.compress(text)
+            rows.append(
+                {
+                    "hash": blob_hash,
+                    "data": data,
+                    "dictionary_id": dictionary_id,
+                    "size": len(text.encode("utf-8")),
+                    "refcount": references[blob_hash],
+                }
+            )
+        statement = pg_insert(_blobs)
+        # A concurrent writer may have stored the same text in the meantime.
+        statement = statement.on_conflict_do_update(
+            index_elements=[_blobs.c.hash],
+            set_={"refcount": _blobs.c.refcount + statement.excluded.refcount},
+        )
+        db.execute(statement, rows)
+    return hashes
+
+
+def release_blobs(db: Session, hashes: list[str]) -> None:
+    """Drop references to ``hashes``, deleting blobs no row points at any more."""
+    references = Counter(hashes)
+    if not references:
+        return
+    db.execute(
+        update(_blobs)
+        .where(_blobs.c.hash == bindparam("blob_hash"))
+        .values(refcount=_blobs.c.refcount - bindparam("references")),
+        [{"blob_hash": h, "references": references[h]} for h in sorted(references)],
+    )
+    db.execute(
+        delete(HistoryBlob).where(
+            HistoryBlob.hash.in_(references), HistoryBlob.refcount <= 0
+        )
+    )
+
+
+def storage_report(db: Session) -> dict[str, int | float]:
+    """How much deduplication and compression save on the stored History."""
+    blobs = db.execute(
+        select(
+            func.count(),
+            func.coalesce(func.sum(HistoryBlob.refcount), 0),
+            func.coalesce(func.sum(HistoryBlob.size * HistoryBlob.refcount), 0),
+            func.coalesce(func.sum(HistoryBlob.size), 0),
+            func.coalesce(func.sum(func.octet_length(HistoryBlob.data)), 0),
+        )
+    ).one()
+    count, references, logical, unique, stored = blobs
+    dictionary_bytes = db.scalar(
+        select(func.coalesce(func.sum(func.octet_length(HistoryDictionary.data)), 0))
+    )
+    return {
+        "rows": db.scalar(select(func.count()).select_from(History)),
+        "blobs": count,
+        "references": references,
+        **summarize_storage(logical, unique, stored, dictionary_bytes),
+    }
@@ -0,0 +1,35 @@
+from sqlalchemy.dialects.postgresql import insert
+
+from db.models import AnalysisCacheEntry
+from db.session import SessionLocal
+from llm.cache import CachedResult
+
+
+class PostgresResultStore:
+    """Persistent tier of ``llm.cache.ResultCache`` backed by ``analysis_cache``."""
+
+    def get(self, key: str) -> CachedResult | None:
+        with SessionLocal() as db:
+            row = db.get(AnalysisCacheEntry, key)
+            if row is None:
+                return None
+            return CachedResult(
+                result=row.result,
+                target_language=row.target_language,
+                model=row.model,
+            )
+
+    def put(self, key: str, entry: CachedResult) -> None:
+        statement = (
+            insert(AnalysisCacheEntry)
+            .values(
+                key=key,
+                result=entry.result,
+                target_language=entry.target_language,
+                model=entry.model,
+            )
+            .on_conflict_do_nothing(index_elements=[AnalysisCacheEntry.key])
+        )
+        with SessionLocal() as db:
+            db.execute(statement)
+            db.commit()
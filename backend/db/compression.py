@@ -0,0 +1,149 @@
+import os
+import threading
+
+import zstandard
+
+HISTORY_ZSTD_LEVEL = int(os.getenv("HISTORY_ZSTD_LEVEL", "9"))
+# Size of the zstd dictionary trained on stored texts; 0 disables training.
+HISTORY_DICT_SIZE = int(os.getenv("HISTORY_DICT_SIZE", "65536"))
+# Texts stored without a dictionary before one is trained on them.
+HISTORY_DICT_SAMPLES = int(os.getenv("HISTORY_DICT_SAMPLES", "500"))
+
+
+class HistoryCodec:
+    """zstd compression of History texts, with dictionaries trained on them.
+
+    Prompts and interpretations share most of their vocabulary and all of their
+    Markdown scaffolding, which a trained dictionary captures once instead of in
+    every blob. Each blob records the id of the dictionary it was compressed
+    with (``None`` for none), so training a newer dictionary never invalidates
+    older blobs. Dictionaries are kept in memory once loaded; compressors are
+    per thread, as zstd contexts must not be shared.
+    """
+
+    def __init__(self, level: int = HISTORY_ZSTD_LEVEL):
+        self.level = level
+        self.active: int | None = None
+        # Set once the dictionaries stored so far have been loaded.
+        self.loaded = False
+        # Blobs written without a dictionary, counting towards training one.
+        self.plain_blobs = 0
+        self._dictionaries: dict[int, zstandard.ZstdCompressionDict] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self.compressed = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def add_dictionary(self, dictionary_id: int, data: bytes) -> None:
+        """Register a stored dictionary; the newest one compresses new blobs."""
+        dictionary = zstandard.ZstdCompressionDict(data)
+        with self._lock:
+            self._dictionaries[dictionary_id] = dictionary
+            if self.active is None or dictionary_id > self.active:
+                self.active = dictionary_id
+
+    def missing(self, dictionary_ids: set[int | None]) -> set[int]:
+        with self._lock:
+            return {i for i in dictionary_ids if i is not None} - set(
+                self._dictionaries
+            )
+
+    def train(self, samples: list[str], size: int = HISTORY_DICT_SIZE) -> bytes:
+        dictionary = zstandard.train_dictionary(
+            size, [sample.encode("utf-8") for sample in samples], level=self.level
+        )
+        return dictionary.as_bytes()
+
+    def compress(self, text: str) -> tuple[bytes, int | None]:
+        """Compress ``text``; returns the data and the dictionary id it needs."""
+        dictionary_id = self.active
+        raw = text.encode("utf-8")
+        data = self._compressor(dictionary_id).compress(raw)
+        with self._lock:
+            self.compressed += 1
+            self.raw_bytes += len(raw)
+            self.stored_bytes += len(data)
+            if dictionary_id is None:
+                self.plain_blobs += 1
+        return data, dictionary_id
+
+    def decompress(self, data: bytes, dictionary_id: int | None) -> str:
+        return self._decompressor(dictionary_id).decompress(data).decode("utf-8")
+
+    def _contexts(self) -> dict:
+        if not hasattr(self._local, "contexts"):
+            self._local.contexts = {}
+        return self._local.contexts
+
+    def _dictionary(self, dictionary_id: int | None):
+        if dictionary_id is None:
+            return None
+        with self._lock:
+            dictionary = self._dictionaries.get(dictionary_id)
+        if dictionary is None:
+            raise KeyError(f"History dictionary {dictionary_id} is not loaded")
+        return dictionary
+
+    def _compressor(self, dictionary_id: int | None) -> zstandard.ZstdCompressor:
+        contexts = self._contexts()
+        key = ("c", dictionary_id)
+        if key not in contexts:
+            contexts[key] = zstandard.ZstdCompressor(
+                level=self.level, dict_data=self._dictionary(dictionary_id)
+            )
+        return contexts[key]
+
+    def _decompressor(self, dictionary_id: int | None) -> zstandard.ZstdDecompressor:
+        contexts = self._contexts()
+        key = ("d", dictionary_id)
+        if key not in contexts:
+            contexts[key] = zstandard.ZstdDecompressor(
+                dict_data=self._dictionary(dictionary_id)
+            )
+        return contexts[key]
+
+    def stats(self) -> dict[str, int | float | None]:
+        with self._lock:
+            return {
+                "level": self.level,
+                "dictionaries": len(self._dictionaries),
+                "active_dictionary": self.active,
+                "compressed": self.compressed,
+                "raw_bytes": self.raw_bytes,
+                "stored_bytes": self.stored_bytes,
+                "ratio": round(self.raw_bytes / self.stored_bytes, 3)
+                if self.stored_bytes
+                else None,
+            }
+
+
+def summarize_storage(
+    logical_bytes: int, unique_bytes: int, blob_bytes: int, dictionary_bytes: int
+) -> dict[str, int | float]:
+    """Savings of deduplication and compression over storing every text as is.
+
+    ``logical_bytes`` is the UTF-8 size of every prompt and result as written,
+    ``unique_bytes`` that of the distinct texts, ``blob_bytes`` their compressed
+    size, to which the dictionaries are added.
+    """
+    stored = blob_bytes + dictionary_bytes
+
+    def ratio(before: int, after: int) -> float:
+        return round(before / after, 3) if after else 0.0
+
+    return {
+        "logical_bytes": logical_bytes,
+        "unique_bytes": unique_bytes,
+        "blob_bytes": blob_bytes,
+        "dictionary_bytes": dictionary_bytes,
+        "stored_bytes": stored,
+        "dedup_ratio": ratio(logical_bytes, unique_bytes),
+        "compression_ratio": ratio(unique_bytes, stored),
+        "total_ratio": ratio(logical_bytes, stored),
+        "saved_bytes": logical_bytes - stored,
+    }
+
+
+history_codec = HistoryCodec()
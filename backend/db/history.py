@@ -0,0 +1,155 @@
+import base64
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import Row, Select, delete, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+
+from db import HISTORY_PAGE_MAX
+from db.blobs import load_dictionaries, release_blobs
+from db.models import HISTORY_SEARCH_CONFIG, History
+
+HISTORY_PREVIEW_CHARS = 200
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, _, row_id = base64.urlsafe_b64decode(padded).decode().partition("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except ValueError as exc:
+        raise InvalidCursorError("Invalid history cursor") from exc
+
+
+def history_page_query(
+    owner: str,
+    limit: int,
+    cursor: str | None = None,
+    query: str | None = None,
+) -> Select:
+    """Newest-first page of ``owner``'s lightweight rows, continuing after
+    ``cursor``.
+
+    Pages are addressed by the last (timestamp, id) seen rather than an offset,
+    so every page is an index range scan on ``ix_history_owner_timestamp_id``
+    no matter how deep it is. Only the stored preview is selected, never the
+    texts, so no blob is read or decompressed. One extra row is fetched to
+    detect the last page.
+    """
+    statement = (
+        select(
+            History.id,
+            History.preview,
+            History.target_language,
+            History.model,
+            History.timestamp,
+        )
+        .where(History.owner == owner)
+        .order_by(History.timestamp.desc(), History.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        timestamp, row_id = decode_cursor(cursor)
+        statement = statement.where(
+            tuple_(History.timestamp, History.id) < tuple_(timestamp, row_id)
+        )
+    if query:
+        statement = statement.where(
+            History.search_vector.op("@@")(
+                func.websearch_to_tsquery(HISTORY_SEARCH_CONFIG, query)
+            )
+        )
+    return statement
+
+
+def _page(rows: list[Row], limit: int) -> dict[str, Any]:
+    items = [
+        {
+            "id": row.id,
+            "preview": row.preview,
+            "target_language": row.target_language,
+            "model": row.model,
+            "timestamp": row.timestamp.isoformat(),
+        }
+        for row in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last.timestamp, last.id)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def _clamp(limit: int) -> int:
+    return max(1, min(limit, HISTORY_PAGE_MAX))
+
+
+def list_history(
+    db: Session,
+    owner: str,
+    limit: int,
+    cursor: str | None = None,
+    query: str | None = None,
+) -> dict[str, Any]:
+    limit = _clamp(limit)
+    rows = db.execute(history_page_query(owner, limit, cursor, query)).all()
+    return _page(rows, limit)
+
+
+async def alist_history(
+    db: AsyncSession,
+    owner: str,
+    limit: int,
+    cursor: str | None = None,
+    query: str | None = None,
+) -> dict[str, Any]:
+    limit = _clamp(limit)
+    rows = (await db.execute(history_page_query(owner, limit, cursor, query))).all()
+    return _page(rows, limit)
+
+
+# The texts come with the row in one query and are decompressed when read. Rows
+# of other owners are reported missing, not forbidden.
+_WITH_BLOBS = (joinedload(History.prompt_blob), joinedload(History.result_blob))
+
+
+def get_history(db: Session, owner: str, row_id: int) -> dict[str, Any] | None:
+    row = db.get(History, row_id, options=_WITH_BLOBS)
+    if row is None or row.owner != owner:
+        return None
+    load_dictionaries(db, row.dictionary_ids)
+    return row.to_dict()
+
+
+async def aget_history(
+    db: AsyncSession, owner: str, row_id: int
+) -> dict[str, Any] | None:
+    row = await db.get(History, row_id, options=_WITH_BLOBS)
+    if row is None or row.owner != owner:
+        return None
+    await db.run_sync(load_dictionaries, row.dictionary_ids)
+    return row.to_dict()
+
+
+def delete_history(db: Session, owner: str, row_id: int) -> bool:
+    """Delete one of ``owner``'s rows, releasing its texts; False if there is
+    no such row. Blobs no other row references are deleted with it."""
+    row = db.execute(
+        delete(History)
+        .where(History.id == row_id, History.owner == owner)
+        .returning(History.prompt_hash, History.result_hash)
+    ).first()
+    if row is None:
+        return False
+    release_blobs(db, [row.prompt_hash, row.result_hash])
+    return True
@@ -0,0 +1,88 @@
+from sqlalchemy import bindparam, func, insert, select
+
+from db.blobs import store_blobs
+from db.history import HISTORY_PREVIEW_CHARS
+from db.models import HISTORY_SEARCH_CONFIG, History
+from db.session import SessionLocal
+from llm.similarity import NearDuplicateIndex, analysis_scope
+
+# Texts live in ``history_blob``; the search vector is built from them here.
+_INSERT_HISTORY = insert(History.__table__).values(
+    search_vector=func.to_tsvector(HISTORY_SEARCH_CONFIG, bindparam("search_text"))
+)
+
+
+def history_rows(rows: list[dict], hashes: list[str]) -> list[dict]:
+    """INSERT parameters for ``rows``, given the hashes of their prompts and
+    then their results, in the order ``store_blobs`` returned them."""
+    prompt_hashes, result_hashes = hashes[: len(rows)], hashes[len(rows) :]
+    return [
+        {
+            "owner": row.get("owner"),
+            "prompt_hash": prompt_hash,
+            "result_hash": result_hash,
+            "preview": row["prompt"][:HISTORY_PREVIEW_CHARS],
+            "search_text": f"{row['prompt']} {row['result']}",
+            "target_language": row["target_language"],
+            "model": row.get("model"),
+            "stage_timings": row.get("stage_timings"),
+            "cache_key": row.get("cache_key"),
+            "signature": row.get("signature"),
+        }
+        for row, prompt_hash, result_hash in zip(
+            rows, prompt_hashes, result_hashes, strict=True
+        )
+    ]
+
+
+def insert_history_batch(rows: list[dict]) -> None:
+    """Persist a batch of analyses with one multi-row INSERT.
+
+    Prompts and results are stored once per distinct text, compressed, in
+    ``history_blob``; the rows reference them by hash.
+    """
+    with SessionLocal() as db:
+        texts = [row["prompt"] for row in rows] + [row["result"] for row in rows]
+        hashes = store_blobs(db, texts)
+        db.execute(_INSERT_HISTORY, history_rows(rows, hashes))
+        db.commit()
+
+
+def load_near_duplicates(index: NearDuplicateIndex, batch: int = 10000) -> int:
+    """Fill ``index`` with the signatures of the latest History rows, up to its
+    capacity, oldest first; returns how many were loaded."""
+    latest = (
+        select(
+            History.id,
+            History.signature,
+            History.owner,
+            History.target_language,
+            History.model,
+            History.cache_key,
+        )
+        .where(
+            History.signature.is_not(None),
+            History.cache_key.is_not(None),
+            History.owner.is_not(None),
+        )
+        .order_by(History.id.desc())
+        .limit(index.max_documents)
+        .subquery()
+    )
+    statement = (
+        select(
+            latest.c.signature,
+            latest.c.owner,
+            latest.c.target_language,
+            latest.c.model,
+            latest.c.cache_key,
+        )
+        .order_by(latest.c.id)
+        .execution_options(yield_per=batch)
+    )
+    with SessionLocal() as db:
+        rows = db.execute(statement)
+        return index.load(
+            (bytes(signature), analysis_scope(owner, language, model), cache_key)
+            for signature, owner, language, model, cache_key in rows
+        )
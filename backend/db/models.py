@@ -1,17 +1,98 @@
-from sqlalchemy import Column, DateTime, Integer, Text, func
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import (
+    JSON,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    Text,
+    func,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import declarative_base, relationship
+
+from db.compression import history_codec
 
 Base = declarative_base()
 
+HISTORY_SEARCH_CONFIG = "simple"
+# How the search vector was computed from the legacy text columns.
+HISTORY_SEARCH_EXPRESSION = (
+    f"to_tsvector('{HISTORY_SEARCH_CONFIG}', "
+    "coalesce(prompt, '') || ' ' || coalesce(result, ''))"
+)
+
+
+class HistoryDictionary(Base):
+    __tablename__ = "history_dictionary"
+
+    id = Column(Integer, primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    timestamp = Column(DateTime, server_default=func.now())
+
+
+class HistoryBlob(Base):
+    """A prompt or result, stored once per distinct text and zstd-compressed."""
+
+    __tablename__ = "history_blob"
+
+    # SHA-256 of the UTF-8 text.
+    hash = Column(Text, primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    dictionary_id = Column(Integer, ForeignKey("history_dictionary.id"))
+    # Uncompressed size in bytes.
+    size = Column(Integer, nullable=False)
+    # History columns pointing at this blob; it is deleted when none are left.
+    refcount = Column(Integer, nullable=False, server_default="1")
+
+    @property
+    def text(self) -> str:
+        return history_codec.decompress(self.data, self.dictionary_id)
+
 
 class History(Base):
     __tablename__ = "history"
 
     id = Column(Integer, primary_key=True)
-    prompt = Column(Text, nullable=False)
-    result = Column(Text, nullable=False)
+    # SHA-256 of the Gemini key the analysis was requested with; rows are only
+    # listed and returned to callers sending the same key.
+    owner = Column(Text)
+    prompt_hash = Column(Text, ForeignKey("history_blob.hash"), nullable=False)
+    result_hash = Column(Text, ForeignKey("history_blob.hash"), nullable=False)
+    preview = Column(Text, nullable=False, server_default="")
     target_language = Column(Text, nullable=False, server_default="EN")
+    model = Column(Text)
+    stage_timings = Column(JSON)
     timestamp = Column(DateTime, server_default=func.now())
+    # Result cache key and MinHash signature of the prompt, which rebuild the
+    # near-duplicate index (``llm.similarity``) on startup.
+    cache_key = Column(Text)
+    signature = Column(LargeBinary)
+    # Computed on insert: the texts it is built from are compressed.
+    search_vector = Column(TSVECTOR)
+
+    # Loaded explicitly with the row; the texts decompress on first access.
+    prompt_blob = relationship(HistoryBlob, foreign_keys=[prompt_hash], lazy="raise")
+    result_blob = relationship(HistoryBlob, foreign_keys=[result_hash], lazy="raise")
+
+    __table_args__ = (
+        # Serves keyset pagination in both directions of (timestamp, id), per owner.
+        Index("ix_history_owner_timestamp_id", "owner", "timestamp", "id"),
+        Index("ix_history_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
+    @property
+    def prompt(self) -> str:
+        return self.prompt_blob.text
+
+    @property
+    def result(self) -> str:
+        return self.result_blob.text
+
+    @property
+    def dictionary_ids(self) -> set[int | None]:
+        return {self.prompt_blob.dictionary_id, self.result_blob.dictionary_id}
 
     def to_dict(self):
         return {
@@ -19,5 +100,17 @@ class History(Base):
             "prompt": self.prompt,
             "result": self.result,
             "target_language": self.target_language,
+            "model": self.model,
+            "stage_timings": self.stage_timings,
             "timestamp": self.timestamp.isoformat(),
         }
+
+
+class AnalysisCacheEntry(Base):
+    __tablename__ = "analysis_cache"
+
+    key = Column(Text, primary_key=True)
+    result = Column(Text, nullable=False)
+    target_language = Column(Text, nullable=False)
+    model = Column(Text, nullable=False)
+    timestamp = Column(DateTime, server_default=func.now())
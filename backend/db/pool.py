@@ -0,0 +1,94 @@
+import threading
+import time
+from typing import TYPE_CHECKING
+
+# SQLAlchemy is only imported once the database is set up, so the pool metrics
+# can be exported without it.
+if TYPE_CHECKING:
+    from sqlalchemy.pool import Pool
+
+
+class PoolMetrics:
+    """Checkout latency and saturation of one connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pool: "Pool | None" = None
+        self.checkouts = 0
+        self.timeouts = 0
+        self.overflow_events = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_checkout(self, waited: float, overflowed: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            if overflowed:
+                self.overflow_events += 1
+
+    def record_timeout(self, waited: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            waits = self.checkouts + self.timeouts
+            stats = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "overflow_events": self.overflow_events,
+                "wait_ms_mean": (
+                    round(self.wait_seconds_total / waits * 1000, 3) if waits else 0.0
+                ),
+                "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+            }
+        pool = self.pool
+        if pool is not None:
+            stats["size"] = pool.size()
+            stats["in_use"] = pool.checkedout()
+            stats["overflow"] = max(0, pool.overflow())
+        return stats
+
+
+class _InstrumentedPool:
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+        # ``_do_get`` covers the whole checkout: waiting for a free connection
+        # and, when the pool has room, opening a new one.
+        self.metrics.pool = self
+        overflow_before = self.overflow()
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_timeout(time.perf_counter() - started)
+            raise
+        self.metrics.record_checkout(
+            time.perf_counter() - started,
+            overflowed=self.overflow() > max(0, overflow_before),
+        )
+        return connection
+
+
+def instrumented(pool_class: type["Pool"], metrics: PoolMetrics) -> type["Pool"]:
+    """Subclass ``pool_class`` so every checkout is reported to ``metrics``.
+
+    The metrics live on the class so they survive ``engine.dispose()``, which
+    builds a fresh pool of the same class.
+    """
+    return type(
+        f"Instrumented{pool_class.__name__}",
+        (_InstrumentedPool, pool_class),
+        {"metrics": metrics},
+    )
+
+
+sync_pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
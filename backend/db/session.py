@@ -1,9 +1,15 @@
 import os
 
 from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
-from db.models import Base
+from db.blobs import load_dictionaries, store_blobs, train_dictionary
+from db.compression import HISTORY_DICT_SAMPLES, history_codec
+from db.history import HISTORY_PREVIEW_CHARS
+from db.models import HISTORY_SEARCH_EXPRESSION, Base
+from db.pool import async_pool_metrics, instrumented, sync_pool_metrics
 
 pg_user = os.getenv("POSTGRES_USER")
 pg_password = os.getenv("POSTGRES_PASSWORD")
@@ -17,30 +23,169 @@ if not all((pg_user, pg_password, pg_db)):
         "Please set POSTGRES_USER, POSTGRES_PASSWORD, and POSTGRES_DB."
     )
 
-DATABASE_URL = (
-    f"postgresql+psycopg2://{pg_user}:{pg_password}@{pg_host}:{pg_port}/{pg_db}"
-)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", str(DB_POOL_SIZE)))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", str(DB_MAX_OVERFLOW)))
+
+_credentials = f"{pg_user}:{pg_password}@{pg_host}:{pg_port}/{pg_db}"
+DATABASE_URL = f"postgresql+psycopg2://{_credentials}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{_credentials}"
 
-engine = create_engine(DATABASE_URL, pool_size=5, max_overflow=10, pool_pre_ping=True)
+# Used from worker threads (write-behind batches, the persistent cache tier).
+engine = create_engine(
+    DATABASE_URL,
+    poolclass=instrumented(QueuePool, sync_pool_metrics),
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Used directly from async routes without blocking the event loop.
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=instrumented(AsyncAdaptedQueuePool, async_pool_metrics),
+    pool_size=ASYNC_DB_POOL_SIZE,
+    max_overflow=ASYNC_DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+
+_HISTORY_COLUMNS = {
+    "target_language": "TEXT DEFAULT 'EN' NOT NULL",
+    "model": "TEXT",
+    "stage_timings": "JSON",
+    "preview": "TEXT DEFAULT '' NOT NULL",
+    "search_vector": "TSVECTOR",
+    "cache_key": "TEXT",
+    "signature": "BYTEA",
+    # Rows from before it have no owner and are no longer listed to anyone.
+    "owner": "TEXT",
+}
+
+# ``create_all`` only creates indexes together with a new table.
+_HISTORY_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_history_owner_timestamp_id "
+    "ON history (owner, timestamp, id)",
+    # Superseded by the per-owner index above.
+    "DROP INDEX IF EXISTS ix_history_timestamp_id",
+    "CREATE INDEX IF NOT EXISTS ix_history_search_vector ON history "
+    "USING gin (search_vector)",
+)
+
+# Blobs are compressed already; TOAST should not try to compress them again.
+_BLOB_STORAGE = "ALTER TABLE history_blob ALTER COLUMN data SET STORAGE EXTERNAL"
+
+HISTORY_MIGRATION_BATCH = int(os.getenv("HISTORY_MIGRATION_BATCH", "500"))
+
+_LEGACY_SAMPLE = text(
+    "SELECT prompt, result FROM history ORDER BY id DESC LIMIT :limit"
+)
+_LEGACY_BATCH = text(
+    "SELECT id, prompt, result FROM history WHERE prompt_hash IS NULL "
+    "ORDER BY id LIMIT :limit"
+)
+_LEGACY_UPDATE = text(
+    "UPDATE history SET prompt_hash = :prompt_hash, result_hash = :result_hash, "
+    f"preview = :preview, search_vector = {HISTORY_SEARCH_EXPRESSION} WHERE id = :id"
+)
+_LEGACY_FINISH = (
+    "ALTER TABLE history DROP COLUMN prompt, DROP COLUMN result, "
+    "ALTER COLUMN prompt_hash SET NOT NULL, ALTER COLUMN result_hash SET NOT NULL",
+    "ALTER TABLE history ADD CONSTRAINT history_prompt_hash_fkey "
+    "FOREIGN KEY (prompt_hash) REFERENCES history_blob (hash)",
+    "ALTER TABLE history ADD CONSTRAINT history_result_hash_fkey "
+    "FOREIGN KEY (result_hash) REFERENCES history_blob (hash)",
+)
+
+
+def _migrate_history_texts(columns: list[str]) -> None:
+    """Move ``history.prompt`` and ``history.result`` into ``history_blob``.
+
+    Rows are moved in committed batches, so an interrupted migration resumes
+    where it stopped; the text columns are dropped once every row points at
+    its blobs. The search vector stops being generated from the text columns
+    and is filled from them once more on the way.
+    """
+    with engine.connect() as conn:
+        for name in ("prompt_hash", "result_hash"):
+            if name not in columns:
+                conn.execute(text(f"ALTER TABLE history ADD COLUMN {name} TEXT"))
+        conn.execute(
+            text(
+                "ALTER TABLE history ALTER COLUMN search_vector "
+                "DROP EXPRESSION IF EXISTS"
+            )
+        )
+        conn.commit()
+
+    moved = 0
+    with SessionLocal() as db:
+        load_dictionaries(db)
+        if history_codec.active is None:
+            sample = db.execute(_LEGACY_SAMPLE, {"limit": HISTORY_DICT_SAMPLES})
+            train_dictionary(db, [t for row in sample for t in row])
+            db.commit()
+
+        while rows := db.execute(
+            _LEGACY_BATCH, {"limit": HISTORY_MIGRATION_BATCH}
+        ).all():
+            texts = [row.prompt for row in rows] + [row.result for row in rows]
+            hashes = store_blobs(db, texts)
+            db.execute(
+                _LEGACY_UPDATE,
+                [
+                    {
+                        "id": row.id,
+                        "prompt_hash": hashes[i],
+                        "result_hash": hashes[len(rows) + i],
+                        "preview": row.prompt[:HISTORY_PREVIEW_CHARS],
+                    }
+                    for i, row in enumerate(rows)
+                ],
+            )
+            db.commit()
+            moved += len(rows)
+
+    with engine.connect() as conn:
+        for statement in _LEGACY_FINISH:
+            conn.execute(text(statement))
+        conn.commit()
+    print(f"Moved {moved} 'history' rows to compressed blobs.")
+
 
 def init_db():
     Base.metadata.create_all(bind=engine)
     try:
         inspector = inspect(engine)
         columns = [c["name"] for c in inspector.get_columns("history")]
-        if "target_language" not in columns:
-            with engine.connect() as conn:
-                conn.execute(
-                    text(
-                        "ALTER TABLE history ADD COLUMN target_language "
-                        "TEXT DEFAULT 'EN' NOT NULL"
-                    )
-                )
-                conn.commit()
-                print("Added column 'target_language' to 'history' table.")
+        missing = {
+            name: ddl for name, ddl in _HISTORY_COLUMNS.items() if name not in columns
+        }
+        with engine.connect() as conn:
+            for name, ddl in missing.items():
+                conn.execute(text(f"ALTER TABLE history ADD COLUMN {name} {ddl}"))
+                print(f"Added column '{name}' to 'history' table.")
+            conn.execute(text(_BLOB_STORAGE))
+            conn.commit()
+        if "prompt" in columns:
+            _migrate_history_texts(columns)
+        with engine.connect() as conn:
+            for statement in _HISTORY_INDEXES:
+                conn.execute(text(statement))
+            conn.commit()
     except Exception as e:
         print(f"Migration error: {e}")
 
@@ -51,3 +196,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
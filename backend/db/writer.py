@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+from collections.abc import Callable
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+HISTORY_QUEUE_SIZE = int(os.getenv("HISTORY_QUEUE_SIZE", "10000"))
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "200"))
+HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", "1.0"))
+HISTORY_QUEUE_POLICY = os.getenv("HISTORY_QUEUE_POLICY", "drop").lower()
+HISTORY_BLOCK_TIMEOUT = float(os.getenv("HISTORY_BLOCK_TIMEOUT", "0.5"))
+
+QUEUE_POLICIES = {"drop", "block"}
+
+if HISTORY_QUEUE_POLICY not in QUEUE_POLICIES:
+    raise ValueError(
+        f"HISTORY_QUEUE_POLICY must be one of: {', '.join(sorted(QUEUE_POLICIES))}"
+    )
+
+Row = dict[str, Any]
+Sink = Callable[[list[Row]], None]
+
+
+class HistoryWriter:
+    """Write-behind buffer that persists rows in batches off the request path.
+
+    Rows are queued in memory and flushed by a background task once
+    ``batch_size`` rows are waiting or ``flush_interval`` seconds have passed.
+    The queue is bounded: with the ``drop`` policy a full queue rejects the row
+    immediately; with ``block`` the caller waits up to ``block_timeout``
+    seconds for room before the row is dropped. Either way a slow database can
+    never grow memory without bound or stall an analysis indefinitely.
+
+    The sink is a blocking callable (a bulk INSERT) and runs in a worker thread.
+    A batch the sink fails on is logged and counted, not retried.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = HISTORY_QUEUE_SIZE,
+        batch_size: int = HISTORY_BATCH_SIZE,
+        flush_interval: float = HISTORY_FLUSH_INTERVAL,
+        policy: str = HISTORY_QUEUE_POLICY,
+        block_timeout: float = HISTORY_BLOCK_TIMEOUT,
+    ):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.max_queue = max_queue
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self._sink: Sink | None = None
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, sink: Sink) -> None:
+        if self.running:
+            return
+        self._sink = sink
+        self._queue = asyncio.Queue(self.max_queue)
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Flush everything still queued, then stop the background task."""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        # ``None`` tells the flush loop to drain and exit.
+        await self._queue.put(None)
+        await task
+
+    async def submit(self, row: Row) -> bool:
+        """Queue ``row`` for persistence; False if it was dropped."""
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if self.policy == "block":
+            try:
+                async with asyncio.timeout(self.block_timeout):
+                    await self._queue.put(row)
+                return True
+            except TimeoutError:
+                pass
+
+        self.dropped += 1
+        return False
+
+    async def _flush_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch: list[Row] = []
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch.append(first)
+
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    async with asyncio.timeout_at(deadline):
+                        row = await self._queue.get()
+                except TimeoutError:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+
+            await self._write(batch)
+
+        # Drain whatever was submitted before ``stop`` was called.
+        rest: list[Row] = []
+        while not self._queue.empty():
+            row = self._queue.get_nowait()
+            if row is not None:
+                rest.append(row)
+        for start in range(0, len(rest), self.batch_size):
+            await self._write(rest[start : start + self.batch_size])
+
+    async def _write(self, batch: list[Row]) -> None:
+        try:
+            await asyncio.to_thread(self._sink, batch)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("Failed to persist %d history rows", len(batch))
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+    def stats(self) -> dict[str, int | str | bool]:
+        return {
+            "running": self.running,
+            "policy": self.policy,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+
+history_writer = HistoryWriter()
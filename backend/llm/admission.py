@@ -0,0 +1,310 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass, field
+
+from llm.metrics import metrics
+
+ADMISSION_MODEL_LIMITS = os.getenv(
+    "ADMISSION_MODEL_LIMITS", "gemini-2.5-flash=32,gemini-2.5-pro=8"
+)
+ADMISSION_DEFAULT_LIMIT = int(os.getenv("ADMISSION_DEFAULT_LIMIT", "16"))
+# Sustained analyses per second allowed per API key, and how many may burst.
+# A rate of 0 disables per-key limiting.
+ADMISSION_KEY_RATE = float(os.getenv("ADMISSION_KEY_RATE", "2"))
+ADMISSION_KEY_BURST = float(os.getenv("ADMISSION_KEY_BURST", "20"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "256"))
+ADMISSION_MAX_KEYS = int(os.getenv("ADMISSION_MAX_KEYS", "10000"))
+
+
+def parse_model_limits(raw: str) -> dict[str, int]:
+    limits = {}
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        model, sep, limit = item.partition("=")
+        if not sep or not limit.strip().isdigit() or int(limit) < 1:
+            raise ValueError(
+                f"Invalid ADMISSION_MODEL_LIMITS entry {item!r}; "
+                "expected model=limit with limit >= 1."
+            )
+        limits[model.strip()] = int(limit)
+    return limits
+
+
+admission_wait = metrics.histogram(
+    "admission_wait_seconds",
+    "Time analyses spent queued for an upstream model slot.",
+    ("model",),
+)
+admission_rejections = metrics.counter(
+    "admission_rejections_total",
+    "Analyses refused with 429, by reason.",
+    ("model", "reason"),
+)
+
+
+class AdmissionRejectedError(Exception):
+    """The analysis cannot start soon enough; retry after ``retry_after`` seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Too many analyses in progress ({reason}). Retry later.")
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def reserve(self, now: float, max_wait: float) -> float:
+        """Take a token, returning how long to wait before using it.
+
+        Tokens may go negative: a reservation is a promise of a future token, so
+        callers queue in arrival order. Raises if the wait would exceed
+        ``max_wait``, without taking anything.
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        if wait > max_wait:
+            raise AdmissionRejectedError("rate_limited", wait)
+        self.tokens -= 1
+        return wait
+
+
+@dataclass
+class _ModelGate:
+    limit: int
+    in_flight: int = 0
+    # Waiters grouped by key; keys are served round-robin so one busy key
+    # cannot starve the others.
+    waiters: OrderedDict[str, deque[asyncio.Future]] = field(
+        default_factory=OrderedDict
+    )
+    queued: int = 0
+    admitted: int = 0
+    rejected: int = 0
+    # Moving average of how long a slot is held, to estimate Retry-After.
+    hold_seconds: float = 5.0
+
+    def next_waiter(self) -> asyncio.Future | None:
+        while self.waiters:
+            key, queue = next(iter(self.waiters.items()))
+            future = queue.popleft()
+            if queue:
+                self.waiters.move_to_end(key)
+            else:
+                del self.waiters[key]
+            self.queued -= 1
+            if not future.done():
+                return future
+        return None
+
+    def remove(self, key: str, future: asyncio.Future) -> None:
+        queue = self.waiters.get(key)
+        if queue is None or future not in queue:
+            return
+        queue.remove(future)
+        self.queued -= 1
+        if not queue:
+            del self.waiters[key]
+
+    def estimated_wait(self, position: int) -> float:
+        return self.hold_seconds * (position // self.limit + 1)
+
+
+class AdmissionLease:
+    """A granted model slot; release it exactly once when the upstream is done."""
+
+    def __init__(self, controller: "AdmissionController", model: str, started: float):
+        self._controller = controller
+        self._model = model
+        self._started = started
+        self._released = False
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(self._model, self._started)
+
+    async def __aenter__(self) -> "AdmissionLease":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """Admission in front of the upstream LLM: per-model concurrency limits,
+    per-key token buckets and a fair queue with a bounded wait.
+
+    A request first reserves a token from its key's bucket, then takes a slot
+    for its model, queueing behind other keys round-robin when the model is
+    saturated. Whenever neither can be had within ``max_wait`` the request is
+    refused at once with an estimated retry delay rather than left hanging.
+    """
+
+    def __init__(
+        self,
+        limits: Mapping[str, int] | None = None,
+        default_limit: int = ADMISSION_DEFAULT_LIMIT,
+        key_rate: float = ADMISSION_KEY_RATE,
+        key_burst: float = ADMISSION_KEY_BURST,
+        max_wait: float = ADMISSION_MAX_WAIT_SECONDS,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        max_keys: int = ADMISSION_MAX_KEYS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if limits is None:
+            limits = parse_model_limits(ADMISSION_MODEL_LIMITS)
+        self.limits = dict(limits)
+        self.default_limit = default_limit
+        self.key_rate = key_rate
+        self.key_burst = max(1.0, key_burst)
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.max_keys = max_keys
+        self._clock = clock
+        self._gates: dict[str, _ModelGate] = {}
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self.rate_limited = 0
+
+    def _gate(self, model: str) -> _ModelGate:
+        gate = self._gates.get(model)
+        if gate is None:
+            limit = self.limits.get(model, self.default_limit)
+            gate = self._gates[model] = _ModelGate(limit)
+        return gate
+
+    def _reserve_token(self, key: str, now: float) -> float:
+        if self.key_rate <= 0:
+            return 0.0
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(
+                self.key_rate, self.key_burst, now
+            )
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.reserve(now, self.max_wait)
+
+    def _refund(self, key: str) -> None:
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.tokens = min(bucket.burst, bucket.tokens + 1)
+
+    def _reject(self, gate: _ModelGate, model: str, error: AdmissionRejectedError):
+        gate.rejected += 1
+        admission_rejections.inc(model=model, reason=error.reason)
+        return error
+
+    async def acquire(self, key: str, model: str) -> AdmissionLease:
+        gate = self._gate(model)
+        started = self._clock()
+
+        try:
+            token_wait = self._reserve_token(key, started)
+        except AdmissionRejectedError as error:
+            self.rate_limited += 1
+            raise self._reject(gate, model, error)
+        if token_wait:
+            # Pace the key before it competes for a model slot.
+            try:
+                await asyncio.sleep(token_wait)
+            except asyncio.CancelledError:
+                self._refund(key)
+                raise
+
+        if gate.in_flight >= gate.limit or gate.queued:
+            if gate.queued >= self.max_queue:
+                self._refund(key)
+                raise self._reject(
+                    gate,
+                    model,
+                    AdmissionRejectedError(
+                        "queue_full", gate.estimated_wait(gate.queued)
+                    ),
+                )
+            future = asyncio.get_running_loop().create_future()
+            gate.waiters.setdefault(key, deque()).append(future)
+            gate.queued += 1
+            try:
+                async with asyncio.timeout(self.max_wait):
+                    await future
+            except TimeoutError:
+                # Awaiting the future cancelled it unless the slot was granted.
+                if future.cancelled():
+                    gate.remove(key, future)
+                    self._refund(key)
+                    raise self._reject(
+                        gate,
+                        model,
+                        AdmissionRejectedError(
+                            "queue_timeout", gate.estimated_wait(gate.queued)
+                        ),
+                    )
+                # The slot was handed over as the deadline passed; keep it.
+            except asyncio.CancelledError:
+                gate.remove(key, future)
+                self._refund(key)
+                if future.done() and not future.cancelled():
+                    # The slot was handed over just as we gave up; pass it on.
+                    self._release(model, None)
+                raise
+        else:
+            gate.in_flight += 1
+
+        granted = self._clock()
+        gate.admitted += 1
+        admission_wait.observe(granted - started, model=model)
+        return AdmissionLease(self, model, granted)
+
+    def _release(self, model: str, started: float | None) -> None:
+        gate = self._gates[model]
+        if started is not None:
+            held = self._clock() - started
+            gate.hold_seconds = 0.8 * gate.hold_seconds + 0.2 * held
+        waiter = gate.next_waiter()
+        if waiter is not None:
+            # Hand the slot straight to the next waiter; in_flight is unchanged.
+            waiter.set_result(None)
+        else:
+            gate.in_flight -= 1
+
+    def queue_depth(self) -> int:
+        return sum(gate.queued for gate in self._gates.values())
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "queued": self.queue_depth(),
+            "in_flight": sum(gate.in_flight for gate in self._gates.values()),
+            "rate_limited": self.rate_limited,
+            "keys": len(self._buckets),
+            "models": {
+                model: {
+                    "limit": gate.limit,
+                    "in_flight": gate.in_flight,
+                    "queued": gate.queued,
+                    "admitted": gate.admitted,
+                    "rejected": gate.rejected,
+                    "hold_seconds": round(gate.hold_seconds, 3),
+                }
+                for model, gate in self._gates.items()
+            },
+        }
+
+
+admission = AdmissionController()
@@ -1,30 +1,115 @@
+import asyncio
+import os
+import time
 from collections.abc import AsyncIterator
 
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langgraph.graph import END, START, StateGraph
 
+from llm.batch import DetectionMemo
+from llm.cache import CachedResult, make_section_key, result_cache
+from llm.cleanup import OCR_RESIDUAL_THRESHOLD, Cleanup, cleanup, cleanup_stats
+from llm.detector import LOCAL_DETECT_MIN_CONFIDENCE, detect_text, needs_correction
+from llm.metrics import (
+    analyses_cancelled,
+    analysis_errors,
+    cancelled_tokens,
+    chunk_rate,
+    incremental_sections,
+    interpret_fallbacks,
+    output_rate,
+    stage_duration,
+)
+from llm.pipeline import STAGE_TIMEOUTS, Event, Stage, StageTimeoutError, run_stages
 from llm.prompts import CORRECTION_SYS_PROMPT, EXAM_SYS_PROMPT
-from llm.state import MultiAgentState, build_analysis_prompt, create_initial_state
+from llm.resilience import LLM_SDK_MAX_RETRIES, upstream
+from llm.segmentation import (
+    INCREMENTAL_MIN_SECTION_TOKENS,
+    LONG_TEXT_CONCURRENCY,
+    LONG_TEXT_MIN_TOKENS,
+    LONG_TEXT_SEGMENT_TOKENS,
+    LONG_TEXT_SYNTHESIS,
+    SEGMENT_SEPARATOR,
+    estimate_tokens,
+    outline,
+    split_sections,
+    split_segments,
+    stream_in_order,
+)
+from llm.speculation import (
+    SPECULATIVE_CORRECTION,
+    SpeculativeCorrection,
+    should_speculate,
+    speculation_stats,
+)
+from llm.state import (
+    AnalysisContext,
+    MultiAgentState,
+    build_analysis_prompt,
+    build_section_prompt,
+    build_segment_prompt,
+    build_synthesis_prompt,
+    create_initial_state,
+)
 from schemas.analyze import TextDerectives
 
+LITE_MODEL = "gemini-2.5-flash-lite"
+# Points the Gemini clients at another endpoint, e.g. the benchmark stand-in.
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL") or None
+
 
 class TextAnalysisLangchain:
-    def __init__(self, gemini_key: str | None, model: str = "gemini-2.5-flash"):
+    model = "gemini-2.5-flash"
+    # Local detections below this confidence fall back to the LLM detector.
+    local_detect_min_confidence = LOCAL_DETECT_MIN_CONFIDENCE
+    # When to start correction alongside an LLM detection: off, always or noisy.
+    speculation_policy = SPECULATIVE_CORRECTION
+    speculation_stats = speculation_stats
+    # Texts above this estimated size are interpreted segment by segment.
+    long_text_min_tokens = LONG_TEXT_MIN_TOKENS
+    long_text_segment_tokens = LONG_TEXT_SEGMENT_TOKENS
+    long_text_concurrency = LONG_TEXT_CONCURRENCY
+    long_text_synthesis = LONG_TEXT_SYNTHESIS
+    # Incremental analyses memoize each section's interpretation here.
+    incremental_min_section_tokens = INCREMENTAL_MIN_SECTION_TOKENS
+    section_cache = result_cache
+    stage_timeouts = STAGE_TIMEOUTS
+    # Texts needing correction are cleaned locally first; the LLM correction only
+    # runs when this much OCR noise remains. 0 always calls the LLM.
+    ocr_residual_threshold = OCR_RESIDUAL_THRESHOLD
+    cleanup_stats = cleanup_stats
+    # Retries, hedging and circuit breakers shared by every agent.
+    resilience = upstream
+
+    def __init__(
+        self,
+        gemini_key: str | None,
+        model: str = "gemini-2.5-flash",
+        llm_lite: ChatGoogleGenerativeAI | None = None,
+    ):
         if not gemini_key:
             raise ValueError("Gemini API key is required.")
+        self.model = model
 
         # Main model for interpretation
         self.llm_flash = ChatGoogleGenerativeAI(
-            model=model, api_key=gemini_key, temperature=0.3
+            model=model,
+            api_key=gemini_key,
+            temperature=0.3,
+            base_url=GEMINI_BASE_URL,
+            max_retries=LLM_SDK_MAX_RETRIES,
         )
 
-        # Lightweight model for detection and correction
-        self.llm_lite = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash-lite", api_key=gemini_key, temperature=0.0
+        # Lightweight model for detection and correction. It only depends on the
+        # key, so agents for the same key can share one client and its connections.
+        self.llm_lite = llm_lite or ChatGoogleGenerativeAI(
+            model=LITE_MODEL,
+            api_key=gemini_key,
+            temperature=0.0,
+            base_url=GEMINI_BASE_URL,
+            max_retries=LLM_SDK_MAX_RETRIES,
         )
-
-        self.graph = self._make_workflow()
+        self.detector = self.llm_lite.with_structured_output(TextDerectives)
 
     @staticmethod
     def _content_to_text(content: object) -> str:
@@ -52,113 +137,427 @@ class TextAnalysisLangchain:
 
         return ""
 
-    async def analyze_stream(
-        self, text: str, user_language: str
-    ) -> AsyncIterator[dict[str, str]]:
-        state = create_initial_state(text, user_language)
+    async def _acorrect(self, text: str) -> tuple[str, float]:
+        start = time.perf_counter()
+        messages = [SystemMessage(CORRECTION_SYS_PROMPT), HumanMessage(text)]
+        response = await self.resilience.call(
+            LITE_MODEL, "correct", lambda: self.llm_lite.ainvoke(messages), hedge=True
+        )
+        corrected_text = self._content_to_text(response.content).strip()
+        return corrected_text, time.perf_counter() - start
+
+    def _clean_locally(self, text: str) -> Cleanup:
+        result = cleanup(text, self.ocr_residual_threshold)
+        self.cleanup_stats.record(text, result)
+        return result
+
+    async def _acorrect_noisy(self, text: str) -> str:
+        """Correct ``text``, calling the LLM only if local cleanup is not enough."""
+        local = self._clean_locally(text)
+        if not local.needs_llm:
+            return local.text
+        corrected_text, _ = await self._acorrect(local.text)
+        return corrected_text or local.text
+
+    async def _adetect(
+        self, text: str, speculate: bool = True
+    ) -> tuple[TextDerectives, SpeculativeCorrection | None]:
+        detection = detect_text(text)
+        if detection.confidence >= self.local_detect_min_confidence:
+            return detection.to_directives(), None
+
+        speculative = None
+        if speculate and should_speculate(self.speculation_policy, detection):
+            speculative = SpeculativeCorrection(
+                self._acorrect(text), self.speculation_stats
+            )
+
+        start = time.perf_counter()
+        try:
+            messages = [SystemMessage(EXAM_SYS_PROMPT), HumanMessage(text)]
+            directives = await self.resilience.call(
+                LITE_MODEL,
+                "detect",
+                lambda: self.detector.ainvoke(messages),
+                hedge=True,
+            )
+        except BaseException:
+            if speculative is not None:
+                speculative.cancel()
+            raise
+
+        if speculative is not None:
+            speculative.detect_seconds = time.perf_counter() - start
+        return directives, speculative
+
+    async def _adetect_directives(self, text: str) -> TextDerectives:
+        directives, _ = await self._adetect(text, speculate=False)
+        return directives
+
+    async def _astream_interpretation(
+        self, messages: tuple[SystemMessage, HumanMessage]
+    ) -> AsyncIterator[str]:
+        produced = False
+        # Retried only until the first chunk arrives; nothing is ever repeated.
+        chunks = self.resilience.stream(
+            self.model, "interpret", lambda: self.llm_flash.astream(messages)
+        )
+        async for chunk in chunks:
+            delta = self._content_to_text(chunk.content)
+            if not delta:
+                continue
+            produced = produced or bool(delta.strip())
+            yield delta
+
+        if not produced:
+            interpret_fallbacks.inc(model=self.model)
+            fallback = await self.resilience.call(
+                self.model,
+                "interpret_fallback",
+                lambda: self.llm_flash.ainvoke(messages),
+            )
+            result = self._content_to_text(fallback.content).strip()
+            if result:
+                yield result
+
+    # --- Pipeline stages ----------------------------------------------------
+
+    def _stages(self, context: AnalysisContext) -> list[Stage]:
+        def timeout(name: str) -> float | None:
+            return self.stage_timeouts.get(name)
+
+        def needs_correction(ctx: AnalysisContext) -> bool:
+            return ctx.state["needs_correction"]
+
+        if not context.is_long:
+            return [
+                Stage("detect", self._detect_stage, timeout("detect")),
+                Stage(
+                    "correct",
+                    self._correct_stage,
+                    timeout("correct"),
+                    when=needs_correction,
+                ),
+                Stage("interpret", self._interpret_stage, timeout("interpret")),
+            ]
 
-        yield {"event": "stage", "stage": "detect"}
-        detection_messages = [
-            SystemMessage(EXAM_SYS_PROMPT),
-            HumanMessage(state["text"]),
+        return [
+            Stage("detect", self._detect_stage, timeout("detect")),
+            # Segments are corrected inside their interpretation task, and the
+            # stage reports its own per-segment progress.
+            Stage(
+                "interpret",
+                self._interpret_segments_stage,
+                timeout("interpret"),
+                announce=False,
+            ),
+            Stage(
+                "synthesize",
+                self._synthesize_stage,
+                timeout("synthesize"),
+                when=lambda _ctx: self.long_text_synthesis,
+                announce=False,
+            ),
         ]
-        structured_llm = self.llm_lite.with_structured_output(TextDerectives)
-        directives = await structured_llm.ainvoke(detection_messages)
 
+    async def _detect_stage(self, context: AnalysisContext) -> None:
+        state = context.state
+        # For long texts the opening segment is a large enough detection sample.
+        sample = context.segments[0]
+        if context.detections is not None:
+            # A shared detection cannot carry a per-analysis speculative task.
+            speculative = None
+            directives = await context.detections.get(
+                sample, lambda: self._adetect_directives(sample)
+            )
+        else:
+            directives, speculative = await self._adetect(
+                sample, speculate=not context.is_long
+            )
         state["text_language"] = directives.language
         state["genre"] = directives.genre
         state["needs_correction"] = directives.correction_needed
 
-        if state["needs_correction"]:
-            yield {"event": "stage", "stage": "correct"}
-            correction_messages = [
-                SystemMessage(CORRECTION_SYS_PROMPT),
-                HumanMessage(state["text"]),
-            ]
-            corrected_response = await self.llm_lite.ainvoke(correction_messages)
-            corrected_text = self._content_to_text(corrected_response.content).strip()
-            if corrected_text:
-                state["corrected_text"] = corrected_text
-                state["text"] = corrected_text
-
-        yield {"event": "stage", "stage": "interpret"}
+        if speculative is not None:
+            if directives.correction_needed:
+                context.speculative = speculative
+            else:
+                speculative.discard()
+
+    async def _correct_stage(self, context: AnalysisContext) -> None:
+        state = context.state
+        local = self._clean_locally(state["text"])
+        if not local.needs_llm:
+            if context.speculative is not None:
+                # The early LLM correction turned out not to be needed.
+                context.speculative.discard()
+                context.speculative = None
+            corrected_text = local.text
+        elif context.speculative is not None:
+            corrected_text = await context.speculative.result()
+        else:
+            corrected_text, _ = await self._acorrect(local.text)
+
+        if corrected_text:
+            state["corrected_text"] = corrected_text
+            state["text"] = corrected_text
+
+    async def _interpret_stage(self, context: AnalysisContext) -> AsyncIterator[Event]:
+        state = context.state
         sys_prompt = build_analysis_prompt(
             state["text_language"], state["user_language"]
         )
-        interpretation_messages = (
-            SystemMessage(sys_prompt),
-            HumanMessage(state["text"]),
-        )
-
-        chunks: list[str] = []
-        async for chunk in self.llm_flash.astream(interpretation_messages):
-            delta = self._content_to_text(chunk.content)
-            if not delta:
-                continue
-            chunks.append(delta)
+        async for delta in self._astream_interpretation(
+            (SystemMessage(sys_prompt), HumanMessage(state["text"]))
+        ):
+            context.chunks.append(delta)
             yield {"event": "chunk", "delta": delta}
 
-        result = "".join(chunks).strip()
-        if not result:
-            fallback = await self.llm_flash.ainvoke(interpretation_messages)
-            result = self._content_to_text(fallback.content).strip()
-            if result:
-                yield {"event": "chunk", "delta": result}
-
-        if not result:
-            raise ValueError("Analysis failed - no interpretation generated")
-
-        yield {"event": "done", "result": result}
-
-    def _make_workflow(self):
-        def detection_node(state: MultiAgentState):
-            messages = [SystemMessage(EXAM_SYS_PROMPT), HumanMessage(state["text"])]
-
-            structured_llm = self.llm_lite.with_structured_output(TextDerectives)
-            result = structured_llm.invoke(messages)
+    async def _interpret_segments_stage(
+        self, context: AnalysisContext
+    ) -> AsyncIterator[Event]:
+        state = context.state
+        segments = context.segments
+        parts = len(segments)
+
+        # Incremental analyses reuse the memoized interpretation of every section
+        # seen before and only interpret the others. Each section is corrected
+        # on its own local noise score rather than the detection of the opening
+        # segment, so fixing OCR in one paragraph leaves the other keys alone.
+        keys: list[str] = []
+        memo: list[CachedResult | None] = [None] * parts
+        corrections = [state["needs_correction"]] * parts
+        if context.incremental:
+            corrections = [needs_correction(segment) for segment in segments]
+            keys = [
+                self._memo_key("section", segment, state, correct)
+                for segment, correct in zip(segments, corrections, strict=True)
+            ]
+            memo = list(await asyncio.gather(*map(self.section_cache.aget, keys)))
+            for entry in memo:
+                outcome = "reused" if entry is not None else "interpreted"
+                incremental_sections.inc(model=self.model, outcome=outcome)
+
+        if any(c and m is None for c, m in zip(corrections, memo, strict=True)):
+            yield {"event": "stage", "stage": "correct", "segments": parts}
+
+        def producer(index: int):
+            async def interpret_segment() -> AsyncIterator[str]:
+                if memo[index] is not None:
+                    yield memo[index].result
+                    return
+
+                segment = segments[index]
+                if corrections[index]:
+                    segment = await self._acorrect_noisy(segment)
+                if context.incremental:
+                    sys_prompt = build_section_prompt(
+                        state["text_language"], state["user_language"]
+                    )
+                else:
+                    sys_prompt = build_segment_prompt(
+                        state["text_language"],
+                        state["user_language"],
+                        index + 1,
+                        parts,
+                    )
+                output: list[str] = []
+                async for delta in self._astream_interpretation(
+                    (SystemMessage(sys_prompt), HumanMessage(segment))
+                ):
+                    output.append(delta)
+                    yield delta
+                if not output:
+                    raise ValueError(
+                        f"Analysis failed - no interpretation for segment {index + 1}"
+                    )
+                if context.incremental:
+                    await self._memoize(keys[index], "".join(output), state)
+
+            return interpret_segment
+
+        current = -1
+        async for index, delta in stream_in_order(
+            [producer(index) for index in range(parts)],
+            self.long_text_concurrency,
+        ):
+            if index != current:
+                current = index
+                event = {
+                    "event": "stage",
+                    "stage": "interpret",
+                    "segment": index + 1,
+                    "segments": parts,
+                }
+                if memo[index] is not None:
+                    event["cached"] = True
+                yield event
+                if index > 0:
+                    context.chunks.append(SEGMENT_SEPARATOR)
+                    yield {"event": "chunk", "delta": SEGMENT_SEPARATOR}
+            context.chunks.append(delta)
+            yield {"event": "chunk", "delta": delta}
 
-            return {
-                "text_language": result.language,
-                "genre": result.genre,
-                "needs_correction": result.correction_needed,
-            }
+    async def _synthesize_stage(self, context: AnalysisContext) -> AsyncIterator[Event]:
+        state = context.state
+        skim = outline(context.segments)
+        # The outline only holds first sentences, so most edits leave it as is.
+        # It is built from the uncorrected sections and never corrected itself.
+        key = self._memo_key("synthesis", skim, state) if context.incremental else ""
+        cached = await self.section_cache.aget(key) if key else None
+
+        event = {
+            "event": "stage",
+            "stage": "synthesize",
+            "segments": len(context.segments),
+        }
+        if cached is not None:
+            event["cached"] = True
+        yield event
+        context.chunks.append(SEGMENT_SEPARATOR)
+        yield {"event": "chunk", "delta": SEGMENT_SEPARATOR}
+
+        if cached is not None:
+            context.chunks.append(cached.result)
+            yield {"event": "chunk", "delta": cached.result}
+            return
+
+        sys_prompt = build_synthesis_prompt(
+            state["text_language"], state["user_language"]
+        )
+        output: list[str] = []
+        async for delta in self._astream_interpretation(
+            (SystemMessage(sys_prompt), HumanMessage(skim))
+        ):
+            output.append(delta)
+            context.chunks.append(delta)
+            yield {"event": "chunk", "delta": delta}
+        if key and "".join(output).strip():
+            await self._memoize(key, "".join(output), state)
+
+    def _memo_key(
+        self,
+        kind: str,
+        text: str,
+        state: MultiAgentState,
+        needs_correction: bool = False,
+    ) -> str:
+        return make_section_key(
+            kind, text, state["user_language"], self.model, needs_correction
+        )
 
-        def correction_node(state: MultiAgentState):
-            messages = [
-                SystemMessage(CORRECTION_SYS_PROMPT),
-                HumanMessage(state["text"]),
-            ]
-            response = self.llm_lite.invoke(messages)
+    async def _memoize(self, key: str, result: str, state: MultiAgentState) -> None:
+        entry = CachedResult(result, state["user_language"], self.model)
+        await self.section_cache.aput(key, entry)
+
+    def _record_cancelled(
+        self, text: str, stage: str, stages_started: set[str], output: list[str]
+    ) -> None:
+        """Count an abandoned analysis and estimate the tokens it wasted.
+
+        The text is counted as input once per stage after detection that had
+        started (detection is often answered locally and is left out), the
+        output as far as it streamed.
+        """
+        analyses_cancelled.inc(model=self.model, stage=stage)
+        llm_stages = len(stages_started - {"detect"})
+        cancelled_tokens.inc(
+            estimate_tokens(text) * llm_stages, model=self.model, direction="input"
+        )
+        cancelled_tokens.inc(
+            estimate_tokens("".join(output)), model=self.model, direction="output"
+        )
 
-            return {"corrected_text": response.content, "text": response.content}
+    # --- Entry points -------------------------------------------------------
 
-        def interpretation_node(state: MultiAgentState):
-            sys_prompt = build_analysis_prompt(
-                state.get("text_language", "EN"),
-                state.get("user_language", "EN"),
+    async def analyze_stream(
+        self,
+        text: str,
+        user_language: str,
+        detections: DetectionMemo | None = None,
+        incremental: bool = False,
+    ) -> AsyncIterator[Event]:
+        """Analyze ``text``, streaming stage, chunk and done events.
+
+        With ``incremental``, a text of several paragraphs is interpreted section
+        by section and each section's interpretation is memoized, so resubmitting
+        an edited text only interprets the sections that changed; the others
+        stream straight from the memo.
+        """
+        state = create_initial_state(text, user_language)
+        segments = [state["text"]]
+        if incremental:
+            sections = split_sections(
+                state["text"],
+                self.incremental_min_section_tokens,
+                self.long_text_segment_tokens,
             )
-            messages = (SystemMessage(sys_prompt), HumanMessage(state["text"]))
-            response = self.llm_flash.invoke(messages)
+            # A single section gains nothing over the whole-text result cache.
+            incremental = len(sections) > 1
+            if incremental:
+                segments = sections
+        if not incremental and estimate_tokens(state["text"]) >= (
+            self.long_text_min_tokens
+        ):
+            segments = split_segments(state["text"], self.long_text_segment_tokens)
+        context = AnalysisContext(
+            state=state,
+            segments=segments,
+            detections=detections,
+            incremental=incremental,
+        )
 
-            return {"interpretation": response.content}
+        stage = "detect"
+        stages_started: set[str] = set()
+        output: list[str] = []
+        chunks = chars = 0
+        first_chunk_at = last_chunk_at = 0.0
+        try:
+            async for event in run_stages(
+                self._stages(context), context, context.timings
+            ):
+                if event["event"] == "stage":
+                    stage = event["stage"]
+                    stages_started.add(stage)
+                elif event["event"] == "chunk":
+                    last_chunk_at = time.perf_counter()
+                    if not chunks:
+                        first_chunk_at = last_chunk_at
+                    chunks += 1
+                    chars += len(event["delta"])
+                    output.append(event["delta"])
+                yield event
+        except Exception as exc:
+            failed = exc.stage if isinstance(exc, StageTimeoutError) else stage
+            analysis_errors.inc(model=self.model, stage=failed)
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            self._record_cancelled(state["text"], stage, stages_started, output)
+            raise
+        finally:
+            # Covers the consumer closing the stream before correction returns.
+            if context.speculative is not None:
+                context.speculative.cancel()
+
+        for name, seconds in context.timings.items():
+            stage_duration.observe(seconds, model=self.model, stage=name)
+        streamed = last_chunk_at - first_chunk_at
+        if chunks > 1 and streamed > 0:
+            chunk_rate.observe((chunks - 1) / streamed, model=self.model)
+            output_rate.observe(chars / streamed, model=self.model)
+
+        result = "".join(context.chunks).strip()
+        if not result:
+            analysis_errors.inc(model=self.model, stage=stage)
+            raise ValueError("Analysis failed - no interpretation generated")
 
-        def route_after_detection(state: MultiAgentState) -> str:
-            if state.get("needs_correction", False):
-                return "correct"
-            else:
-                return "interpret"
-
-        workflow = StateGraph(MultiAgentState)
-        workflow.add_node("detect", detection_node)
-        workflow.add_node("correct", correction_node)
-        workflow.add_node("interpret", interpretation_node)
-        workflow.add_edge(START, "detect")
-        workflow.add_conditional_edges(
-            "detect",
-            route_after_detection,
-            {"correct": "correct", "interpret": "interpret"},
-        )
-        workflow.add_edge("correct", "interpret")
-        workflow.add_edge("interpret", END)
+        state["interpretation"] = result
+        timings = {stage: round(t, 3) for stage, t in context.timings.items()}
+        yield {"event": "done", "result": result, "timings": timings}
 
-        return workflow.compile()
+    async def analyze(self, text: str, user_language: str) -> str:
+        result = ""
+        async for event in self.analyze_stream(text, user_language):
+            if event["event"] == "done":
+                result = event["result"]
+        return result
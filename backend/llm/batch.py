@@ -0,0 +1,66 @@
+import asyncio
+import os
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+
+class DetectionMemo:
+    """Detections shared by the analyses of one batch, keyed by exact text.
+
+    The first analysis of a text starts the detection; later ones with the same
+    text await the same task, even when they target another language or model.
+    """
+
+    def __init__(self):
+        self._tasks: dict[str, asyncio.Task] = {}
+        self.shared = 0
+
+    async def get(self, text: str, detect: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(text)
+        if task is None:
+            task = asyncio.ensure_future(detect())
+            self._tasks[text] = task
+        else:
+            self.shared += 1
+        # One waiter being cancelled must not cancel the detection for the rest.
+        return await asyncio.shield(task)
+
+    def close(self) -> None:
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()
+
+
+async def run_unordered(
+    jobs: list[Callable[[], Awaitable[Any]]],
+    concurrency: int,
+) -> AsyncIterator[tuple[int, Any, Exception | None]]:
+    """Run jobs with bounded parallelism, yielding ``(index, result, error)``.
+
+    Results come in completion order. A failing job is reported with its error
+    instead of stopping the others; closing the iterator cancels what is left.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    finished: asyncio.Queue = asyncio.Queue()
+
+    async def run(index: int) -> None:
+        try:
+            async with semaphore:
+                result = await jobs[index]()
+        except Exception as exc:
+            finished.put_nowait((index, None, exc))
+        else:
+            finished.put_nowait((index, result, None))
+
+    tasks = [asyncio.create_task(run(index)) for index in range(len(jobs))]
+    try:
+        for _ in jobs:
+            yield await finished.get()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,149 @@
+import asyncio
+import os
+from collections.abc import AsyncIterator, Callable
+
+from llm.pipeline import Event
+
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("SUBSCRIBER_QUEUE_SIZE", "256"))
+
+_END = object()
+
+
+class _Subscriber:
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        # Index in the broadcast history of the next event to deliver.
+        self.position = 0
+        # A lagging subscriber reads from the history instead of its queue. New
+        # subscribers start lagging so they first replay what was already sent.
+        self.lagging = True
+
+
+class Broadcast:
+    """Fan out one producer's events to any number of subscribers.
+
+    Every event is kept in ``history`` so late subscribers get a replay before
+    the live deltas. Each subscriber has its own bounded queue; when it fills
+    up, the producer drops that queue and the subscriber catches up from the
+    history at its own pace, so a slow consumer never blocks the producer or
+    the other subscribers.
+    """
+
+    def __init__(
+        self,
+        events: AsyncIterator[Event],
+        queue_size: int = SUBSCRIBER_QUEUE_SIZE,
+        on_finish: Callable[[], None] | None = None,
+    ):
+        self.history: list[Event] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self._queue_size = queue_size
+        self._subscribers: set[_Subscriber] = set()
+        self._on_finish = on_finish
+        self._task = asyncio.create_task(self._pump(events))
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    async def _pump(self, events: AsyncIterator[Event]) -> None:
+        try:
+            async for event in events:
+                self.history.append(event)
+                for subscriber in self._subscribers:
+                    self._offer(subscriber, event)
+        except asyncio.CancelledError:
+            self.error = RuntimeError("Analysis was cancelled")
+            raise
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self.done = True
+            for subscriber in self._subscribers:
+                self._offer(subscriber, _END)
+            if self._on_finish is not None:
+                self._on_finish()
+
+    def _offer(self, subscriber: _Subscriber, item: object) -> None:
+        if subscriber.lagging:
+            return
+        try:
+            subscriber.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            subscriber.lagging = True
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+
+    async def subscribe(self) -> AsyncIterator[Event]:
+        subscriber = _Subscriber(self._queue_size)
+        self._subscribers.add(subscriber)
+        try:
+            while True:
+                if subscriber.lagging:
+                    if subscriber.position < len(self.history):
+                        subscriber.position += 1
+                        yield self.history[subscriber.position - 1]
+                        continue
+                    if self.done:
+                        break
+                    subscriber.lagging = False
+
+                item = await subscriber.queue.get()
+                if item is _END:
+                    break
+                subscriber.position += 1
+                yield item
+
+            if self.error is not None:
+                raise self.error
+        finally:
+            self._subscribers.discard(subscriber)
+            if not self._subscribers and not self.done:
+                # Nobody is listening any more; stop paying for the upstream.
+                self._task.cancel()
+
+
+class StreamCoalescer:
+    """Single-flight registry: identical in-flight analyses share one upstream."""
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self._queue_size = queue_size
+        self._broadcasts: dict[str, Broadcast] = {}
+        self.started = 0
+        self.joined = 0
+
+    def subscribe(
+        self, key: str, produce: Callable[[], AsyncIterator[Event]]
+    ) -> AsyncIterator[Event]:
+        broadcast = self._broadcasts.get(key)
+        if broadcast is None or broadcast.done:
+            broadcast = Broadcast(
+                produce(),
+                self._queue_size,
+                on_finish=lambda: self._forget(key, broadcast),
+            )
+            self._broadcasts[key] = broadcast
+            self.started += 1
+        else:
+            self.joined += 1
+        return broadcast.subscribe()
+
+    def in_flight(self, key: str) -> bool:
+        broadcast = self._broadcasts.get(key)
+        return broadcast is not None and not broadcast.done
+
+    def _forget(self, key: str, broadcast: Broadcast) -> None:
+        if self._broadcasts.get(key) is broadcast:
+            del self._broadcasts[key]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": len(self._broadcasts),
+            "subscribers": sum(b.subscriber_count for b in self._broadcasts.values()),
+            "started": self.started,
+            "joined": self.joined,
+        }
+
+
+stream_coalescer = StreamCoalescer()
@@ -0,0 +1,202 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Protocol
+
+from llm.prompts import PROMPT_VERSION
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_MAX_CHARS = int(os.getenv("RESULT_CACHE_MAX_CHARS", "20000000"))
+
+_HORIZONTAL_SPACE = re.compile(r"[ \t\f\v\u00a0]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    lines = (_HORIZONTAL_SPACE.sub(" ", line).strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def make_cache_key(
+    text: str,
+    user_language: str,
+    model: str,
+    prompt_version: str = PROMPT_VERSION,
+    incremental: bool = False,
+) -> str:
+    parts = [normalize_text(text), user_language.upper(), model, prompt_version]
+    if incremental:
+        # Stitched per-section results differ from whole-text ones. Only tagged
+        # when set, so the keys of existing whole-text entries stay valid.
+        parts.append("incremental")
+    payload = json.dumps(parts, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def make_section_key(
+    kind: str,
+    text: str,
+    user_language: str,
+    model: str,
+    needs_correction: bool = False,
+    prompt_version: str = PROMPT_VERSION,
+) -> str:
+    """Key of one memoized piece of an incremental analysis.
+
+    ``kind`` is ``section`` for a section's interpretation or ``synthesis`` for
+    the whole-text synthesis over an outline. The key covers the piece's content,
+    whether that piece itself is corrected, the target language and the model,
+    but nothing detected on the rest of the text and not its position: a section
+    keeps its key when other paragraphs are edited, inserted or removed.
+    """
+    payload = json.dumps(
+        [
+            kind,
+            normalize_text(text),
+            user_language.upper(),
+            model,
+            needs_correction,
+            prompt_version,
+        ],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class CachedResult:
+    result: str
+    target_language: str
+    model: str
+
+
+class ResultStore(Protocol):
+    def get(self, key: str) -> CachedResult | None: ...
+
+    def put(self, key: str, entry: CachedResult) -> None: ...
+
+
+class ResultCache:
+    """Analysis results keyed by content hash.
+
+    The first tier is an in-process LRU bounded by the total number of cached
+    characters. An optional persistent store (see ``db.cache_store``) backs it;
+    store hits are promoted into memory.
+    """
+
+    def __init__(
+        self,
+        max_chars: int = RESULT_CACHE_MAX_CHARS,
+        store: ResultStore | None = None,
+    ):
+        self.max_chars = max_chars
+        self.store = store
+        self._entries: OrderedDict[str, CachedResult] = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> CachedResult | None:
+        entry = self._get_memory(key)
+        if entry is not None:
+            return entry
+        return self._get_store(key)
+
+    def put(self, key: str, entry: CachedResult) -> None:
+        self._put_memory(key, entry)
+        self._put_store(key, entry)
+
+    async def aget(self, key: str) -> CachedResult | None:
+        entry = self._get_memory(key)
+        if entry is not None:
+            return entry
+        if self.store is None:
+            return self._get_store(key)
+        return await asyncio.to_thread(self._get_store, key)
+
+    async def aput(self, key: str, entry: CachedResult) -> None:
+        self._put_memory(key, entry)
+        if self.store is not None:
+            await asyncio.to_thread(self._put_store, key, entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._chars = 0
+
+    def stats(self) -> dict[str, int | bool]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "chars": self._chars,
+                "max_chars": self.max_chars,
+                "hits": self.hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "persistent": self.store is not None,
+            }
+
+    def _get_memory(self, key: str) -> CachedResult | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return entry
+
+    def _get_store(self, key: str) -> CachedResult | None:
+        entry = None
+        if self.store is not None:
+            try:
+                entry = self.store.get(key)
+            except Exception:
+                logger.exception("Result store lookup failed")
+        if entry is not None:
+            self._put_memory(key, entry)
+
+        with self._lock:
+            if entry is not None:
+                self.store_hits += 1
+            else:
+                self.misses += 1
+        return entry
+
+    def _put_store(self, key: str, entry: CachedResult) -> None:
+        if self.store is None:
+            return
+        try:
+            self.store.put(key, entry)
+        except Exception:
+            logger.exception("Result store write failed")
+
+    def _put_memory(self, key: str, entry: CachedResult) -> None:
+        size = len(entry.result)
+        if size > self.max_chars:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._chars -= len(previous.result)
+
+            self._entries[key] = entry
+            self._chars += size
+
+            while self._chars > self.max_chars:
+                _, evicted = self._entries.popitem(last=False)
+                self._chars -= len(evicted.result)
+
+
+result_cache = ResultCache()
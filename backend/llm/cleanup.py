@@ -0,0 +1,194 @@
+import math
+import os
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+
+from llm.detector import ocr_noise_score
+
+# After local cleanup, texts still scoring at least this much OCR noise go to
+# the LLM correction; cleaner ones are interpreted as cleaned.
+OCR_RESIDUAL_THRESHOLD = float(os.getenv("OCR_RESIDUAL_THRESHOLD", "0.2"))
+
+_LIGATURES = re.compile(r"[\ufb00-\ufb06]")
+_INVISIBLE = re.compile(r"[\u00ad\u200b-\u200d\u2060\ufeff]")
+_HYPHEN_BREAK = re.compile(r"(\w)[-\u00ad]\s*\n\s*(\w)")
+# A line break inside a sentence: the line does not end a sentence and the next
+# one continues in lower case.
+_BROKEN_LINE = re.compile(r"([^\s.!?:;。！？」』\"”)\]])[ \t]*\n[ \t]*(?=[a-zà-ÿа-я])")
+# A standalone run of the glyphs OCR makes of specks and rules. Symbols that
+# are also math or code ("a < b", "x ^ 2", "{ }") only go in a run with one.
+_STRAY_SYMBOLS = re.compile(
+    r"(?:(?<=\s)|^)[~^<>_\\{}]*[|¦¤•■□▪●◆][|¦¤•■□▪●◆~^<>_\\{}]*(?=\s|$)|\ufffd",
+    re.MULTILINE,
+)
+_DOUBLED_PUNCT = re.compile(r"([,;:])\1+")
+_SPACE_BEFORE_PUNCT = re.compile(r"[ \t]+([,.])(?=\s|$)")
+# A token of lower-case letters with ``0 1 3 5`` between them ("l0an"). Tokens
+# with other digits, or part of a version, path or identifier, are left alone.
+_OCR_DIGITS = re.compile(
+    r"(?<![\w./\\-])[a-zà-ÿ]+(?:[0135]+[a-zà-ÿ]+)+(?![\w/\\]|[.-]\w)"
+)
+_DIGIT_LETTERS = str.maketrans("0135", "oles")
+_SPACES = re.compile(r"[ \t]{2,}")
+_TRAILING_SPACES = re.compile(r"[ \t]+\n")
+
+# Words of one or two letters in the supported languages. Other tokens that
+# short are usually fragments of a word split by a stray space ("c ourse").
+_SHORT_WORDS = frozenset(
+    "a i o y e u à è é ò ù ad al am an as at au be by ce da de di do du ed el "
+    "em en er es et eu fa ha he if il im in is it je ja la le lo ma me mi my "
+    "na ne ni no ob of oh ok on or os ou sa se si so su ta te ti to tu um un "
+    "up us va vi wo we ya yo zu ça où sí tú él mí "
+    "в и к о с у я а во со ко об из на не но он по за до от мы вы ты же бы ли "
+    "то да её их ей ни уж ну".split()
+)
+_SHORT_TOKEN = re.compile(r"(?<![\w'’-])[a-zA-Z\u00c0-\u00ffа-яА-Я]{1,2}(?![\w'’-])")
+
+# Lines shorter than this are left alone when rejoining broken lines, so verse
+# and lists keep their layout.
+_MIN_PROSE_LINE = 40
+
+
+def _cp1252_char(byte: int) -> str:
+    try:
+        return bytes([byte]).decode("cp1252")
+    except UnicodeDecodeError:
+        # Bytes cp1252 leaves undefined come through as their latin-1 control.
+        return chr(byte)
+
+
+# How each byte reads when UTF-8 is mistaken for cp1252, and back.
+_MISREAD = {_cp1252_char(byte): byte for byte in range(0x80, 0x100)}
+_MOJIBAKE_RUN = re.compile(
+    "[{}]([{}])+".format(
+        "".join(_cp1252_char(byte) for byte in range(0xC2, 0xF5)),
+        re.escape("".join(_cp1252_char(byte) for byte in range(0x80, 0xC0))),
+    )
+)
+
+
+def _plausible(text: str) -> bool:
+    # Latin, Greek and Cyrillic letters, punctuation and symbols, ligatures.
+    return all(
+        0xA0 <= ord(char) <= 0x52F
+        or 0x2000 <= ord(char) <= 0x27BF
+        or 0xFB00 <= ord(char) <= 0xFB06
+        for char in text
+    )
+
+
+def _fix_mojibake(text: str) -> str:
+    """Undo UTF-8 text that was decoded as cp1252 (``Ã©`` for ``é``)."""
+
+    def repair(match: re.Match) -> str:
+        run = match.group(0)
+        try:
+            fixed = bytes(_MISREAD[char] for char in run).decode("utf-8")
+        except (KeyError, UnicodeDecodeError):
+            return run
+        return fixed if _plausible(fixed) else run
+
+    return _MOJIBAKE_RUN.sub(repair, text)
+
+
+def _join_broken_lines(text: str) -> str:
+    def join(match: re.Match) -> str:
+        start = text.rfind("\n", 0, match.start()) + 1
+        if match.end(1) - start < _MIN_PROSE_LINE:
+            return match.group(0)
+        return match.group(1) + " "
+
+    return _BROKEN_LINE.sub(join, text)
+
+
+def clean_ocr_text(text: str) -> str:
+    """Repair mechanical OCR damage without changing wording.
+
+    Fixes encoding junk and ligatures, rejoins words hyphenated across lines and
+    prose lines broken mid-sentence, drops stray symbols, collapses doubled
+    punctuation and spacing, and reads ``0 1 3 5`` inside words otherwise all
+    lower-case letters as ``o l e s``. Paragraph breaks are kept. Damage that
+    needs judgment (split words, misread letters) is left for the LLM correction.
+    """
+    text = _fix_mojibake(text)
+    text = _LIGATURES.sub(lambda m: unicodedata.normalize("NFKC", m.group(0)), text)
+    text = _INVISIBLE.sub("", text)
+    text = _HYPHEN_BREAK.sub(r"\1\2", text)
+    text = _join_broken_lines(text)
+    text = _STRAY_SYMBOLS.sub("", text)
+    text = _DOUBLED_PUNCT.sub(r"\1", text)
+    text = _SPACE_BEFORE_PUNCT.sub(r"\1", text)
+    text = _OCR_DIGITS.sub(lambda m: m.group(0).translate(_DIGIT_LETTERS), text)
+    text = _SPACES.sub(" ", text)
+    text = _TRAILING_SPACES.sub("\n", text)
+    return text.strip()
+
+
+def residual_noise_score(text: str) -> float:
+    """OCR noise left after cleanup, from 0 to 1.
+
+    The detector's score plus word fragments, the damage cleanup cannot repair.
+    """
+    fragments = 0
+    for match in _SHORT_TOKEN.finditer(text):
+        token = match.group(0)
+        if token.isupper() and (
+            len(token) > 1 or text[match.end() : match.end() + 1] == "."
+        ):
+            continue  # An acronym or an initial.
+        fragments += token.lower() not in _SHORT_WORDS
+    words = max(1, len(text.split()))
+    fragment_noise = 1 - math.exp(-fragments * (100 / words) / 6)
+    return max(ocr_noise_score(text), fragment_noise)
+
+
+@dataclass(frozen=True)
+class Cleanup:
+    text: str
+    noise_before: float
+    noise_after: float
+    needs_llm: bool
+
+
+def cleanup(text: str, threshold: float = OCR_RESIDUAL_THRESHOLD) -> Cleanup:
+    cleaned = clean_ocr_text(text)
+    residual = residual_noise_score(cleaned)
+    return Cleanup(
+        text=cleaned,
+        noise_before=round(ocr_noise_score(text), 3),
+        noise_after=round(residual, 3),
+        needs_llm=residual >= threshold,
+    )
+
+
+class CleanupStats:
+    """How often local cleanup was enough to skip the LLM correction."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cleaned = 0
+        self.llm_avoided = 0
+        self.chars_removed = 0
+
+    def record(self, original: str, result: Cleanup) -> None:
+        with self._lock:
+            self.cleaned += 1
+            self.llm_avoided += not result.needs_llm
+            self.chars_removed += max(0, len(original) - len(result.text))
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            return {
+                "cleaned": self.cleaned,
+                "llm_avoided": self.llm_avoided,
+                "llm_required": self.cleaned - self.llm_avoided,
+                "avoided_share": (
+                    round(self.llm_avoided / self.cleaned, 3) if self.cleaned else 0.0
+                ),
+                "chars_removed": self.chars_removed,
+            }
+
+
+cleanup_stats = CleanupStats()
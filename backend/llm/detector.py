@@ -0,0 +1,282 @@
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+from schemas.analyze import TextDerectives
+
+LOCAL_DETECT_MIN_CONFIDENCE = float(os.getenv("LOCAL_DETECT_MIN_CONFIDENCE", "0.75"))
+
+# --- Script-based language identification ----------------------------------
+
+_ARABIC = re.compile(r"[\u0600-\u06ff\u0750-\u077f\ufb50-\ufdff\ufe70-\ufeff]")
+_CYRILLIC = re.compile(r"[\u0400-\u04ff]")
+_KANA = re.compile(r"[\u3040-\u30ff\u31f0-\u31ff\uff66-\uff9f]")
+_HAN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+_LATIN = re.compile(r"[A-Za-z\u00c0-\u024f]")
+_LATIN_WORD = re.compile(r"[a-z\u00e0-\u00ff\u0153\u00df]+")
+
+# --- Latin-script profiles: function words and characteristic n-grams ------
+
+_STOPWORDS = {
+    "EN": (
+        "the and of to in is that it was for on with as are be this by have from "
+        "not at which but they his her were has been would their an or will we "
+        "you he she what there these than"
+    ),
+    "DE": (
+        "der die das und ist nicht ein eine zu den von mit sich des auf für im dem "
+        "auch es an als wie wird bei nach oder aus sie wir ich sind war noch nur "
+        "einer einem über dass werden hat kann"
+    ),
+    "FR": (
+        "le la les de des et est un une du en que qui dans pour pas sur au aux avec "
+        "ce il elle ne se sont par plus mais nous vous ont cette été comme leur où "
+        "était ces son sa"
+    ),
+    "ES": (
+        "el la los las de del y que en un una es por con para no se su sus al lo "
+        "como más pero fue este esta ha son muy también cuando sin sobre entre ya "
+        "hay porque está"
+    ),
+    "IT": (
+        "il lo la gli le di del della e che è un una per non con si in sono da al "
+        "alla dei delle ma come più anche questo questa nel nella ha era suo sua "
+        "essere molto quando"
+    ),
+}
+
+_NGRAMS = {
+    "EN": " th|the|he |ing|ng | an|and|nd |ion|tio| wh|ght| of|of | to",
+    "DE": "sch|ch | di|die|ein|ung|ng |er |en |cht|ich|ie | de|der|ß",
+    "FR": " le|es |ent|de | de|ion|les| la|que|ait|eur|eau|oi|ux |ç",
+    "ES": " de|de |os | la|ión|ció| el|el |as |ue |que| qu|ñ|ado|ada",
+    "IT": " di|di |ell|lla|che|zio|ion|one| co|gli| il|il |ato|are|cc",
+}
+
+_DIACRITICS = {
+    "DE": "äöüß",
+    "FR": "éèêëçœàùûîô",
+    "ES": "ñáíóú¿¡",
+    "IT": "àèìòù",
+}
+
+
+def _weighted_stopwords() -> dict[str, dict[str, float]]:
+    owners: Counter[str] = Counter()
+    lists = {lang: set(words.split()) for lang, words in _STOPWORDS.items()}
+    for words in lists.values():
+        owners.update(words)
+    return {
+        lang: {word: 1.0 / owners[word] for word in words}
+        for lang, words in lists.items()
+    }
+
+
+_STOPWORD_WEIGHTS = _weighted_stopwords()
+_NGRAM_SETS = {lang: grams.split("|") for lang, grams in _NGRAMS.items()}
+
+# --- Genre cues --------------------------------------------------------------
+
+_PAPER_CUES = re.compile(
+    r"\babstract\b|\bet al\.|\[\d+(?:[,–-]\s*\d+)*\]|\(\w+,? (?:19|20)\d{2}\)|"
+    r"\bdoi\b|\barxiv\b|\bfig(?:ure)?\.? ?\d|\btable \d|\bhypothes[ie]s\b|"
+    r"\bmethodolog|\bempiri|\bresumen\b|\brésumé\b|\bzusammenfassung\b|"
+    r"\briassunto\b|аннотация|摘要|要旨|ملخص",
+    re.IGNORECASE,
+)
+_NEWS_CUES = re.compile(
+    r"\((?:reuters|ap|afp|dpa|ansa|efe)\)|\breuters\b|\bsaid\b|\baccording to\b|"
+    r"\ba déclaré\b|\bselon\b|\bsagte\b|\blaut\b|\bdijo\b|\bsegún\b|\bha detto\b|"
+    r"\bsecondo\b|заявил|сообщил|表示|据|記者|によると|قال|وفقا|"
+    r"\b(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b|"
+    r"\b(?:lundi|mardi|mercredi|jeudi|vendredi|montag|dienstag|mittwoch|lunes|"
+    r"martes|lunedì|martedì)\b|\d+(?:[.,]\d+)?\s?%",
+    re.IGNORECASE,
+)
+_PHILOSOPHY_CUES = re.compile(
+    r"\bbeing\b|\bexistence\b|\btruth\b|\breason\b|\bconsciousness\b|"
+    r"\bmetaphysic|\bontolog|\bepistem|\bethic|\bmoral|\bdasein\b|\bsein\b|"
+    r"\bvernunft\b|\bwahrheit\b|\bbewusstsein\b|\bêtre\b|\braison\b|\bvérité\b|"
+    r"\bconscience\b|\brazón\b|\bverdad\b|\bconciencia\b|\bessere\b|\bragione\b|"
+    r"\bverità\b|\bcoscienza\b|бытие|истин|разум|сознани|存在|真理|理性|意識|哲学|"
+    r"哲學|الوجود|الحقيقة|العقل",
+    re.IGNORECASE,
+)
+_NARRATIVE_CUES = re.compile(
+    r"^\s*[—–«“\"]|\bonce upon\b|\bhe said\b|\bshe said\b|\bil était\b|"
+    r"\belle était\b|\bes war\b|\bérase\b|\bc'era una volta\b|\bhe was\b|"
+    r"\bshe was\b|\bsagte er\b|\bsagte sie\b|\bdijo él\b|\bdisse\b|сказал|"
+    r"ました|了|كان",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# --- OCR noise cues ----------------------------------------------------------
+
+_HYPHEN_BREAK = re.compile(r"\w-\n\w")
+_STRAY_SYMBOLS = re.compile(r"[|¦~^_\\{}<>§¤•■□▪●◆�]")
+_MOJIBAKE = re.compile(r"\u00c3[\u0080-\u00bf]|\u00e2\u20ac|\u00c2[\u00a0-\u00bf]")
+_LIGATURES = re.compile(r"[\ufb00-\ufb06]")
+_DIGIT_IN_WORD = re.compile(r"\b[^\W\d_]+\d+[^\W\d_]+\b")
+_REPEATED_PUNCT = re.compile(r"[,;:!?]{2,}|\.{4,}|\s[.,;:](?=\w)")
+_SPLIT_LETTERS = re.compile(r"\b(?:\w ){3,}\w\b")
+_BROKEN_LINE = re.compile(r"[^\s.!?:;。！？」』\"”)\]]\n(?=[a-zà-ÿа-я])")
+
+NOISE_BOUNDARY = 0.35
+NOISE_MARGIN = 0.25
+
+
+@dataclass(frozen=True)
+class Detection:
+    language: str
+    genre: str
+    correction_needed: bool
+    language_confidence: float
+    genre_confidence: float
+    noise_score: float
+
+    @property
+    def correction_confidence(self) -> float:
+        return min(1.0, abs(self.noise_score - NOISE_BOUNDARY) / NOISE_MARGIN)
+
+    @property
+    def confidence(self) -> float:
+        # The genre is informational only, so it does not gate the LLM fallback.
+        return min(self.language_confidence, self.correction_confidence)
+
+    def to_directives(self) -> TextDerectives:
+        return TextDerectives(
+            language=self.language,
+            genre=self.genre,
+            correction_needed=self.correction_needed,
+        )
+
+
+def detect_language(text: str) -> tuple[str, float]:
+    arabic = len(_ARABIC.findall(text))
+    cyrillic = len(_CYRILLIC.findall(text))
+    kana = len(_KANA.findall(text))
+    han = len(_HAN.findall(text))
+    latin = len(_LATIN.findall(text))
+    letters = arabic + cyrillic + kana + han + latin
+    if not letters:
+        return "EN", 0.0
+
+    cjk = kana + han
+    scripts = {"AR": arabic, "RU": cyrillic, "CJK": cjk, "LATIN": latin}
+    script, count = max(scripts.items(), key=lambda item: item[1])
+    script_share = count / letters
+    # A handful of letters is never enough evidence, whatever the script.
+    evidence = min(1.0, count / 20)
+
+    if script == "CJK":
+        # Japanese mixes kana into kanji text; Chinese has none.
+        kana_share = kana / cjk
+        if kana_share >= 0.1:
+            return "JA", script_share * evidence
+        return ("ZH", script_share * evidence * (1 - kana_share / 0.1))
+    if script != "LATIN":
+        return script, script_share * evidence
+
+    language, latin_confidence = _detect_latin_language(text.lower())
+    return language, script_share * latin_confidence
+
+
+def _detect_latin_language(text: str) -> tuple[str, float]:
+    words = _LATIN_WORD.findall(text)
+    scores = dict.fromkeys(_STOPWORDS, 0.0)
+    matched = 0
+
+    for word in words:
+        for lang, weights in _STOPWORD_WEIGHTS.items():
+            weight = weights.get(word)
+            if weight:
+                scores[lang] += weight
+                matched += 1
+
+    padded = f" {' '.join(words)} "
+    trigram_total = max(1, len(padded) - 2)
+    for lang, grams in _NGRAM_SETS.items():
+        hits = sum(padded.count(gram) for gram in grams)
+        scores[lang] += 20 * hits / trigram_total
+
+    for lang, chars in _DIACRITICS.items():
+        scores[lang] += sum(text.count(char) for char in chars) * 0.5
+
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (best, best_score), (_, runner_up) = ranked[0], ranked[1]
+    if best_score <= 0:
+        return "EN", 0.0
+
+    margin = (best_score - runner_up) / best_score
+    evidence = min(1.0, matched / 6)
+    return best, min(1.0, 0.5 + margin) * evidence
+
+
+def detect_genre(text: str) -> tuple[str, float]:
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    words = max(1, len(text.split()) or len(text) // 2)
+    per_100 = 100 / words
+
+    scores = {
+        "Paper": len(_PAPER_CUES.findall(text)) * per_100 * 1.5,
+        "News": len(_NEWS_CUES.findall(text)) * per_100,
+        "Philosophy": len(_PHILOSOPHY_CUES.findall(text)) * per_100,
+        "Narrative": len(_NARRATIVE_CUES.findall(text)) * per_100,
+        "Poem": 0.0,
+    }
+
+    if len(lines) >= 4:
+        average_line = sum(len(line) for line in lines) / len(lines)
+        unterminated = sum(1 for line in lines if line[-1] not in ".!?。！？")
+        if average_line < 50 and unterminated / len(lines) >= 0.5:
+            scores["Poem"] = 4.0 * unterminated / len(lines)
+
+    genre, score = max(scores.items(), key=lambda item: item[1])
+    if score < 1.0:
+        return "General", 0.5
+    return genre, min(1.0, 1 - math.exp(-score / 2))
+
+
+def ocr_noise_score(text: str) -> float:
+    """Return a 0..1 estimate of mechanical OCR damage in ``text``."""
+    if not text.strip():
+        return 0.0
+
+    words = max(1, len(text.split()))
+    lines = max(1, text.count("\n"))
+    damage = (
+        2.0 * len(_HYPHEN_BREAK.findall(text))
+        + 1.0 * len(_STRAY_SYMBOLS.findall(text))
+        + 3.0 * len(_MOJIBAKE.findall(text))
+        + 1.0 * len(_LIGATURES.findall(text))
+        + 2.0 * len(_DIGIT_IN_WORD.findall(text))
+        + 1.5 * len(_REPEATED_PUNCT.findall(text))
+        + 3.0 * len(_SPLIT_LETTERS.findall(text))
+    ) * (100 / words)
+
+    broken_line_share = len(_BROKEN_LINE.findall(text)) / lines
+    damage += 6.0 * broken_line_share if lines >= 3 else 0.0
+
+    return 1 - math.exp(-damage / 6)
+
+
+def needs_correction(text: str) -> bool:
+    """Whether ``text`` carries enough OCR damage to be corrected."""
+    return ocr_noise_score(text) >= NOISE_BOUNDARY
+
+
+def detect_text(text: str) -> Detection:
+    language, language_confidence = detect_language(text)
+    genre, genre_confidence = detect_genre(text)
+    noise = ocr_noise_score(text)
+
+    return Detection(
+        language=language,
+        genre=genre,
+        correction_needed=noise >= NOISE_BOUNDARY,
+        language_confidence=round(language_confidence, 3),
+        genre_confidence=round(genre_confidence, 3),
+        noise_score=round(noise, 3),
+    )
@@ -0,0 +1,314 @@
+import bisect
+import math
+import re
+import threading
+from collections.abc import Callable, Collection, Mapping
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+Labels = tuple[str, ...]
+
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def _format_labels(names: Labels, values: Labels, extra: str = "") -> str:
+    pairs = [
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Labels = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0.0)
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Labels = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # Per label set: [non-cumulative bucket counts..., +Inf count], sum.
+        self._counts: dict[Labels, list[int]] = {}
+        self._sums: dict[Labels, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    def count(self, **labels: str) -> int:
+        key = tuple(labels[name] for name in self.labelnames)
+        return sum(self._counts.get(key, ()))
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = [
+                (key, list(counts), self._sums[key])
+                for key, counts in self._counts.items()
+            ]
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts, strict=True):
+                cumulative += count
+                labels = _format_labels(
+                    self.labelnames, key, f'le="{_format_value(bound)}"'
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Hand-rolled Prometheus registry: counters, histograms and stats gauges.
+
+    Recording is a dict update under a lock, cheap enough for the request path.
+    Components that already keep a ``stats()`` dict are exported when the
+    registry renders, so they cost nothing between scrapes: as gauges, or as
+    counters for the fields that only ever grow.
+    """
+
+    def __init__(self, namespace: str = "logosai"):
+        self.namespace = namespace
+        self._metrics: list[Counter | Histogram] = []
+        self._stats: list[
+            tuple[
+                str,
+                Callable[[], Mapping[str, object]],
+                Collection[str],
+                Mapping[str, Labels],
+            ]
+        ] = []
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Labels = ()
+    ) -> Counter:
+        metric = Counter(f"{self.namespace}_{name}", documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Labels = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(
+            f"{self.namespace}_{name}", documentation, labelnames, buckets
+        )
+        self._metrics.append(metric)
+        return metric
+
+    def register_stats(
+        self,
+        prefix: str,
+        stats: Callable[[], Mapping[str, object]],
+        counters: Collection[str] = (),
+        labels: Mapping[str, str | Labels] | None = None,
+    ) -> None:
+        """Export the numeric fields of ``stats()`` as ``<prefix>_<field>``.
+
+        Fields named in ``counters``, at any depth, are typed as counters, with
+        a ``_total`` suffix, and the rest as gauges. ``labels`` names the fields
+        whose dict keys are data, such as model names: their keys become the
+        values of the given label (one label per level of nesting) instead of
+        parts of the metric name.
+        """
+        labels = {
+            field: (names,) if isinstance(names, str) else tuple(names)
+            for field, names in (labels or {}).items()
+        }
+        self._stats.append((prefix, stats, frozenset(counters), labels))
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, stats, counters, labels in self._stats:
+            series: dict[str, tuple[str, list[str]]] = {}
+            _StatsWalk(counters, labels, series).fields(
+                f"{self.namespace}_{prefix}", stats(), ()
+            )
+            for name, (kind, samples) in series.items():
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+class _StatsWalk:
+    """Collects the samples of one ``stats()`` dict, grouped by metric name."""
+
+    def __init__(
+        self,
+        counters: Collection[str],
+        labels: Mapping[str, Labels],
+        series: dict[str, tuple[str, list[str]]],
+    ):
+        self.counters = counters
+        self.labels = labels
+        self.series = series
+
+    def fields(
+        self,
+        prefix: str,
+        stats: Mapping[str, object],
+        keyed: tuple[tuple[str, str], ...],
+    ) -> None:
+        for field, value in stats.items():
+            name = f"{prefix}_{_INVALID_NAME_CHARS.sub('_', str(field))}"
+            if isinstance(value, Mapping):
+                names = self.labels.get(field)
+                if names:
+                    self.keys(name, field, value, names, keyed)
+                else:
+                    self.fields(name, value, keyed)
+            else:
+                self.sample(name, field, value, keyed)
+
+    def keys(
+        self,
+        name: str,
+        field: str,
+        stats: Mapping[object, object],
+        names: Labels,
+        keyed: tuple[tuple[str, str], ...],
+    ) -> None:
+        for key, value in stats.items():
+            labelled = (*keyed, (names[0], str(key)))
+            if not isinstance(value, Mapping):
+                self.sample(name, field, value, labelled)
+            elif len(names) > 1:
+                self.keys(name, field, value, names[1:], labelled)
+            else:
+                self.fields(name, value, labelled)
+
+    def sample(
+        self, name: str, field: str, value: object, keyed: tuple[tuple[str, str], ...]
+    ) -> None:
+        if not isinstance(value, (int, float)):
+            return
+        kind = "gauge"
+        if field in self.counters:
+            kind = "counter"
+            if not name.endswith("_total"):
+                name += "_total"
+        labels = _format_labels(
+            tuple(label for label, _ in keyed), tuple(v for _, v in keyed)
+        )
+        self.series.setdefault(name, (kind, []))[1].append(
+            f"{name}{labels} {_format_value(value)}"
+        )
+
+
+metrics = MetricsRegistry()
+
+stage_duration = metrics.histogram(
+    "stage_duration_seconds",
+    "Time spent in each analysis stage.",
+    ("model", "stage"),
+)
+time_to_first_chunk = metrics.histogram(
+    "time_to_first_chunk_seconds",
+    "Time from request to the first streamed interpretation chunk.",
+    ("model", "cached"),
+)
+chunk_rate = metrics.histogram(
+    "interpret_chunks_per_second",
+    "Interpretation chunks per second, from the first chunk to the last.",
+    ("model",),
+    RATE_BUCKETS,
+)
+output_rate = metrics.histogram(
+    "interpret_chars_per_second",
+    "Interpretation characters per second, from the first chunk to the last.",
+    ("model",),
+    RATE_BUCKETS,
+)
+interpret_fallbacks = metrics.counter(
+    "interpret_fallbacks_total",
+    "Interpretations that produced no stream output and fell back to ainvoke.",
+    ("model",),
+)
+analysis_errors = metrics.counter(
+    "analysis_errors_total",
+    "Analyses that failed, by the stage they failed in.",
+    ("model", "stage"),
+)
+stream_errors = metrics.counter(
+    "stream_errors_total",
+    "SSE analysis streams that ended with an error event.",
+    ("model",),
+)
+analyses_cancelled = metrics.counter(
+    "analyses_cancelled_total",
+    "Analyses stopped before finishing because no client needed them any more.",
+    ("model", "stage"),
+)
+cancelled_tokens = metrics.counter(
+    "cancelled_tokens_total",
+    "Estimated upstream tokens spent on analyses that were then cancelled.",
+    ("model", "direction"),
+)
+incremental_sections = metrics.counter(
+    "incremental_sections_total",
+    "Sections of incremental analyses, reused from the memo or interpreted.",
+    ("model", "outcome"),
+)
@@ -0,0 +1,107 @@
+import asyncio
+import inspect
+import os
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+STAGE_TIMEOUTS = {
+    "detect": float(os.getenv("STAGE_TIMEOUT_DETECT", "30")),
+    "correct": float(os.getenv("STAGE_TIMEOUT_CORRECT", "120")),
+    "interpret": float(os.getenv("STAGE_TIMEOUT_INTERPRET", "300")),
+    "synthesize": float(os.getenv("STAGE_TIMEOUT_SYNTHESIZE", "120")),
+}
+
+Event = dict[str, Any]
+
+
+class StageTimeoutError(TimeoutError):
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"Stage '{stage}' timed out after {timeout:g}s")
+        self.stage = stage
+        self.timeout = timeout
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One step of an analysis pipeline.
+
+    ``run`` takes the shared context and is either a coroutine function or an
+    async generator yielding pipeline events. ``when`` can skip the stage, and
+    ``announce`` controls whether the engine emits the stage event itself
+    (stages reporting finer-grained progress emit their own). ``timeout``
+    bounds the time spent waiting on the stage, excluding time the consumer
+    takes to handle its events.
+    """
+
+    name: str
+    run: Callable[[Any], AsyncIterator[Event] | Awaitable[None]]
+    timeout: float | None = None
+    when: Callable[[Any], bool] | None = None
+    announce: bool = True
+
+
+async def run_stages(
+    stages: list[Stage],
+    context: Any,
+    timings: dict[str, float] | None = None,
+) -> AsyncIterator[Event]:
+    """Run ``stages`` in order, yielding their events.
+
+    When ``timings`` is given, it receives the seconds spent in each stage that
+    ran, measured the same way as the stage timeout.
+    """
+    for stage in stages:
+        if stage.when is not None and not stage.when(context):
+            continue
+        if stage.announce:
+            yield {"event": "stage", "stage": stage.name}
+        async for event in _run_with_budget(stage, context, timings):
+            yield event
+
+
+async def _run_with_budget(
+    stage: Stage, context: Any, timings: dict[str, float] | None
+) -> AsyncIterator[Event]:
+    loop = asyncio.get_running_loop()
+    spent = 0.0
+    events = stage.run(context)
+
+    if inspect.isawaitable(events):
+        started = loop.time()
+        try:
+            async with asyncio.timeout(stage.timeout) as deadline:
+                await events
+        except TimeoutError:
+            if deadline.expired():
+                raise StageTimeoutError(stage.name, stage.timeout) from None
+            raise
+        finally:
+            if timings is not None:
+                timings[stage.name] = loop.time() - started
+        return
+
+    remaining = stage.timeout
+
+    try:
+        while True:
+            started = loop.time()
+            try:
+                async with asyncio.timeout(remaining) as deadline:
+                    event = await anext(events)
+            except StopAsyncIteration:
+                return
+            except TimeoutError:
+                if deadline.expired():
+                    raise StageTimeoutError(stage.name, stage.timeout) from None
+                raise
+            finally:
+                spent += loop.time() - started
+
+            if remaining is not None:
+                remaining = stage.timeout - spent
+            yield event
+    finally:
+        if timings is not None:
+            timings[stage.name] = spent
+        await events.aclose()
@@ -1,3 +1,6 @@
+# Bump whenever a prompt changes so cached analyses from older prompts are ignored.
+PROMPT_VERSION = "1"
+
 GENERAL_PROMPT = """
 ## Core Purpose and Goals:
 
@@ -85,3 +88,26 @@ Additionally, you must correct any illogical or jumbled line breaks to ensure pr
 
 After your thorough review, output the carefully corrected Markdown text. JUST the text.
 """
+
+
+SEGMENT_PROMPT_SUFFIX = """
+## Long-Text Mode:
+
+The text below is **part [PART] of [PARTS]** of a longer document that is analyzed in sequence. Analyze only this part, following the rules above, and continue naturally from the previous parts. Do not introduce the whole document or summarize its overall structure; that is covered separately at the end.
+"""
+
+
+SECTION_PROMPT_SUFFIX = """
+## Section Mode:
+
+The text below is **one section** of a longer document whose sections are analyzed separately. Analyze only this section, following the rules above. Do not introduce the whole document, refer to other sections or summarize its overall structure; that is covered separately at the end.
+"""
+
+
+SYNTHESIS_PROMPT = """
+You are concluding a deep, lecture-style analysis of a long `[LEARN_LANGUAGE]` text for an advanced student. Each part of the text has already been analyzed in detail.
+
+You receive an outline made of the first sentence of every paragraph. Using it, explain the **macro-structure** of the whole text: how its argument or narrative unfolds from part to part, the logical connections between the main sections, the authorial intent, and the organizational methods characteristic of its genre.
+
+Write in **[PROF_LANGUAGE]**, quoting `[LEARN_LANGUAGE]` phrases where useful. Do not repeat sentence-level analysis.
+"""
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from llm.agent import TextAnalysisLangchain
+
+AGENT_REGISTRY_MAX_SIZE = int(os.getenv("AGENT_REGISTRY_MAX_SIZE", "128"))
+AGENT_REGISTRY_TTL_SECONDS = float(os.getenv("AGENT_REGISTRY_TTL_SECONDS", "900"))
+
+
+def hash_api_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def _create_agent(**kwargs) -> "TextAnalysisLangchain":
+    # The Gemini SDK takes about a second to import; it is loaded by the startup
+    # warm-up or by the first agent created, not when the app is imported.
+    from llm.agent import TextAnalysisLangchain
+
+    return TextAnalysisLangchain(**kwargs)
+
+
+@dataclass
+class _Entry:
+    agent: "TextAnalysisLangchain"
+    expires_at: float
+
+
+class AgentRegistry:
+    """Bounded, TTL-evicting cache of agents keyed by (hashed API key, model).
+
+    Reusing an agent keeps its Gemini clients, their HTTP keep-alive connections
+    and the structured-output detector alive across requests.
+    Agents created for the same key share a single lite-model client.
+    """
+
+    def __init__(
+        self,
+        max_size: int = AGENT_REGISTRY_MAX_SIZE,
+        ttl_seconds: float = AGENT_REGISTRY_TTL_SECONDS,
+        factory: Callable[..., "TextAnalysisLangchain"] = _create_agent,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1.")
+
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._factory = factory
+        self._clock = clock
+        self._entries: OrderedDict[tuple[str, str], _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, api_key: str, model: str) -> "TextAnalysisLangchain":
+        key = (hash_api_key(api_key), model)
+        now = self._clock()
+
+        with self._lock:
+            self._evict_expired(now)
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                entry.expires_at = now + self.ttl_seconds
+                self._entries.move_to_end(key)
+                return entry.agent
+
+            self.misses += 1
+            agent = self._factory(
+                gemini_key=api_key,
+                model=model,
+                llm_lite=self._shared_lite(key[0]),
+            )
+            self._entries[key] = _Entry(agent, now + self.ttl_seconds)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+            return agent
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _shared_lite(self, key_hash: str):
+        for (entry_key_hash, _model), entry in self._entries.items():
+            if entry_key_hash == key_hash:
+                return entry.agent.llm_lite
+        return None
+
+    def _evict_expired(self, now: float) -> None:
+        # Entries are kept in LRU order and every access refreshes the TTL, so the
+        # oldest entries are also the first to expire.
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now:
+                break
+            del self._entries[key]
+            self.evictions += 1
+
+
+agent_registry = AgentRegistry()
@@ -0,0 +1,357 @@
+import asyncio
+import math
+import os
+import random
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import aclosing
+from typing import TypeVar
+
+from llm.metrics import metrics
+
+LLM_RETRY_ATTEMPTS = int(os.getenv("LLM_RETRY_ATTEMPTS", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.25"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "4"))
+# Short calls still running at this latency percentile get a duplicate request;
+# 0 disables hedging. Calls faster than the floor are never hedged.
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.25"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+# Attempts the Gemini SDK makes per call on its own. Retries are owned by
+# Resilience, so by default the SDK does not multiply them.
+LLM_SDK_MAX_RETRIES = int(os.getenv("LLM_SDK_MAX_RETRIES", "1"))
+
+_TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+
+T = TypeVar("T")
+
+upstream_retries = metrics.counter(
+    "upstream_retries_total",
+    "Upstream LLM calls retried after a transient failure.",
+    ("model", "call"),
+)
+upstream_hedges = metrics.counter(
+    "upstream_hedges_total",
+    "Duplicate upstream requests sent for slow calls, and how many of them won.",
+    ("model", "call", "outcome"),
+)
+breaker_rejections = metrics.counter(
+    "circuit_breaker_rejections_total",
+    "Upstream calls failed fast because the model's circuit was open.",
+    ("model",),
+)
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether retrying the same upstream request may succeed."""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    retryable = getattr(exc, "is_retryable", None)
+    if retryable is not None:
+        return bool(retryable)
+    for attribute in ("code", "status_code"):
+        if getattr(exc, attribute, None) in _TRANSIENT_STATUS:
+            return True
+    return isinstance(exc, (ConnectionError, TimeoutError))
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """Whether the upstream refused the call for the caller's quota.
+
+    Quotas belong to an API key, so these say nothing about the model's health
+    and are retried without counting against its circuit.
+    """
+    for attribute in ("code", "status_code"):
+        if getattr(exc, attribute, None) == 429:
+            return True
+    return getattr(exc, "status", None) == "RESOURCE_EXHAUSTED"
+
+
+def backoff_delay(
+    attempt: int,
+    base: float = LLM_RETRY_BASE_DELAY,
+    cap: float = LLM_RETRY_MAX_DELAY,
+    rng: random.Random | None = None,
+) -> float:
+    """Full-jitter exponential backoff before retry number ``attempt + 1``."""
+    return (rng or random).uniform(0, min(cap, base * 2**attempt))
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, model: str, retry_after: float):
+        super().__init__(
+            f"Upstream model '{model}' is failing; not retrying for "
+            f"{max(1, math.ceil(retry_after))}s."
+        )
+        self.model = model
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one upstream model.
+
+    After ``failure_threshold`` transient failures in a row the circuit opens
+    and calls fail fast for ``reset_seconds``. Then a single probe is let
+    through: its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        failure_threshold: int = LLM_BREAKER_FAILURES,
+        reset_seconds: float = LLM_BREAKER_RESET_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self.failures = 0
+        self.opened_at: float | None = None
+        # When the current half-open probe started. A probe that never reports
+        # back (e.g. cancelled by a stage deadline) expires like the circuit.
+        self._probe_at: float | None = None
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self._clock() - self.opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    def check(self) -> None:
+        state = self.state
+        if state == "closed":
+            return
+        now = self._clock()
+        if state == "half_open" and (
+            self._probe_at is None or now - self._probe_at >= self.reset_seconds
+        ):
+            self._probe_at = now
+            return
+        breaker_rejections.inc(model=self.model)
+        remaining = self.reset_seconds
+        if self.opened_at is not None:
+            remaining -= now - self.opened_at
+        raise CircuitOpenError(self.model, max(remaining, 0.0))
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probe_at = None
+
+    def record_error(self, exc: BaseException) -> None:
+        if not is_rate_limited(exc):
+            self.record_failure()
+            return
+        # Neither a success nor a failure: hand a half-open probe to the next
+        # caller rather than holding the circuit until the probe expires.
+        self._probe_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probe_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self._probe_at is not None:
+                self.opened += 1
+            self.opened_at = self._clock()
+            self._probe_at = None
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "state": self.state,
+            "open": int(self.state != "closed"),
+            "failures": self.failures,
+            "opened": self.opened,
+        }
+
+
+class LatencyWindow:
+    def __init__(self, size: int = 200):
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, percent: float, min_samples: int) -> float | None:
+        if len(self._samples) < max(1, min_samples):
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, math.ceil(percent / 100 * len(ordered)) - 1)
+        return ordered[max(index, 0)]
+
+
+class Resilience:
+    """Retries, hedging and circuit breaking for upstream LLM calls.
+
+    Breakers are per model and latency windows per (model, call), shared by
+    every agent so one client's incident protects the others. Rate limits are
+    per API key, so they are retried but kept out of the breakers.
+    """
+
+    def __init__(
+        self,
+        attempts: int = LLM_RETRY_ATTEMPTS,
+        hedge_percentile: float = LLM_HEDGE_PERCENTILE,
+        hedge_min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+        hedge_min_delay: float = LLM_HEDGE_MIN_DELAY,
+        breaker_factory: Callable[[str], CircuitBreaker] = CircuitBreaker,
+        backoff: Callable[[int], float] = backoff_delay,
+    ):
+        self.attempts = max(1, attempts)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self._breaker_factory = breaker_factory
+        self._backoff = backoff
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._latencies: dict[tuple[str, str], LatencyWindow] = {}
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = self._breaker_factory(model)
+        return breaker
+
+    def hedge_delay(self, model: str, call: str) -> float | None:
+        if self.hedge_percentile <= 0:
+            return None
+        window = self._latencies.get((model, call))
+        if window is None:
+            return None
+        threshold = window.percentile(self.hedge_percentile, self.hedge_min_samples)
+        if threshold is None:
+            return None
+        return max(threshold, self.hedge_min_delay)
+
+    async def call(
+        self,
+        model: str,
+        call: str,
+        request: Callable[[], Awaitable[T]],
+        hedge: bool = False,
+    ) -> T:
+        """Await ``request()``, retrying transient failures with jittered backoff.
+
+        ``request`` must be idempotent: with ``hedge`` it may run twice at once.
+        """
+        breaker = self.breaker(model)
+        for attempt in range(self.attempts):
+            breaker.check()
+            try:
+                if hedge:
+                    result = await self._hedged(model, call, request)
+                else:
+                    result = await self._timed(model, call, request)
+            except Exception as exc:
+                if not is_transient(exc):
+                    # The upstream answered; the request itself was at fault.
+                    breaker.record_success()
+                    raise
+                breaker.record_error(exc)
+                if attempt + 1 == self.attempts:
+                    raise
+                upstream_retries.inc(model=model, call=call)
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            breaker.record_success()
+            return result
+        raise AssertionError("unreachable")
+
+    async def stream(
+        self,
+        model: str,
+        call: str,
+        request: Callable[[], AsyncIterator[T]],
+    ) -> AsyncIterator[T]:
+        """Iterate ``request()``, retrying only until the first item is out.
+
+        Once something has been yielded a retry would duplicate output, so
+        later failures are raised as they are.
+        """
+        breaker = self.breaker(model)
+        for attempt in range(self.attempts):
+            breaker.check()
+            started = False
+            try:
+                async with aclosing(request()) as items:
+                    async for item in items:
+                        started = True
+                        yield item
+            except Exception as exc:
+                if not is_transient(exc):
+                    breaker.record_success()
+                    raise
+                breaker.record_error(exc)
+                if started or attempt + 1 == self.attempts:
+                    raise
+                upstream_retries.inc(model=model, call=call)
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            breaker.record_success()
+            return
+
+    async def _timed(
+        self, model: str, call: str, request: Callable[[], Awaitable[T]]
+    ) -> T:
+        started = time.perf_counter()
+        result = await request()
+        window = self._latencies.get((model, call))
+        if window is None:
+            window = self._latencies[(model, call)] = LatencyWindow()
+        window.observe(time.perf_counter() - started)
+        return result
+
+    async def _hedged(
+        self, model: str, call: str, request: Callable[[], Awaitable[T]]
+    ) -> T:
+        delay = self.hedge_delay(model, call)
+        primary = asyncio.ensure_future(self._timed(model, call, request))
+        if delay is None:
+            return await primary
+
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result()
+
+            hedge = asyncio.ensure_future(self._timed(model, call, request))
+            tasks.add(hedge)
+            error: BaseException | None = None
+            while tasks:
+                done, tasks = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        outcome = "won" if task is hedge else "lost"
+                        upstream_hedges.inc(model=model, call=call, outcome=outcome)
+                        return task.result()
+                    error = task.exception()
+            upstream_hedges.inc(model=model, call=call, outcome="failed")
+            assert error is not None
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict[str, object]:
+        hedge_delays: dict[str, dict[str, float]] = {}
+        for model, call in self._latencies:
+            delay = self.hedge_delay(model, call)
+            if delay is not None:
+                hedge_delays.setdefault(model, {})[call] = round(delay * 1000, 1)
+        return {
+            "breakers": {
+                model: breaker.stats() for model, breaker in self._breakers.items()
+            },
+            "hedge_delay_ms": hedge_delays,
+        }
+
+
+upstream = Resilience()
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import re
+from collections.abc import AsyncIterator, Callable
+
+LONG_TEXT_MIN_TOKENS = int(os.getenv("LONG_TEXT_MIN_TOKENS", "6000"))
+LONG_TEXT_SEGMENT_TOKENS = int(os.getenv("LONG_TEXT_SEGMENT_TOKENS", "2500"))
+LONG_TEXT_CONCURRENCY = int(os.getenv("LONG_TEXT_CONCURRENCY", "3"))
+LONG_TEXT_SYNTHESIS = os.getenv("LONG_TEXT_SYNTHESIS", "true").lower() == "true"
+# In incremental mode, paragraphs shorter than this join the paragraph after them.
+INCREMENTAL_MIN_SECTION_TOKENS = int(os.getenv("INCREMENTAL_MIN_SECTION_TOKENS", "60"))
+
+SEGMENT_SEPARATOR = "\n\n---\n\n"
+
+_WIDE_CHARS = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s+|(?<=[。！？])")
+_END = object()
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly one token per CJK character and four characters per token otherwise.
+    wide = len(_WIDE_CHARS.findall(text))
+    return wide + (len(text) - wide + 3) // 4
+
+
+def split_paragraphs(text: str) -> list[str]:
+    return [p.strip() for p in _PARAGRAPH_BREAK.split(text) if p.strip()]
+
+
+def _split_oversized(paragraph: str, max_tokens: int) -> list[str]:
+    pieces: list[str] = []
+    current = ""
+    for sentence in _SENTENCE_END.split(paragraph):
+        if not sentence:
+            continue
+        candidate = f"{current} {sentence}".strip() if current else sentence
+        if current and estimate_tokens(candidate) > max_tokens:
+            pieces.append(current)
+            candidate = sentence
+        current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_segments(text: str, max_tokens: int) -> list[str]:
+    """Pack whole paragraphs into segments of at most ``max_tokens``.
+
+    A paragraph longer than the budget is split on sentence boundaries; a single
+    sentence longer than the budget is kept whole.
+    """
+    segments: list[str] = []
+    current: list[str] = []
+    current_tokens = 0
+
+    for paragraph in split_paragraphs(text):
+        for piece in (
+            _split_oversized(paragraph, max_tokens)
+            if estimate_tokens(paragraph) > max_tokens
+            else [paragraph]
+        ):
+            tokens = estimate_tokens(piece)
+            if current and current_tokens + tokens > max_tokens:
+                segments.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+
+    if current:
+        segments.append("\n\n".join(current))
+    return segments
+
+
+def split_sections(text: str, min_tokens: int, max_tokens: int) -> list[str]:
+    """Split ``text`` into paragraph-aligned sections for incremental analysis.
+
+    Unlike ``split_segments``, which packs paragraphs up to a budget, a section's
+    boundaries depend only on its own paragraphs, so editing one paragraph leaves
+    every other section unchanged. Paragraphs shorter than ``min_tokens``
+    (headings, captions, single lines) join the paragraph after them, or the last
+    section at the end of the text; a paragraph longer than ``max_tokens`` is
+    split on sentence boundaries.
+    """
+    sections: list[str] = []
+    pending: list[str] = []
+
+    for paragraph in split_paragraphs(text):
+        for piece in (
+            _split_oversized(paragraph, max_tokens)
+            if estimate_tokens(paragraph) > max_tokens
+            else [paragraph]
+        ):
+            pending.append(piece)
+            if estimate_tokens(piece) >= min_tokens:
+                sections.append("\n\n".join(pending))
+                pending = []
+
+    if pending:
+        if sections:
+            pending.insert(0, sections.pop())
+        sections.append("\n\n".join(pending))
+    return sections
+
+
+def outline(segments: list[str], max_chars: int = 6000) -> str:
+    """First sentence of every paragraph: a cheap skim of the whole document."""
+    lines: list[str] = []
+    size = 0
+    for segment in segments:
+        for paragraph in split_paragraphs(segment):
+            first = _SENTENCE_END.split(paragraph, maxsplit=1)[0].strip()
+            if size + len(first) > max_chars:
+                return "\n".join(lines)
+            lines.append(first)
+            size += len(first)
+    return "\n".join(lines)
+
+
+async def stream_in_order(
+    producers: list[Callable[[], AsyncIterator[str]]],
+    concurrency: int,
+) -> AsyncIterator[tuple[int, str]]:
+    """Run producers with bounded parallelism and yield their output in order.
+
+    Output of producer ``i`` is buffered until every earlier producer finished,
+    then flushed and followed live. The first failure cancels the rest.
+    """
+    queues: list[asyncio.Queue] = [asyncio.Queue() for _ in producers]
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(index: int) -> None:
+        queue = queues[index]
+        try:
+            async with semaphore:
+                async for delta in producers[index]():
+                    queue.put_nowait(delta)
+        except Exception as exc:
+            queue.put_nowait(exc)
+        finally:
+            queue.put_nowait(_END)
+
+    tasks = [asyncio.create_task(run(index)) for index in range(len(producers))]
+    try:
+        for index, queue in enumerate(queues):
+            while (item := await queue.get()) is not _END:
+                if isinstance(item, Exception):
+                    raise item
+                yield index, item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
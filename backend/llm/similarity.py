@@ -0,0 +1,421 @@
+import asyncio
+import hashlib
+import os
+import re
+import sys
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from llm.metrics import metrics
+
+# Finds past analyses of nearly the same text: the same article with other
+# whitespace, quotes or line breaks, or with a footer added, which the exact
+# cache key misses.
+NEAR_DUPLICATE_INDEX = os.getenv("NEAR_DUPLICATE_INDEX", "true").lower() == "true"
+# Estimated Jaccard similarity of the word shingles above which texts match.
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+NEAR_DUPLICATE_PERMUTATIONS = int(os.getenv("NEAR_DUPLICATE_PERMUTATIONS", "128"))
+NEAR_DUPLICATE_BANDS = int(os.getenv("NEAR_DUPLICATE_BANDS", "16"))
+# Words per shingle.
+NEAR_DUPLICATE_SHINGLE = int(os.getenv("NEAR_DUPLICATE_SHINGLE", "3"))
+# Documents kept in memory; the oldest are dropped beyond it.
+NEAR_DUPLICATE_MAX_DOCUMENTS = int(os.getenv("NEAR_DUPLICATE_MAX_DOCUMENTS", "1000000"))
+
+# Kana and CJK ideographs are shingled per character, other scripts per word.
+_TOKEN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]|[^\W_]+")
+_EMPTY = 1 << 64
+# Run entries pack a band key above the low bits of the document id.
+_ID_BITS = 24
+_ID_MASK = (1 << _ID_BITS) - 1
+_KEY_MASK = (1 << (64 - _ID_BITS)) - 1
+_MERGE_MIN = 4096
+
+near_duplicate_lookups = metrics.counter(
+    "near_duplicate_lookups_total",
+    "Near-duplicate index lookups, by whether a past analysis matched.",
+    ("outcome",),
+)
+
+
+def shingles(text: str, size: int = NEAR_DUPLICATE_SHINGLE) -> set[str]:
+    """Word ``size``-grams of ``text``, ignoring case, punctuation and spacing."""
+    tokens = _TOKEN.findall(unicodedata.normalize("NFKC", text).casefold())
+    if len(tokens) <= size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i : i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def minhash_signature(
+    text: str,
+    permutations: int = NEAR_DUPLICATE_PERMUTATIONS,
+    shingle: int = NEAR_DUPLICATE_SHINGLE,
+) -> bytes | None:
+    """MinHash signature of ``text``'s shingles; None when it has no words.
+
+    Uses one-permutation hashing: each shingle is hashed once and the hash
+    picks the slot it competes for, so the cost is one hash per shingle
+    whatever the number of permutations. Slots no shingle landed in borrow the
+    next filled slot's minimum (densification). The minima are truncated to 16
+    bits, which only adds a 1/65536 chance of equal slots by accident.
+    """
+    found = shingles(text, shingle)
+    if not found:
+        return None
+    minima = [_EMPTY] * permutations
+    for item in found:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest()
+        value, slot = divmod(int.from_bytes(digest, "little"), permutations)
+        if value < minima[slot]:
+            minima[slot] = value
+
+    values = array("H", bytes(2 * permutations))
+    for slot in range(permutations):
+        distance = 0
+        source = slot
+        while minima[source] == _EMPTY:
+            distance += 1
+            source = (slot + distance) % permutations
+        values[slot] = (minima[source] + distance * 0x9E3779B1) & 0xFFFF
+    return values.tobytes()
+
+
+def estimate_similarity(a: bytes, b: bytes) -> float:
+    """Estimated Jaccard similarity: the share of equal signature slots."""
+    left, right = memoryview(a).cast("H"), memoryview(b).cast("H")
+    return sum(x == y for x, y in zip(left, right)) / len(left)
+
+
+@dataclass(frozen=True)
+class NearDuplicate:
+    cache_key: str
+    similarity: float
+
+
+def analysis_scope(owner: str, target_language: str, model: str | None) -> str:
+    """Texts only match past analyses requested with the same key (``owner`` is
+    its hash), into the same language, by the same model."""
+    return f"{owner}\x00{target_language.upper()}\x00{model or ''}"
+
+
+class NearDuplicateIndex:
+    """In-memory MinHash/LSH index from texts to the cache keys of their analyses.
+
+    Signatures are cut into ``bands``; documents sharing any band with a query
+    are candidates, and candidates whose signatures agree on at least
+    ``threshold`` of their slots match. Band keys also cover the analysis
+    scope, so only the caller's own analyses into the same language by the
+    same model are found.
+
+    Each band is a sorted ``array`` of band keys packed with document ids,
+    searched by bisection, plus a dict of the documents added since it was last
+    rebuilt. Rebuilding merges the two once the recent documents reach an
+    eighth of the total, so it is amortized over the additions; it runs outside
+    the lock while lookups go on against the old runs. Once ``start`` was
+    called, merges run on a dedicated thread driven by a background task, so
+    the addition that triggers one returns at once; without it they run in the
+    thread of that addition. Signatures and cache keys are packed into flat byte
+    arrays, indexed by document id. Memory per document is roughly the
+    signature, the 32-byte cache key and 8 bytes per band;
+    ``benchmarks.near_duplicates`` measures it.
+    """
+
+    def __init__(
+        self,
+        threshold: float = NEAR_DUPLICATE_THRESHOLD,
+        permutations: int = NEAR_DUPLICATE_PERMUTATIONS,
+        bands: int = NEAR_DUPLICATE_BANDS,
+        max_documents: int = NEAR_DUPLICATE_MAX_DOCUMENTS,
+        merge_min: int = _MERGE_MIN,
+    ):
+        if permutations % bands:
+            raise ValueError("Permutations must split evenly into bands.")
+        if max_documents >= 1 << (_ID_BITS - 1):
+            raise ValueError(f"At most {(1 << (_ID_BITS - 1)) - 1} documents.")
+        self.threshold = threshold
+        self.permutations = permutations
+        self.bands = bands
+        self.max_documents = max_documents
+        self.merge_min = merge_min
+        self.signature_size = 2 * permutations
+        self._band_size = self.signature_size // bands
+        self._lock = threading.Lock()
+        # Bumped by clear(), so a rebuild started before it is discarded.
+        self._generation = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._merger: asyncio.Task | None = None
+        self.clear()
+
+        self.queries = 0
+        self.hits = 0
+        self.candidates = 0
+        self.merges = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._signatures = bytearray()
+            self._cache_keys = bytearray()
+            # Id of the oldest document kept, and of the next one added.
+            self._base = 0
+            self._next = 0
+            self._runs = [array("Q") for _ in range(self.bands)]
+            self._recent: list[dict[int, list[int]]] = [{} for _ in range(self.bands)]
+            # The recent documents a rebuild in progress is merging.
+            self._merging: list[dict[int, list[int]]] = [{} for _ in range(self.bands)]
+            self._recent_count = 0
+            self._rebuilding = False
+            self._stale = False
+            self._generation += 1
+            self.evicted = 0
+
+    def __len__(self) -> int:
+        return self._next - self._base
+
+    @property
+    def running(self) -> bool:
+        return self._merger is not None and not self._merger.done()
+
+    def start(self) -> None:
+        """Run merges from a background task on the running loop from now on."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._merger = asyncio.create_task(self._merge_loop())
+
+    async def stop(self) -> None:
+        if self._merger is None:
+            return
+        merger, self._merger = self._merger, None
+        merger.cancel()
+        await asyncio.gather(merger, return_exceptions=True)
+        if self._wakeup.is_set():
+            # Requested but never started: leave it to the next addition. A merge
+            # already running finishes on its thread.
+            with self._lock:
+                self._rebuilding = False
+
+    async def _merge_loop(self) -> None:
+        executor = ThreadPoolExecutor(1, thread_name_prefix="near-duplicates")
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                await self._loop.run_in_executor(executor, self._merge)
+        finally:
+            executor.shutdown(wait=False)
+
+    def _request_merge(self) -> None:
+        """Hand a due merge to the background task, or run it here without one."""
+        if self.running:
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+                return
+            except RuntimeError:
+                # The loop closed without stop() being awaited.
+                pass
+        self._merge()
+
+    def _band_keys(self, signature: bytes, scope: str) -> list[int]:
+        # Never persisted, so the per-process salt of hash() does not matter.
+        size = self._band_size
+        return [
+            hash((band, scope, signature[band * size : (band + 1) * size])) & _KEY_MASK
+            for band in range(self.bands)
+        ]
+
+    def add(self, signature: bytes, scope: str, cache_key: str) -> None:
+        if len(signature) != self.signature_size:
+            raise ValueError("Signature does not match the index permutations.")
+        keys = self._band_keys(signature, scope)
+        with self._lock:
+            doc = self._next
+            self._next += 1
+            self._signatures += signature
+            self._cache_keys += bytes.fromhex(cache_key)
+            for band, key in enumerate(keys):
+                self._recent[band].setdefault(key, []).append(doc)
+            self._recent_count += 1
+            if len(self) > self.max_documents:
+                self._evict(max(1, self.max_documents // 16))
+            rebuild = not self._rebuilding and self._recent_count >= max(
+                self.merge_min, len(self._runs[0]) // 8
+            )
+            if rebuild:
+                self._rebuilding = True
+        if rebuild:
+            self._request_merge()
+
+    def add_text(self, text: str, scope: str, cache_key: str) -> bytes | None:
+        """Index ``text``; returns its signature, to be stored with History."""
+        signature = minhash_signature(text, self.permutations)
+        if signature is not None:
+            self.add(signature, scope, cache_key)
+        return signature
+
+    def load(self, documents: Iterable[tuple[bytes, str, str]]) -> int:
+        """Add ``(signature, scope, cache_key)`` documents, oldest first.
+
+        Skips signatures of another size, from before a configuration change.
+        """
+        loaded = 0
+        for signature, scope, cache_key in documents:
+            if len(signature) == self.signature_size:
+                self.add(signature, scope, cache_key)
+                loaded += 1
+        self.rebuild()
+        return loaded
+
+    def rebuild(self) -> None:
+        """Merge the recent documents into the band runs now, unless a rebuild
+        is already running."""
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        self._merge()
+
+    def _evict(self, count: int) -> None:
+        count = min(count, len(self))
+        del self._signatures[: count * self.signature_size]
+        del self._cache_keys[: count * 32]
+        self._base += count
+        self.evicted += count
+        # Their run entries are dropped at the next merge, ignored until then.
+        self._stale = True
+
+    def _live(self, low_bits: int, base: int, end: int) -> int | None:
+        """The document an entry's low id bits stand for, if it is in
+        ``[base, end)``; evicted documents resolve outside of it."""
+        doc = base + ((low_bits - base) & _ID_MASK)
+        return doc if doc < end else None
+
+    def _merge(self) -> None:
+        with self._lock:
+            merging, self._recent = self._recent, [{} for _ in range(self.bands)]
+            self._merging = merging
+            self._recent_count = 0
+            runs, stale, evicted = self._runs, self._stale, self.evicted
+            base, end, generation = self._base, self._next, self._generation
+
+        merged = []
+        for band in range(self.bands):
+            entries = [
+                key << _ID_BITS | (doc & _ID_MASK)
+                for key, docs in merging[band].items()
+                for doc in docs
+                if doc >= base
+            ]
+            if stale:
+                entries.extend(
+                    e
+                    for e in runs[band]
+                    if self._live(e & _ID_MASK, base, end) is not None
+                )
+            else:
+                entries.extend(runs[band])
+            # Two sorted runs: the sort only merges them.
+            entries.sort()
+            merged.append(array("Q", entries))
+
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._runs = merged
+            self._merging = [{} for _ in range(self.bands)]
+            self._rebuilding = False
+            # Documents evicted meanwhile still have entries in the new runs.
+            self._stale = self.evicted != evicted
+            self.merges += 1
+
+    def find(
+        self,
+        signature: bytes,
+        scope: str,
+        threshold: float | None = None,
+        limit: int = 5,
+    ) -> list[NearDuplicate]:
+        """Analyses of texts similar to ``signature``, most similar first."""
+        threshold = self.threshold if threshold is None else threshold
+        keys = self._band_keys(signature, scope)
+        size = self.signature_size
+        best: dict[bytes, float] = {}
+        with self._lock:
+            candidates: set[int] = set()
+            for band, key in enumerate(keys):
+                candidates.update(self._recent[band].get(key, ()))
+                candidates.update(self._merging[band].get(key, ()))
+                run = self._runs[band]
+                i = bisect_left(run, key << _ID_BITS)
+                while i < len(run) and run[i] >> _ID_BITS == key:
+                    doc = self._live(run[i] & _ID_MASK, self._base, self._next)
+                    if doc is not None:
+                        candidates.add(doc)
+                    i += 1
+
+            for doc in candidates:
+                offset = doc - self._base
+                if offset < 0:
+                    continue
+                stored = self._signatures[offset * size : (offset + 1) * size]
+                similarity = estimate_similarity(signature, stored)
+                if similarity >= threshold:
+                    cache_key = bytes(self._cache_keys[offset * 32 : (offset + 1) * 32])
+                    best[cache_key] = max(best.get(cache_key, 0.0), similarity)
+
+            self.queries += 1
+            self.candidates += len(candidates)
+            self.hits += bool(best)
+        near_duplicate_lookups.inc(outcome="hit" if best else "miss")
+        matches = [
+            NearDuplicate(cache_key.hex(), round(similarity, 3))
+            for cache_key, similarity in best.items()
+        ]
+        matches.sort(key=lambda match: match.similarity, reverse=True)
+        return matches[:limit]
+
+    def find_text(
+        self,
+        text: str,
+        scope: str,
+        threshold: float | None = None,
+        limit: int = 5,
+    ) -> list[NearDuplicate]:
+        signature = minhash_signature(text, self.permutations)
+        if signature is None:
+            return []
+        return self.find(signature, scope, threshold, limit)
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the index structures, including allocation slack."""
+        total = sys.getsizeof(self._signatures) + sys.getsizeof(self._cache_keys)
+        total += sum(sys.getsizeof(run) for run in self._runs)
+        for recent in (*self._recent, *self._merging):
+            total += sys.getsizeof(recent)
+            total += sum(
+                sys.getsizeof(docs) + 32 * (len(docs) + 1) for docs in recent.values()
+            )
+        return total
+
+    def stats(self) -> dict[str, int | float]:
+        documents = len(self)
+        memory = self.memory_bytes()
+        return {
+            "documents": documents,
+            "evicted": self.evicted,
+            "threshold": self.threshold,
+            "queries": self.queries,
+            "hits": self.hits,
+            "mean_candidates": round(self.candidates / max(1, self.queries), 2),
+            "merges": self.merges,
+            "memory_bytes": memory,
+            "bytes_per_document": round(memory / max(1, documents)),
+        }
+
+
+near_duplicates = NearDuplicateIndex()
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import threading
+from collections.abc import Coroutine
+from typing import Any
+
+from llm.detector import Detection
+
+SPECULATE_OFF = "off"
+SPECULATE_ALWAYS = "always"
+SPECULATE_NOISY = "noisy"
+SPECULATION_POLICIES = {SPECULATE_OFF, SPECULATE_ALWAYS, SPECULATE_NOISY}
+
+SPECULATIVE_CORRECTION = os.getenv("SPECULATIVE_CORRECTION", SPECULATE_OFF).lower()
+SPECULATE_NOISE_THRESHOLD = float(os.getenv("SPECULATE_NOISE_THRESHOLD", "0.15"))
+
+if SPECULATIVE_CORRECTION not in SPECULATION_POLICIES:
+    raise ValueError(
+        "SPECULATIVE_CORRECTION must be one of: "
+        f"{', '.join(sorted(SPECULATION_POLICIES))}"
+    )
+
+
+def should_speculate(policy: str, detection: Detection) -> bool:
+    """Decide whether to start correction before the LLM detector answers."""
+    if policy == SPECULATE_ALWAYS:
+        return True
+    if policy == SPECULATE_NOISY:
+        return detection.noise_score >= SPECULATE_NOISE_THRESHOLD
+    return False
+
+
+class SpeculationStats:
+    """Outcome of speculative corrections: latency saved versus calls wasted."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.launched = 0
+        self.used = 0
+        self.wasted = 0
+        self.saved_seconds = 0.0
+
+    def record_launch(self) -> None:
+        with self._lock:
+            self.launched += 1
+
+    def record_used(self, saved_seconds: float) -> None:
+        with self._lock:
+            self.used += 1
+            self.saved_seconds += saved_seconds
+
+    def record_wasted(self) -> None:
+        with self._lock:
+            self.wasted += 1
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            return {
+                "launched": self.launched,
+                "used": self.used,
+                "wasted": self.wasted,
+                "saved_seconds": round(self.saved_seconds, 3),
+                "mean_saved_seconds": (
+                    round(self.saved_seconds / self.used, 3) if self.used else 0.0
+                ),
+            }
+
+
+class SpeculativeCorrection:
+    """A correction started before detection decided whether it is needed."""
+
+    def __init__(
+        self,
+        correction: Coroutine[Any, Any, tuple[str, float]],
+        stats: SpeculationStats,
+    ):
+        self.task = asyncio.create_task(correction)
+        self.stats = stats
+        self.detect_seconds = 0.0
+        stats.record_launch()
+
+    async def result(self) -> str:
+        corrected_text, correct_seconds = await self.task
+        # Run sequentially, correction would have started after detection ended.
+        self.stats.record_used(min(self.detect_seconds, correct_seconds))
+        return corrected_text
+
+    def discard(self) -> None:
+        self.cancel()
+        self.stats.record_wasted()
+
+    def cancel(self) -> None:
+        if not self.task.done():
+            self.task.cancel()
+        elif not self.task.cancelled():
+            # Retrieve the outcome so a failed, unused correction is not reported.
+            self.task.exception()
+
+
+speculation_stats = SpeculationStats()
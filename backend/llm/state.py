@@ -1,6 +1,14 @@
+from dataclasses import dataclass, field
 from typing import Optional, TypedDict
 
-from llm.prompts import GENERAL_PROMPT
+from llm.batch import DetectionMemo
+from llm.prompts import (
+    GENERAL_PROMPT,
+    SECTION_PROMPT_SUFFIX,
+    SEGMENT_PROMPT_SUFFIX,
+    SYNTHESIS_PROMPT,
+)
+from llm.speculation import SpeculativeCorrection
 
 LANG_MAP = {
     "AR": "Arabic",
@@ -26,6 +34,25 @@ class MultiAgentState(TypedDict):
     interpretation: Optional[str]
 
 
+@dataclass
+class AnalysisContext:
+    """State shared by the stages of one analysis run."""
+
+    state: MultiAgentState
+    segments: list[str]
+    speculative: SpeculativeCorrection | None = None
+    chunks: list[str] = field(default_factory=list)
+    timings: dict[str, float] = field(default_factory=dict)
+    # Detections shared with other analyses of the same batch.
+    detections: DetectionMemo | None = None
+    # Segments are independent sections whose interpretations are memoized.
+    incremental: bool = False
+
+    @property
+    def is_long(self) -> bool:
+        return len(self.segments) > 1
+
+
 def create_initial_state(text: str, user_language: str) -> MultiAgentState:
     return {
         "messages": [],
@@ -46,3 +73,27 @@ def build_analysis_prompt(text_language: str, user_language: str) -> str:
     return GENERAL_PROMPT.replace("[LEARN_LANGUAGE]", learn_lang).replace(
         "[PROF_LANGUAGE]", user_lang
     )
+
+
+def build_segment_prompt(
+    text_language: str, user_language: str, part: int, parts: int
+) -> str:
+    suffix = SEGMENT_PROMPT_SUFFIX.replace("[PART]", str(part)).replace(
+        "[PARTS]", str(parts)
+    )
+    return build_analysis_prompt(text_language, user_language) + suffix
+
+
+def build_section_prompt(text_language: str, user_language: str) -> str:
+    # Position-free, so a section's memoized interpretation survives edits
+    # elsewhere in the document.
+    return build_analysis_prompt(text_language, user_language) + SECTION_PROMPT_SUFFIX
+
+
+def build_synthesis_prompt(text_language: str, user_language: str) -> str:
+    learn_lang = LANG_MAP.get(text_language, "English")
+    user_lang = LANG_MAP.get(user_language, "English")
+
+    return SYNTHESIS_PROMPT.replace("[LEARN_LANGUAGE]", learn_lang).replace(
+        "[PROF_LANGUAGE]", user_lang
+    )
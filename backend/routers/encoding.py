@@ -0,0 +1,31 @@
+def encoding_quality(accept_encoding: str | None, coding: str) -> float:
+    """Quality the ``Accept-Encoding`` header gives ``coding`` (0 if refused)."""
+    wildcard = 0.0
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if name not in (coding, "*"):
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name == coding:
+            return quality
+        wildcard = quality
+    return wildcard
+
+
+def preferred_encoding(
+    accept_encoding: str | None, available: tuple[str, ...]
+) -> str | None:
+    """The best of ``available`` (in server preference order) the client takes."""
+    best, best_quality = None, 0.0
+    for coding in available:
+        quality = encoding_quality(accept_encoding, coding)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
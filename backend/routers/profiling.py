@@ -0,0 +1,258 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from types import FrameType
+
+from llm.metrics import metrics
+
+# A heartbeat callback runs on the event loop every interval; when a watchdog
+# thread sees it late by more than the threshold, the loop is blocked and the
+# watchdog records what the loop thread is running at that moment.
+LOOP_LAG_MONITOR = os.getenv("LOOP_LAG_MONITOR", "true").lower() == "true"
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.05"))
+LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD", "0.1"))
+# Most recent blocking intervals kept with their stacks.
+LOOP_LAG_HISTORY = int(os.getenv("LOOP_LAG_HISTORY", "50"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+loop_lag = metrics.histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop heartbeat ran, beyond its interval.",
+    buckets=LAG_BUCKETS,
+)
+loop_blocks = metrics.counter(
+    "event_loop_blocks_total",
+    "Times the event loop was blocked for longer than the lag threshold.",
+)
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _short_path(filename: str) -> str:
+    if filename.startswith(_BACKEND_DIR):
+        return os.path.relpath(filename, _BACKEND_DIR)
+    _, found, tail = filename.rpartition("site-packages" + os.sep)
+    if found:
+        return tail
+    return filename.rpartition(os.sep + "lib" + os.sep)[2] or filename
+
+
+def stack_lines(frame: FrameType | None) -> list[str]:
+    """Frames from the outermost call to ``frame``, at their current lines."""
+    lines = []
+    while frame is not None:
+        code = frame.f_code
+        lines.append(
+            f"{_short_path(code.co_filename)}:{frame.f_lineno} in {code.co_name}"
+        )
+        frame = frame.f_back
+    return lines[::-1]
+
+
+def collapse_stack(frame: FrameType | None, root: str) -> str:
+    """One line of the collapsed-stack format read by flamegraph.pl, speedscope
+    and the like: ``root;outer;...;inner``, each frame ``function (file:line)``
+    with the line the function starts at, so samples group per function."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        path = _short_path(code.co_filename)
+        names.append(f"{code.co_name} ({path}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join([root, *reversed(names)])
+
+
+@dataclass
+class LoopBlock:
+    started_at: float
+    seconds: float = 0.0
+    stack: list[str] = field(default_factory=list)
+    ongoing: bool = True
+
+
+class LoopLagMonitor:
+    """Detects event loop blocking and records the stack responsible.
+
+    A heartbeat scheduled on the loop every ``interval`` measures how late it
+    runs. A watchdog thread checks the last heartbeat; once it is overdue by
+    ``threshold``, the loop thread is stuck in one callback (sync work, a
+    blocking call) and its current stack is captured while it still is. The
+    interval ends, and is recorded with its full duration, at the next beat.
+    Costs a callback and a thread wake-up per interval.
+    """
+
+    def __init__(
+        self,
+        interval: float = LOOP_LAG_INTERVAL,
+        threshold: float = LOOP_LAG_THRESHOLD,
+        history: int = LOOP_LAG_HISTORY,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.blocks: deque[LoopBlock] = deque(maxlen=history)
+        self.loop_thread: int | None = None
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._watchdog: threading.Thread | None = None
+        self._handle: asyncio.TimerHandle | None = None
+        self._last_beat = 0.0
+        self._current: LoopBlock | None = None
+        self.beats = 0
+        self.blocked = 0
+        self.max_lag = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._watchdog is not None and self._watchdog.is_alive()
+
+    def start(self) -> None:
+        """Start monitoring the running loop; call from a coroutine on it."""
+        if self.running:
+            return
+        self.loop_thread = threading.get_ident()
+        self._stopping.clear()
+        self._last_beat = self._clock()
+        self._handle = asyncio.get_running_loop().call_later(self.interval, self._beat)
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-lag-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._stopping.set()
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+    def _beat(self) -> None:
+        now = self._clock()
+        lag = max(0.0, now - self._last_beat - self.interval)
+        loop_lag.observe(lag)
+        with self._lock:
+            self._last_beat = now
+            self.beats += 1
+            self.max_lag = max(self.max_lag, lag)
+            block, self._current = self._current, None
+            if block is not None:
+                block.seconds = round(lag, 3)
+                block.ongoing = False
+        if block is not None:
+            self.blocked += 1
+            loop_blocks.inc()
+        self._handle = asyncio.get_running_loop().call_later(self.interval, self._beat)
+
+    def _watch(self) -> None:
+        while not self._stopping.wait(self.interval):
+            if self._overdue() < self.threshold or self._current is not None:
+                continue
+            frame = sys._current_frames().get(self.loop_thread)
+            stack = stack_lines(frame)
+            with self._lock:
+                # The beat may have run while the stack was being read.
+                overdue = self._overdue()
+                if overdue >= self.threshold:
+                    self._current = LoopBlock(time.time() - overdue, stack=stack)
+                    self.blocks.append(self._current)
+
+    def _overdue(self) -> float:
+        return self._clock() - self._last_beat - self.interval
+
+    def report(self) -> dict[str, object]:
+        with self._lock:
+            blocks = [
+                {
+                    "started_at": round(block.started_at, 3),
+                    "seconds": block.seconds,
+                    "ongoing": block.ongoing,
+                    "stack": block.stack,
+                }
+                for block in reversed(self.blocks)
+            ]
+        return {**self.stats(), "blocks": blocks}
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "running": int(self.running),
+            "interval_seconds": self.interval,
+            "threshold_seconds": self.threshold,
+            "beats": self.beats,
+            "blocked": self.blocked,
+            "max_lag_seconds": round(self.max_lag, 3),
+        }
+
+
+class ProfileBusyError(Exception):
+    """Another profile of this process is already running."""
+
+
+class SamplingProfiler:
+    """Time-boxed sampling profiler over the threads of this process.
+
+    Every ``interval`` it reads the current frame of each sampled thread and
+    counts the collapsed stacks. Nothing runs outside a profile; one profile
+    runs at a time.
+    """
+
+    def __init__(self, max_seconds: float = PROFILE_MAX_SECONDS):
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+        self.running = False
+        self.profiles = 0
+        self.samples = 0
+
+    def sample(
+        self,
+        seconds: float,
+        interval: float,
+        thread_ids: set[int] | None = None,
+    ) -> Counter[str]:
+        """Sample for ``seconds``, blocking; meant to run in a worker thread."""
+        with self._lock:
+            if self.running:
+                raise ProfileBusyError("A profile is already running.")
+            self.running = True
+        try:
+            counts: Counter[str] = Counter()
+            me = threading.get_ident()
+            deadline = time.monotonic() + min(seconds, self.max_seconds)
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == me or (
+                        thread_ids is not None and ident not in thread_ids
+                    ):
+                        continue
+                    counts[collapse_stack(frame, names.get(ident, str(ident)))] += 1
+                self.samples += 1
+                time.sleep(interval)
+            self.profiles += 1
+            return counts
+        finally:
+            self.running = False
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "running": int(self.running),
+            "profiles": self.profiles,
+            "samples": self.samples,
+        }
+
+
+def render_collapsed(counts: Counter[str]) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+loop_monitor = LoopLagMonitor()
+profiler = SamplingProfiler()
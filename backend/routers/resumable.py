@@ -0,0 +1,286 @@
+import asyncio
+import os
+import secrets
+import time
+from collections.abc import AsyncIterator, Callable
+from contextlib import aclosing
+from typing import Any
+
+from llm.metrics import metrics
+from routers.sse import to_sse_event
+
+STREAM_REPLAY_MAX_BYTES = int(os.getenv("STREAM_REPLAY_MAX_BYTES", "1000000"))
+STREAM_REPLAY_TTL_SECONDS = float(os.getenv("STREAM_REPLAY_TTL_SECONDS", "300"))
+STREAM_REPLAY_MAX_STREAMS = int(os.getenv("STREAM_REPLAY_MAX_STREAMS", "1000"))
+# Replay buffers of all streams together.
+STREAM_REPLAY_TOTAL_BYTES = int(os.getenv("STREAM_REPLAY_TOTAL_BYTES", "64000000"))
+# A live stream nobody has been reading for this long is cancelled, and with it
+# the upstream analysis unless another client shares it. Reconnecting within
+# the grace period resumes the stream instead. A negative value never cancels.
+STREAM_IDLE_GRACE_SECONDS = float(os.getenv("STREAM_IDLE_GRACE_SECONDS", "15"))
+
+streams_abandoned = metrics.counter(
+    "streams_abandoned_total",
+    "Live SSE streams cancelled because every client had disconnected.",
+)
+
+STREAM_START = ": stream-start\n\n"
+
+
+class StreamExpiredError(Exception):
+    """The requested position is no longer held in the replay buffer."""
+
+
+class StreamCapacityError(Exception):
+    """The registry is full of live streams; a new one cannot be started."""
+
+    def __init__(self, retry_after: float = 5.0):
+        super().__init__("Too many streams in progress. Retry later.")
+        self.retry_after = retry_after
+
+
+def parse_event_id(event_id: str) -> tuple[str, int] | None:
+    token, _, seq = event_id.strip().rpartition(":")
+    if not token or not seq.isdigit():
+        return None
+    return token, int(seq)
+
+
+class ResumableStream:
+    """Runs one SSE event source to completion and keeps a replay buffer.
+
+    Events get ids of the form ``<token>:<seq>`` with ``seq`` increasing from 1,
+    so ``Last-Event-ID`` alone identifies both the stream and the position.
+    The buffer is bounded in bytes; the oldest frames are dropped first.
+
+    The source keeps running while readers come and go, but once no reader has
+    been attached for ``idle_grace`` seconds it is cancelled as abandoned.
+    """
+
+    def __init__(
+        self,
+        events: AsyncIterator[tuple[str, dict[str, Any]]],
+        max_bytes: int = STREAM_REPLAY_MAX_BYTES,
+        clock: Callable[[], float] = time.monotonic,
+        idle_grace: float = STREAM_IDLE_GRACE_SECONDS,
+        on_resize: Callable[["ResumableStream", int], None] | None = None,
+    ):
+        self.token = secrets.token_urlsafe(16)
+        self.done = False
+        self.abandoned = False
+        self.finished_at: float | None = None
+        self._max_bytes = max_bytes
+        self._clock = clock
+        self._idle_grace = idle_grace
+        # Told how many bytes the replay buffer grew or shrank by.
+        self._on_resize = on_resize
+        self._readers = 0
+        self._idle_timer: asyncio.TimerHandle | None = None
+        # Frame i has sequence number ``_dropped + i + 1``.
+        self._frames: list[str] = []
+        self._dropped = 0
+        self._bytes = 0
+        self._changed = asyncio.Event()
+        self._task = asyncio.create_task(self._run(events))
+        # Also covers a client gone before its response started.
+        self._arm_idle_timer()
+
+    @property
+    def last_seq(self) -> int:
+        return self._dropped + len(self._frames)
+
+    @property
+    def first_available_seq(self) -> int:
+        return self._dropped + 1
+
+    @property
+    def buffered_bytes(self) -> int:
+        return self._bytes
+
+    async def _run(self, events: AsyncIterator[tuple[str, dict[str, Any]]]) -> None:
+        try:
+            async with aclosing(events):
+                async for event, data in events:
+                    event_id = f"{self.token}:{self.last_seq + 1}"
+                    frame = to_sse_event(event, data, event_id=event_id)
+                    self._frames.append(frame)
+                    self._bytes += len(frame)
+                    trimmed = self.trim(self._max_bytes)
+                    if self._on_resize is not None:
+                        self._on_resize(self, len(frame) - trimmed)
+                    self._notify()
+        finally:
+            self.done = True
+            self.finished_at = self._clock()
+            self._disarm_idle_timer()
+            self._notify()
+
+    def trim(self, max_bytes: int) -> int:
+        """Drop the oldest frames until at most ``max_bytes`` are buffered,
+        always keeping the latest; returns how many bytes were dropped."""
+        count = trimmed = 0
+        while self._bytes - trimmed > max_bytes and count < len(self._frames) - 1:
+            trimmed += len(self._frames[count])
+            count += 1
+        del self._frames[:count]
+        self._dropped += count
+        self._bytes -= trimmed
+        return trimmed
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def cancel(self) -> None:
+        self._task.cancel()
+
+    def _arm_idle_timer(self) -> None:
+        self._disarm_idle_timer()
+        if self.done or self._idle_grace < 0:
+            return
+        loop = asyncio.get_running_loop()
+        self._idle_timer = loop.call_later(self._idle_grace, self._abandon)
+
+    def _disarm_idle_timer(self) -> None:
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _abandon(self) -> None:
+        self._idle_timer = None
+        if self._readers or self.done:
+            return
+        self.abandoned = True
+        streams_abandoned.inc()
+        self.cancel()
+
+    def can_resume(self, after_seq: int) -> bool:
+        return self.first_available_seq <= after_seq + 1 <= self.last_seq + 1
+
+    async def frames(self, after_seq: int = 0) -> AsyncIterator[str]:
+        """Yield SSE frames with a sequence number above ``after_seq``.
+
+        The reader counts as attached until this generator is closed, which the
+        response does as soon as its client disconnects.
+        """
+        self._readers += 1
+        self._disarm_idle_timer()
+        try:
+            yield STREAM_START
+            position = after_seq
+            while True:
+                changed = self._changed
+                if position + 1 < self.first_available_seq:
+                    # The reader fell further behind than the replay buffer holds.
+                    raise StreamExpiredError(self.token)
+                pending = self._frames[position - self._dropped :]
+                if pending:
+                    position = self.last_seq
+                    for frame in pending:
+                        yield frame
+                    continue
+                if self.done:
+                    return
+                await changed.wait()
+        finally:
+            self._readers -= 1
+            if not self._readers:
+                self._arm_idle_timer()
+
+
+class StreamRegistry:
+    """Live and recently finished streams, resumable by token for a TTL.
+
+    Bounded in streams and in replay bytes overall. Finished streams make room
+    first, oldest first. Live streams are never cancelled to make room: past
+    the byte budget a growing live stream trims its own replay buffer instead,
+    and with no finished stream left to drop new streams are refused.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = STREAM_REPLAY_TTL_SECONDS,
+        max_streams: int = STREAM_REPLAY_MAX_STREAMS,
+        max_bytes: int = STREAM_REPLAY_TOTAL_BYTES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_streams = max_streams
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._streams: dict[str, ResumableStream] = {}
+        self._bytes = 0
+        self.rejected = 0
+
+    def check_capacity(self) -> None:
+        """Make room for one more stream, or raise ``StreamCapacityError``."""
+        self._prune()
+        if len(self._streams) >= self.max_streams or self._bytes >= self.max_bytes:
+            self._evict_finished(
+                len(self._streams) - self.max_streams + 1,
+                self._bytes - self.max_bytes + 1,
+            )
+        if len(self._streams) >= self.max_streams or self._bytes >= self.max_bytes:
+            self.rejected += 1
+            raise StreamCapacityError()
+
+    def create(
+        self, events: AsyncIterator[tuple[str, dict[str, Any]]]
+    ) -> ResumableStream:
+        self.check_capacity()
+        stream = ResumableStream(events, clock=self._clock, on_resize=self._resized)
+        self._streams[stream.token] = stream
+        return stream
+
+    def get(self, token: str) -> ResumableStream | None:
+        self._prune()
+        return self._streams.get(token)
+
+    def stats(self) -> dict[str, int]:
+        live = sum(1 for stream in self._streams.values() if not stream.done)
+        return {
+            "streams": len(self._streams),
+            "live": live,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "rejected": self.rejected,
+        }
+
+    def _remove(self, stream: ResumableStream) -> None:
+        del self._streams[stream.token]
+        self._bytes -= stream.buffered_bytes
+
+    def _resized(self, stream: ResumableStream, delta: int) -> None:
+        if stream.token not in self._streams:
+            return
+        self._bytes += delta
+        excess = self._bytes - self.max_bytes
+        if excess <= 0:
+            return
+        excess -= self._evict_finished(0, excess)
+        if excess > 0:
+            self._bytes -= stream.trim(stream.buffered_bytes - excess)
+
+    def _evict_finished(self, streams: int, size: int) -> int:
+        """Drop finished streams, oldest first, until at least ``streams`` of
+        them and ``size`` bytes are gone; returns the bytes freed."""
+        finished = sorted(
+            (s for s in self._streams.values() if s.done),
+            key=lambda s: s.finished_at,
+        )
+        freed = 0
+        for count, stream in enumerate(finished):
+            if count >= streams and freed >= size:
+                break
+            freed += stream.buffered_bytes
+            self._remove(stream)
+        return freed
+
+    def _prune(self) -> None:
+        now = self._clock()
+        for stream in list(self._streams.values()):
+            if stream.done and now - stream.finished_at >= self.ttl_seconds:
+                self._remove(stream)
+
+
+stream_registry = StreamRegistry()
@@ -1,43 +1,448 @@
-from fastapi import APIRouter, Header, HTTPException
-from fastapi.responses import StreamingResponse
+import asyncio
+import math
+import os
+import secrets
+import threading
+import time
+from contextlib import aclosing
+from typing import TYPE_CHECKING, Literal
 
-from llm.agent import TextAnalysisLangchain
-from llm.state import create_initial_state
-from routers.sse import to_sse_event
-from schemas.analyze import AnalysisRequest, AnalysisResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+import db
+from db import HISTORY_PAGE_MAX
+from db.pool import async_pool_metrics, sync_pool_metrics
+from db.writer import history_writer
+from llm.admission import AdmissionLease, AdmissionRejectedError, admission
+from llm.batch import BATCH_CONCURRENCY, DetectionMemo, run_unordered
+from llm.broadcast import stream_coalescer
+from llm.cache import CachedResult, make_cache_key, result_cache
+from llm.cleanup import cleanup_stats
+from llm.metrics import metrics, stream_errors, time_to_first_chunk
+from llm.registry import agent_registry, hash_api_key
+from llm.resilience import CircuitOpenError, upstream
+from llm.similarity import (
+    NEAR_DUPLICATE_INDEX,
+    NearDuplicate,
+    analysis_scope,
+    near_duplicates,
+)
+from llm.speculation import speculation_stats
+from routers.profiling import (
+    PROFILE_MAX_SECONDS,
+    ProfileBusyError,
+    loop_monitor,
+    profiler,
+    render_collapsed,
+)
+from routers.resumable import (
+    ResumableStream,
+    StreamCapacityError,
+    StreamExpiredError,
+    parse_event_id,
+    stream_registry,
+)
+from routers.sse import (
+    SSE_COMPRESSION,
+    accepts_gzip,
+    coalesce_chunks,
+    gzip_frames,
+    to_sse_event,
+)
+from routers.warmup import warmup
+from schemas.analyze import (
+    AnalysisRequest,
+    AnalysisResponse,
+    BatchAnalysisRequest,
+    BatchItemResponse,
+)
+
+# The LLM and database stacks are imported on first use or by the startup
+# warm-up, never with the routes.
+if TYPE_CHECKING:
+    from llm.agent import TextAnalysisLangchain
 
 api_router = APIRouter(prefix="/api")
 
 _ALLOWED_MODELS = {"gemini-2.5-flash", "gemini-2.5-pro"}
+# Enables the /api/admin endpoints for requests sending it as X-Admin-Token.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN") or None
 
 
-def _require_agent(
-    api_key: str | None,
-    model: str,
-) -> TextAnalysisLangchain:
-    if not api_key or not api_key.strip():
+def _require_key(x_gemini_key: str | None = Header(None)) -> str:
+    """Hash of the caller's Gemini key, which owns the History it creates."""
+    if not x_gemini_key or not x_gemini_key.strip():
         raise HTTPException(
             status_code=401,
             detail="Missing Gemini API key. Configure it in Settings.",
         )
+    return hash_api_key(x_gemini_key.strip())
+
+
+def _require_agent(
+    api_key: str | None,
+    model: str,
+) -> "TextAnalysisLangchain":
+    _require_key(api_key)
     if model not in _ALLOWED_MODELS:
         raise HTTPException(
             status_code=422,
             detail=f"Unsupported model. Allowed: {', '.join(sorted(_ALLOWED_MODELS))}",
         )
-    return TextAnalysisLangchain(gemini_key=api_key.strip(), model=model)
+    return agent_registry.get(api_key.strip(), model)
+
+
+def _require_admin(x_admin_token: str | None = Header(None)) -> None:
+    if ADMIN_TOKEN is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+
+async def _admit(key_hash: str, model: str) -> AdmissionLease:
+    try:
+        return await admission.acquire(key_hash, model)
+    except AdmissionRejectedError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": e.retry_after_header},
+        )
+
+
+@api_router.get("/ready")
+async def get_readiness():
+    """Warm-up state; 503 until every component warming up in the background is."""
+    return JSONResponse(warmup.stats(), status_code=200 if warmup.ready else 503)
+
+
+# The stats handlers and /metrics read dicts the event loop mutates, so they are
+# async: they run on the loop rather than in the threadpool.
+@api_router.get("/agents/stats")
+async def get_agent_registry_stats():
+    return agent_registry.stats()
+
+
+@api_router.get("/cache/stats")
+async def get_result_cache_stats():
+    return result_cache.stats()
+
+
+@api_router.get("/speculation/stats")
+async def get_speculation_stats():
+    return speculation_stats.stats()
+
+
+@api_router.get("/cleanup/stats")
+async def get_cleanup_stats():
+    return cleanup_stats.stats()
+
+
+@api_router.get("/coalescing/stats")
+async def get_coalescing_stats():
+    return stream_coalescer.stats()
+
+
+@api_router.get("/streams/stats")
+async def get_stream_registry_stats():
+    return stream_registry.stats()
+
+
+@api_router.get("/admission/stats")
+async def get_admission_stats():
+    return admission.stats()
+
+
+@api_router.get("/upstream/stats")
+async def get_upstream_stats():
+    return upstream.stats()
+
+
+@api_router.get("/near-duplicates/stats")
+async def get_near_duplicate_stats():
+    return near_duplicates.stats()
+
+
+@api_router.get("/history/writer/stats")
+async def get_history_writer_stats():
+    return history_writer.stats()
+
+
+POOL_COUNTERS = ("checkouts", "timeouts", "overflow_events")
+metrics.register_stats(
+    "agent_registry", agent_registry.stats, ("hits", "misses", "evictions")
+)
+metrics.register_stats(
+    "result_cache", result_cache.stats, ("hits", "store_hits", "misses")
+)
+metrics.register_stats(
+    "speculation",
+    speculation_stats.stats,
+    ("launched", "used", "wasted", "saved_seconds"),
+)
+metrics.register_stats(
+    "cleanup",
+    cleanup_stats.stats,
+    ("cleaned", "llm_avoided", "llm_required", "chars_removed"),
+)
+metrics.register_stats("coalescing", stream_coalescer.stats, ("started", "joined"))
+metrics.register_stats("streams", stream_registry.stats, ("rejected",))
+metrics.register_stats(
+    "admission",
+    admission.stats,
+    ("rate_limited", "admitted", "rejected"),
+    labels={"models": "model"},
+)
+metrics.register_stats(
+    "upstream",
+    upstream.stats,
+    ("opened",),
+    labels={"breakers": "model", "hedge_delay_ms": ("model", "call")},
+)
+metrics.register_stats(
+    "history_writer",
+    history_writer.stats,
+    ("written", "dropped", "failed", "batches"),
+)
+metrics.register_stats(
+    "near_duplicates", near_duplicates.stats, ("evicted", "queries", "hits", "merges")
+)
+metrics.register_stats("warmup", warmup.stats, labels={"components": "component"})
+metrics.register_stats("db_pool_sync", sync_pool_metrics.stats, POOL_COUNTERS)
+metrics.register_stats("db_pool_async", async_pool_metrics.stats, POOL_COUNTERS)
+metrics.register_stats("loop_lag", loop_monitor.stats, ("beats", "blocked"))
+metrics.register_stats("profiler", profiler.stats, ("profiles", "samples"))
+
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@api_router.get("/admin/loop-lag", dependencies=[Depends(_require_admin)])
+async def get_loop_lag():
+    """Recent intervals the event loop was blocked, with the stack blocking it."""
+    return loop_monitor.report()
+
+
+@api_router.get("/admin/profile", dependencies=[Depends(_require_admin)])
+async def get_profile(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    interval: float = Query(0.005, ge=0.001, le=1),
+    threads: Literal["loop", "all"] = "loop",
+):
+    """Sample the live process and return its stacks in collapsed format.
+
+    Feed the output to flamegraph.pl or speedscope. By default only the event
+    loop thread is sampled; ``threads=all`` adds the worker threads.
+    """
+    # This handler runs on the loop thread, which the sampler thread then watches.
+    thread_ids = None if threads == "all" else {threading.get_ident()}
+    try:
+        counts = await asyncio.to_thread(profiler.sample, seconds, interval, thread_ids)
+    except ProfileBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(
+        render_collapsed(counts),
+        headers={"Content-Disposition": 'attachment; filename="profile.collapsed"'},
+    )
+
+
+@api_router.get("/db/stats")
+async def get_db_pool_stats():
+    return {"sync": sync_pool_metrics.stats(), "async": async_pool_metrics.stats()}
+
+
+async def get_history_db():
+    if not db.is_configured():
+        raise HTTPException(status_code=503, detail="History storage is disabled.")
+    await warmup.settled("db")
+    from db.session import get_async_db
+
+    async for session in get_async_db():
+        yield session
+
+
+# History is listed, searched and returned only to the key that created it.
+@api_router.get("/history")
+async def get_history_page(
+    limit: int = Query(20, ge=1, le=HISTORY_PAGE_MAX),
+    cursor: str | None = None,
+    q: str | None = Query(None, max_length=500),
+    owner: str = Depends(_require_key),
+    session=Depends(get_history_db),
+):
+    from db.history import InvalidCursorError, alist_history
+
+    try:
+        return await alist_history(session, owner, limit, cursor, q)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@api_router.get("/history/storage", dependencies=[Depends(_require_admin)])
+async def get_history_storage(session=Depends(get_history_db)):
+    from db.blobs import storage_report
+    from db.compression import history_codec
+
+    report = await session.run_sync(storage_report)
+    return {**report, "codec": history_codec.stats()}
+
+
+@api_router.get("/history/{history_id}")
+async def get_history_entry(
+    history_id: int,
+    owner: str = Depends(_require_key),
+    session=Depends(get_history_db),
+):
+    from db.history import aget_history
+
+    entry = await aget_history(session, owner, history_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="History entry not found")
+    return entry
+
+
+@api_router.delete("/history/{history_id}", status_code=204)
+async def delete_history_entry(
+    history_id: int,
+    owner: str = Depends(_require_key),
+    session=Depends(get_history_db),
+):
+    from db.history import delete_history
+
+    if not await session.run_sync(delete_history, owner, history_id):
+        raise HTTPException(status_code=404, detail="History entry not found")
+    await session.commit()
+    return Response(status_code=204)
+
+
+async def replay_cached_result(result: str):
+    yield {"event": "stage", "stage": "interpret"}
+    yield {"event": "chunk", "delta": result}
+    yield {"event": "done", "result": result}
+
+
+async def find_near_duplicates(
+    request: AnalysisRequest,
+    owner: str,
+    threshold: float | None = None,
+    limit: int = 1,
+) -> list[tuple[NearDuplicate, CachedResult]]:
+    """Cached analyses ``owner`` requested of texts nearly identical to the
+    request's, best first."""
+    if not NEAR_DUPLICATE_INDEX or request.incremental:
+        return []
+    scope = analysis_scope(owner, request.user_language, request.model)
+    # Shingling and hashing a long text is too slow for the event loop.
+    matches = await asyncio.to_thread(
+        near_duplicates.find_text, request.text, scope, threshold, limit
+    )
+    found = []
+    for match in matches:
+        cached = await result_cache.aget(match.cache_key)
+        if cached is not None:
+            found.append((match, cached))
+    return found
+
+
+async def analyze_and_record(
+    agent: "TextAnalysisLangchain",
+    request: AnalysisRequest,
+    cache_key: str,
+    owner: str,
+    detections: DetectionMemo | None = None,
+    lease: AdmissionLease | None = None,
+):
+    """Run a fresh analysis, caching the result and queueing it for History.
+
+    The History row belongs to ``owner``, the hash of the requesting key.
+    ``lease`` is the admission slot the analysis runs under; it is released as
+    soon as the upstream work ends.
+    """
+    target_language = request.user_language.upper()
+
+    async def record(event: dict) -> None:
+        await result_cache.aput(
+            cache_key,
+            CachedResult(event["result"], target_language, request.model),
+        )
+        signature = None
+        if NEAR_DUPLICATE_INDEX and not request.incremental:
+            signature = await asyncio.to_thread(
+                near_duplicates.add_text,
+                request.text,
+                analysis_scope(owner, target_language, request.model),
+                cache_key,
+            )
+        await history_writer.submit(
+            {
+                "owner": owner,
+                "prompt": request.text,
+                "result": event["result"],
+                "target_language": target_language,
+                "model": request.model,
+                "stage_timings": event.get("timings"),
+                "cache_key": cache_key,
+                "signature": signature,
+            }
+        )
+
+    try:
+        async for event in agent.analyze_stream(
+            request.text,
+            request.user_language,
+            detections,
+            incremental=request.incremental,
+        ):
+            if event.get("event") == "done":
+                if lease is not None:
+                    lease.release()
+                # The result is paid for: keep it even if every client has left.
+                await asyncio.shield(record(event))
+            yield event
+    finally:
+        if lease is not None:
+            lease.release()
 
 
 @api_router.post("/analyze", response_model=AnalysisResponse)
-def get_analyse_info(
+async def get_analyse_info(
     request: AnalysisRequest,
+    response: Response,
     x_gemini_key: str | None = Header(None),
 ):
     try:
+        await warmup.settled("llm")
         agent = _require_agent(x_gemini_key, request.model)
-        initial_state = create_initial_state(request.text, request.user_language)
-        final_state = agent.graph.invoke(initial_state)
-        result = final_state.get("interpretation", "")
+        owner = hash_api_key(x_gemini_key.strip())
+        cache_key = make_cache_key(
+            request.text,
+            request.user_language,
+            request.model,
+            incremental=request.incremental,
+        )
+        cached = await result_cache.aget(cache_key)
+        if cached is not None:
+            return AnalysisResponse(result=cached.result, success=True)
+        if request.near_duplicates == "reuse":
+            found = await find_near_duplicates(request, owner)
+            if found:
+                match, similar = found[0]
+                # The analysis of a nearly identical text stands in for this one.
+                response.headers["X-Near-Duplicate-Similarity"] = str(match.similarity)
+                return AnalysisResponse(result=similar.result, success=True)
+
+        result = ""
+        lease = await _admit(owner, request.model)
+        async for event in analyze_and_record(
+            agent, request, cache_key, owner, lease=lease
+        ):
+            if event["event"] == "done":
+                result = event["result"]
         if not result:
             raise HTTPException(
                 status_code=500,
@@ -46,58 +451,327 @@ def get_analyse_info(
         return AnalysisResponse(result=result, success=True)
     except HTTPException:
         raise
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
     except Exception as e:
         return AnalysisResponse(result="", success=False, error=str(e))
 
 
-@api_router.post("/analyze/stream")
-async def stream_analyse_info(
+async def analyze_batch_item(
+    agent: "TextAnalysisLangchain",
     request: AnalysisRequest,
+    detections: DetectionMemo,
+    key_hash: str,
+) -> str:
+    cache_key = make_cache_key(
+        request.text,
+        request.user_language,
+        request.model,
+        incremental=request.incremental,
+    )
+    cached = await result_cache.aget(cache_key)
+    if cached is not None:
+        return cached.result
+    if request.near_duplicates == "reuse":
+        found = await find_near_duplicates(request, key_hash)
+        if found:
+            return found[0][1].result
+
+    lease = None
+    if not stream_coalescer.in_flight(cache_key):
+        lease = await admission.acquire(key_hash, request.model)
+
+    def start():
+        nonlocal lease
+        upstream, lease = lease, None
+        # Released when the analysis ends, even if this item stops reading it.
+        return analyze_and_record(
+            agent, request, cache_key, key_hash, detections, upstream
+        )
+
+    # Duplicate items in the batch (or elsewhere in flight) share one analysis.
+    events = stream_coalescer.subscribe(cache_key, start)
+    if lease is not None:
+        # Unused: another caller started the same analysis meanwhile.
+        lease.release()
+    result = ""
+    async for event in events:
+        if event["event"] == "done":
+            result = event["result"]
+    if not result:
+        raise ValueError("Analysis failed - no interpretation generated")
+    return result
+
+
+@api_router.post("/analyze/batch")
+async def analyse_batch(
+    batch: BatchAnalysisRequest,
     x_gemini_key: str | None = Header(None),
 ):
-    agent = _require_agent(x_gemini_key, request.model)
+    """Analyze many texts, streaming one NDJSON line per item as it finishes."""
+    key_hash = _require_key(x_gemini_key)
+    await warmup.settled("llm")
+
+    def job(request: AnalysisRequest, detections: DetectionMemo):
+        async def run() -> str:
+            agent = _require_agent(x_gemini_key, request.model)
+            return await analyze_batch_item(agent, request, detections, key_hash)
 
-    async def event_generator():
-        final_result = ""
-        yield ": stream-start\n\n"
+        return run
 
+    async def lines():
+        detections = DetectionMemo()
+        jobs = [job(request, detections) for request in batch.items]
         try:
-            async for event in agent.analyze_stream(
-                request.text, request.user_language
-            ):
-                event_type = event.get("event")
-
-                if event_type == "stage":
-                    stage = event.get("stage", "")
-                    if stage:
-                        yield to_sse_event("stage", {"stage": stage})
-                    continue
-
-                if event_type == "chunk":
-                    delta = event.get("delta", "")
-                    if delta:
-                        final_result += delta
-                        yield to_sse_event("chunk", {"delta": delta})
-                    continue
-
-                if event_type == "done":
-                    result = event.get("result", "").strip()
-                    if result:
-                        final_result = result
-
-            if not final_result:
-                raise ValueError("Analysis failed - no interpretation generated")
-
-            yield to_sse_event("done", {"result": final_result})
-        except Exception as e:
-            yield to_sse_event("error", {"message": str(e)})
+            async for index, result, error in run_unordered(jobs, BATCH_CONCURRENCY):
+                if error is None:
+                    item = BatchItemResponse(index=index, result=result, success=True)
+                else:
+                    message = (
+                        error.detail if isinstance(error, HTTPException) else str(error)
+                    )
+                    item = BatchItemResponse(
+                        index=index, result="", success=False, error=message
+                    )
+                yield item.model_dump_json() + "\n"
+        finally:
+            detections.close()
 
     return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache, no-transform",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+
+
+async def analysis_sse_events(
+    agent: "TextAnalysisLangchain",
+    request: AnalysisRequest,
+    cache_key: str,
+    owner: str,
+    cached: CachedResult | None = None,
+    lease: AdmissionLease | None = None,
+    similar: tuple[NearDuplicate, CachedResult] | None = None,
+):
+    """Translate an analysis into (SSE event name, payload) pairs.
+
+    ``cached`` is the result cache entry the caller already looked up, if any.
+    ``similar`` is the analysis of a nearly identical text, sent first as a
+    ``near_duplicate`` event; ``reused`` tells whether it is also the result.
+    ``lease`` is handed to the upstream analysis if this stream starts it, and
+    released with the upstream work rather than with this stream; it is only
+    released here if the stream never started one.
+    """
+    streamed: list[str] = []
+    final_result = ""
+    started = time.perf_counter()
+    first_chunk = True
+
+    def start():
+        nonlocal lease
+        upstream, lease = lease, None
+        return analyze_and_record(agent, request, cache_key, owner, lease=upstream)
+
+    try:
+        if similar is not None:
+            match, entry = similar
+            yield (
+                "near_duplicate",
+                {
+                    "similarity": match.similarity,
+                    "result": entry.result,
+                    "reused": cached is entry,
+                },
+            )
+
+        if cached is not None:
+            events = replay_cached_result(cached.result)
+        else:
+            # Identical in-flight requests share one upstream analysis.
+            events = stream_coalescer.subscribe(cache_key, start)
+
+        async for event in coalesce_chunks(events):
+            event_type = event.get("event")
+
+            if event_type == "stage":
+                if event.get("stage"):
+                    # Long-text mode adds segment progress to stage events.
+                    payload = {k: v for k, v in event.items() if k != "event"}
+                    yield "stage", payload
+                continue
+
+            if event_type == "chunk":
+                delta = event.get("delta", "")
+                if delta:
+                    if first_chunk:
+                        first_chunk = False
+                        time_to_first_chunk.observe(
+                            time.perf_counter() - started,
+                            model=request.model,
+                            cached=str(cached is not None).lower(),
+                        )
+                    streamed.append(delta)
+                    yield "chunk", {"delta": delta}
+                continue
+
+            if event_type == "done":
+                result = event.get("result", "").strip()
+                if result:
+                    final_result = result
+
+        final_result = final_result or "".join(streamed)
+        if not final_result:
+            raise ValueError("Analysis failed - no interpretation generated")
+
+        yield "done", {"result": final_result}
+    except Exception as e:
+        stream_errors.inc(model=request.model)
+        yield "error", {"message": str(e)}
+    finally:
+        if lease is not None:
+            # Not handed over: another request started the same analysis first.
+            lease.release()
+
+
+def _stream_response(
+    stream: ResumableStream, after_seq: int = 0, accept_encoding: str | None = None
+) -> StreamingResponse:
+    async def frames():
+        try:
+            async with aclosing(stream.frames(after_seq)) as source:
+                async for frame in source:
+                    yield frame
+        except StreamExpiredError:
+            yield to_sse_event(
+                "error", {"message": "Stream can no longer be resumed. Retry."}
+            )
+
+    headers = {
+        "Cache-Control": "no-cache, no-transform",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no",
+        "X-Stream-Token": stream.token,
+        "Vary": "Accept-Encoding",
+    }
+    body = frames()
+    if SSE_COMPRESSION and accepts_gzip(accept_encoding):
+        # GZipMiddleware leaves event streams alone; compress per frame here.
+        headers["Content-Encoding"] = "gzip"
+        body = gzip_frames(body)
+
+    return StreamingResponse(body, media_type="text/event-stream", headers=headers)
+
+
+def _resume(
+    last_event_id: str, accept_encoding: str | None = None
+) -> StreamingResponse | None:
+    parsed = parse_event_id(last_event_id)
+    if parsed is None:
+        return None
+    token, seq = parsed
+    stream = stream_registry.get(token)
+    if stream is None or not stream.can_resume(seq):
+        return None
+    return _stream_response(stream, after_seq=seq, accept_encoding=accept_encoding)
+
+
+@api_router.post("/analyze/stream")
+async def stream_analyse_info(
+    request: AnalysisRequest,
+    x_gemini_key: str | None = Header(None),
+    last_event_id: str | None = Header(None),
+    accept_encoding: str | None = Header(None),
+):
+    # A client reconnecting after a dropped connection resumes where it stopped,
+    # while the upstream generation has kept running.
+    if last_event_id:
+        resumed = _resume(last_event_id, accept_encoding)
+        if resumed is not None:
+            return resumed
+
+    await warmup.settled("llm")
+    agent = _require_agent(x_gemini_key, request.model)
+    owner = hash_api_key(x_gemini_key.strip())
+    cache_key = make_cache_key(
+        request.text,
+        request.user_language,
+        request.model,
+        incremental=request.incremental,
+    )
+    cached = await result_cache.aget(cache_key)
+    similar = None
+    if cached is None and request.near_duplicates != "off":
+        found = await find_near_duplicates(request, owner)
+        if found:
+            similar = found[0]
+            if request.near_duplicates == "reuse":
+                cached = similar[1]
+    lease = None
+    try:
+        stream_registry.check_capacity()
+        # Only a request that starts an upstream analysis is admitted: one that
+        # joins an analysis in flight shares its slot and, like resumes and
+        # reconnects, is not charged to its key's bucket. The slot is held until
+        # the upstream work ends, whichever streams are still reading it.
+        if cached is None and not stream_coalescer.in_flight(cache_key):
+            # Refuse up front with 429 rather than opening a stream that stalls.
+            lease = await _admit(owner, request.model)
+        stream = stream_registry.create(
+            analysis_sse_events(
+                agent, request, cache_key, owner, cached, lease, similar
+            )
+        )
+    except StreamCapacityError as e:
+        if lease is not None:
+            lease.release()
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    return _stream_response(stream, accept_encoding=accept_encoding)
+
+
+@api_router.post("/analyze/similar")
+async def find_similar_analyses(
+    request: AnalysisRequest,
+    threshold: float | None = Query(None, gt=0, le=1),
+    limit: int = Query(5, ge=1, le=50),
+    owner: str = Depends(_require_key),
+):
+    """The caller's past analyses of texts nearly identical to ``request.text``,
+    most similar first; ``threshold`` overrides the configured Jaccard
+    similarity."""
+    found = await find_near_duplicates(request, owner, threshold, limit)
+    return {
+        "matches": [
+            {
+                "similarity": match.similarity,
+                "result": entry.result,
+                "target_language": entry.target_language,
+                "model": entry.model,
+            }
+            for match, entry in found
+        ]
+    }
+
+
+@api_router.get("/analyze/stream/{token}")
+async def resume_analysis_stream(
+    token: str,
+    last_event_id: str | None = Header(None),
+    accept_encoding: str | None = Header(None),
+):
+    parsed = parse_event_id(last_event_id or "")
+    seq = parsed[1] if parsed is not None and parsed[0] == token else 0
+    resumed = _resume(f"{token}:{seq}", accept_encoding)
+    if resumed is None:
+        raise HTTPException(
+            status_code=410,
+            detail="Stream expired or cannot be resumed from this event.",
+        )
+    return resumed
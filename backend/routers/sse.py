@@ -1,7 +1,137 @@
+import asyncio
 import json
+import os
+import zlib
+from collections.abc import AsyncIterator
+from contextlib import aclosing
 from typing import Any
 
+from routers.encoding import encoding_quality
 
-def to_sse_event(event: str, data: dict[str, Any]) -> str:
+# Chunk deltas arriving within this window of the last emitted chunk are merged
+# into one event, flushed early once they reach the byte budget.
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "40"))
+SSE_COALESCE_BYTES = int(os.getenv("SSE_COALESCE_BYTES", "2048"))
+SSE_COMPRESSION = os.getenv("SSE_COMPRESSION", "true").lower() == "true"
+SSE_COMPRESSION_LEVEL = int(os.getenv("SSE_COMPRESSION_LEVEL", "6"))
+
+_END = object()
+
+
+def to_sse_event(event: str, data: dict[str, Any], event_id: str | None = None) -> str:
     payload = json.dumps(data, ensure_ascii=False)
-    return f"event: {event}\ndata: {payload}\n\n"
+    if event_id is None:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+
+async def coalesce_chunks(
+    events: AsyncIterator[dict[str, Any]],
+    window: float = SSE_COALESCE_MS / 1000,
+    max_bytes: int = SSE_COALESCE_BYTES,
+) -> AsyncIterator[dict[str, Any]]:
+    """Merge bursts of chunk events into fewer, larger ones.
+
+    A chunk that arrives after a quiet period is passed on at once, so the first
+    token is never delayed. Chunks arriving sooner are held until ``window``
+    seconds after the last emitted chunk or until ``max_bytes`` are pending,
+    whichever comes first. Any other event flushes the pending text ahead of it.
+    """
+    if window <= 0:
+        async with aclosing(events):
+            async for event in events:
+                yield event
+        return
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump() -> None:
+        try:
+            async with aclosing(events):
+                async for event in events:
+                    queue.put_nowait(event)
+        except Exception as exc:
+            queue.put_nowait(exc)
+        finally:
+            queue.put_nowait(_END)
+
+    # Reading through a task lets the window expire while upstream is idle.
+    task = asyncio.create_task(pump())
+    pending: list[str] = []
+    pending_bytes = 0
+    last_emit = -window
+
+    def flush() -> dict[str, Any]:
+        nonlocal pending, pending_bytes, last_emit
+        event = {"event": "chunk", "delta": "".join(pending)}
+        pending, pending_bytes = [], 0
+        last_emit = loop.time()
+        return event
+
+    try:
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0.0, last_emit + window - loop.time())
+            try:
+                async with asyncio.timeout(timeout):
+                    item = await queue.get()
+            except TimeoutError:
+                yield flush()
+                continue
+
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                if pending:
+                    yield flush()
+                raise item
+
+            if item.get("event") != "chunk":
+                if pending:
+                    yield flush()
+                yield item
+                continue
+
+            delta = item.get("delta", "")
+            if not delta:
+                continue
+            if not pending and loop.time() - last_emit >= window:
+                last_emit = loop.time()
+                yield item
+                continue
+            pending.append(delta)
+            pending_bytes += len(delta.encode())
+            if pending_bytes >= max_bytes:
+                yield flush()
+
+        if pending:
+            yield flush()
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    return encoding_quality(accept_encoding, "gzip") > 0
+
+
+async def gzip_frames(
+    frames: AsyncIterator[str], level: int = SSE_COMPRESSION_LEVEL
+) -> AsyncIterator[bytes]:
+    """Gzip a stream of SSE frames, flushing after every frame.
+
+    One compressor spans the whole response, so repeated framing (event names,
+    ids, JSON keys) compresses against earlier frames, while the sync flush makes
+    each frame decodable by the client as soon as it arrives. Buffering response
+    compression would hold frames back until a block fills.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    # Closing the source on disconnect stops the stream it reads right away.
+    async with aclosing(frames):
+        async for frame in frames:
+            yield compressor.compress(frame.encode()) + compressor.flush(
+                zlib.Z_SYNC_FLUSH
+            )
+    yield compressor.flush()
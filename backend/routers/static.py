@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping
+
+from fastapi import Response
+from fastapi.responses import FileResponse
+
+from routers.encoding import preferred_encoding
+
+logger = logging.getLogger(__name__)
+
+# Files up to this size are kept in memory and served without touching disk.
+ASSET_MEMORY_MAX_BYTES = int(os.getenv("ASSET_MEMORY_MAX_BYTES", "262144"))
+FRONTEND_WATCH = os.getenv("FRONTEND_WATCH", "false").lower() == "true"
+
+# Precompressed siblings (``app.js.br``, ``app.js.gz``), in server preference.
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+LONG_CACHE_SUFFIXES = {
+    ".js",
+    ".css",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".ico",
+    ".svg",
+    ".webp",
+    ".avif",
+    ".woff",
+    ".woff2",
+}
+
+
+@dataclass(frozen=True)
+class Representation:
+    path: Path
+    stat: os.stat_result
+    etag: str
+    body: bytes | None
+
+
+@dataclass(frozen=True)
+class Asset:
+    media_type: str
+    cache_control: str
+    identity: Representation
+    encoded: Mapping[str, Representation] = field(default_factory=dict)
+
+    def select(self, accept_encoding: str | None) -> tuple[str | None, Representation]:
+        encoding = preferred_encoding(accept_encoding, tuple(self.encoded))
+        if encoding is None:
+            return None, self.identity
+        return encoding, self.encoded[encoding]
+
+
+def _representation(path: Path, suffix: str = "") -> Representation:
+    data = path.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    return Representation(
+        path=path,
+        stat=path.stat(),
+        etag=f'"{digest}{suffix}"',
+        body=data if len(data) <= ASSET_MEMORY_MAX_BYTES else None,
+    )
+
+
+def _cache_control(path: Path) -> str:
+    if path.suffix.lower() in LONG_CACHE_SUFFIXES:
+        return "public, max-age=31536000, immutable"
+    return "no-cache"
+
+
+class AssetIndex:
+    """Immutable snapshot of a built frontend, keyed by URL path.
+
+    Scanning happens once; serving is a dict lookup, so there is no per-request
+    path resolution, containment check or ``stat``. Only files found under the
+    root can ever be served.
+    """
+
+    def __init__(self, root: Path, assets: Mapping[str, Asset]):
+        self.root = root
+        self.assets = MappingProxyType(dict(assets))
+
+    @classmethod
+    def scan(cls, root: Path) -> "AssetIndex":
+        assets: dict[str, Asset] = {}
+        if not root.is_dir():
+            return cls(root, assets)
+
+        files = {path for path in root.rglob("*") if path.is_file()}
+        variant_suffixes = set(ENCODING_SUFFIXES.values())
+        for path in sorted(files):
+            if path.suffix in variant_suffixes and path.with_suffix("") in files:
+                continue
+            encoded = {
+                encoding: _representation(variant, f"-{encoding}")
+                for encoding, suffix in ENCODING_SUFFIXES.items()
+                if (variant := path.with_name(path.name + suffix)) in files
+            }
+            media_type = (
+                mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            )
+            assets[path.relative_to(root).as_posix()] = Asset(
+                media_type=media_type,
+                cache_control=_cache_control(path),
+                identity=_representation(path),
+                encoded=MappingProxyType(encoded),
+            )
+        return cls(root, assets)
+
+    def get(self, path: str) -> Asset | None:
+        return self.assets.get(path.lstrip("/"))
+
+    @property
+    def index_html(self) -> Asset | None:
+        return self.assets.get("index.html")
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison.
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def asset_response(
+    asset: Asset,
+    accept_encoding: str | None = None,
+    if_none_match: str | None = None,
+) -> Response:
+    encoding, representation = asset.select(accept_encoding)
+    headers = {"ETag": representation.etag, "Cache-Control": asset.cache_control}
+    if asset.encoded:
+        headers["Vary"] = "Accept-Encoding"
+
+    if _etag_matches(if_none_match, representation.etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    if representation.body is not None:
+        return Response(
+            representation.body, media_type=asset.media_type, headers=headers
+        )
+    return FileResponse(
+        representation.path,
+        media_type=asset.media_type,
+        headers=headers,
+        stat_result=representation.stat,
+    )
+
+
+async def watch_frontend(root: Path, on_change) -> None:
+    """Dev helper: call ``on_change`` with a fresh index whenever ``root`` changes."""
+    try:
+        from watchfiles import awatch
+    except ImportError:
+        logger.warning("FRONTEND_WATCH needs the 'watchfiles' package; not watching")
+        return
+
+    async for _changes in awatch(root):
+        on_change(await asyncio.to_thread(AssetIndex.scan, root))
+        logger.info("Rebuilt frontend asset index for %s", root)
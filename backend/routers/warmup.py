@@ -0,0 +1,129 @@
+import asyncio
+import importlib
+import logging
+import os
+import threading
+import time
+from collections.abc import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+# The LLM stack is imported in the background right after startup instead of
+# when the app is imported. Disabled, it loads with the first analysis.
+WARMUP_LLM = os.getenv("WARMUP_LLM", "true").lower() == "true"
+# How long the history writer waits for the database before failing a batch.
+WARMUP_WAIT_SECONDS = float(os.getenv("WARMUP_WAIT_SECONDS", "60"))
+
+# The Gemini SDK and its LangChain wrapper, about a second to import.
+LLM_MODULES = ("llm.agent",)
+# SQLAlchemy, the engines and the ORM queries.
+DB_MODULES = ("db.session", "db.history", "db.history_store", "db.cache_store")
+
+Step = Callable[[], Awaitable[None]]
+
+
+async def import_modules(modules: tuple[str, ...]) -> None:
+    """Import ``modules`` in a worker thread, keeping the event loop free."""
+
+    def load() -> None:
+        for module in modules:
+            importlib.import_module(module)
+
+    await asyncio.to_thread(load)
+
+
+class _Component:
+    def __init__(self):
+        self.task: asyncio.Task | None = None
+        self.state = "warming"
+        self.seconds: float | None = None
+        self.error: str | None = None
+        # Set once the step has finished, for waiters on worker threads.
+        self.settled = threading.Event()
+
+
+class WarmUp:
+    """Background warm-up of the components the first requests would wait on.
+
+    Each component is warmed by one step, started right after startup, and is
+    ``warming`` until the step ends ``warm``, ``failed`` or ``cancelled``. The
+    app serves requests meanwhile; a request that needs a component still
+    warming awaits ``settled(name)`` instead of blocking the event loop on the
+    same imports.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._started_at = clock()
+        self._components: dict[str, _Component] = {}
+
+    def start(self, name: str, step: Step) -> None:
+        component = self._components.get(name)
+        if component is not None and not component.task.done():
+            return
+        component = self._components[name] = _Component()
+        component.task = asyncio.create_task(self._run(component, name, step))
+
+    async def _run(self, component: _Component, name: str, step: Step) -> None:
+        started = self._clock()
+        try:
+            await step()
+            component.state = "warm"
+        except asyncio.CancelledError:
+            component.state = "cancelled"
+            raise
+        except Exception as exc:
+            component.state = "failed"
+            component.error = str(exc) or type(exc).__name__
+            logger.exception("Warm-up of %s failed", name)
+        finally:
+            component.seconds = round(self._clock() - started, 3)
+            component.settled.set()
+
+    async def settled(self, name: str) -> None:
+        """Wait for ``name`` to finish warming, if it is being warmed."""
+        component = self._components.get(name)
+        if component is not None and not component.task.done():
+            await asyncio.shield(component.task)
+
+    def wait(self, name: str, timeout: float = WARMUP_WAIT_SECONDS) -> bool:
+        """Blocking ``settled`` for worker threads; True if ``name`` is warm."""
+        component = self._components.get(name)
+        if component is None:
+            return True
+        component.settled.wait(timeout)
+        return component.state == "warm"
+
+    @property
+    def ready(self) -> bool:
+        return all(c.state == "warm" for c in self._components.values())
+
+    async def stop(self) -> None:
+        components = list(self._components.values())
+        for component in components:
+            component.task.cancel()
+        await asyncio.gather(*(c.task for c in components), return_exceptions=True)
+        for component in components:
+            # A step cancelled before it started never ran its own bookkeeping.
+            if component.state == "warming":
+                component.state = "cancelled"
+            component.settled.set()
+
+    def stats(self) -> dict[str, object]:
+        components = {}
+        for name, component in self._components.items():
+            components[name] = {
+                "state": component.state,
+                "warm": int(component.state == "warm"),
+                "seconds": component.seconds,
+            }
+            if component.error is not None:
+                components[name]["error"] = component.error
+        return {
+            "ready": int(self.ready),
+            "uptime_seconds": round(self._clock() - self._started_at, 3),
+            "components": components,
+        }
+
+
+warmup = WarmUp()
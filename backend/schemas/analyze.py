@@ -1,10 +1,21 @@
-from pydantic import BaseModel
+import os
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
 
 
 class AnalysisRequest(BaseModel):
     text: str
     user_language: str = "EN"
     model: str = "gemini-2.5-flash"
+    # Interpret paragraph sections separately and reuse the ones already seen.
+    incremental: bool = False
+    # A past analysis of nearly the same text is streamed first as a preview
+    # while the fresh analysis runs, or returned instead of one. Not looked up
+    # unless asked for.
+    near_duplicates: Literal["preview", "reuse", "off"] = "off"
 
 
 class AnalysisResponse(BaseModel):
@@ -13,6 +24,14 @@ class AnalysisResponse(BaseModel):
     error: str | None = None
 
 
+class BatchAnalysisRequest(BaseModel):
+    items: list[AnalysisRequest] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+
+
+class BatchItemResponse(AnalysisResponse):
+    index: int
+
+
 class TextDerectives(BaseModel):
     language: str
     genre: str
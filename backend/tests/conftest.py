@@ -4,6 +4,8 @@ import pytest
 from fastapi.testclient import TestClient
 
 from app import app
+from llm.cache import result_cache
+from llm.similarity import near_duplicates
 from tests.helpers import make_fake_agent
 
 
@@ -12,6 +14,15 @@ def fake_agent():
     return make_fake_agent()
 
 
+@pytest.fixture(autouse=True)
+def clear_result_cache():
+    result_cache.clear()
+    near_duplicates.clear()
+    yield
+    result_cache.clear()
+    near_duplicates.clear()
+
+
 @pytest.fixture()
 def client(fake_agent):
     with patch("routers.routes._require_agent", return_value=fake_agent):
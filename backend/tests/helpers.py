@@ -1,3 +1,4 @@
+import json
 from dataclasses import dataclass
 from unittest.mock import AsyncMock, MagicMock
 
@@ -16,8 +17,13 @@ def make_fake_agent(
     needs_correction: bool = False,
     corrected_text: str = "corrected",
     chunks: list[str] | None = None,
+    ocr_residual_threshold: float = 0.0,
 ) -> TextAnalysisLangchain:
-    """Build a TextAnalysisLangchain with fully mocked LLMs."""
+    """Build a TextAnalysisLangchain with fully mocked LLMs.
+
+    Local OCR cleanup never suffices by default, so texts needing correction
+    always reach the mocked correction LLM.
+    """
     if chunks is None:
         chunks = ["Hello", " world"]
 
@@ -47,7 +53,28 @@ def make_fake_agent(
     )
 
     agent.llm_lite = lite_mock
+    agent.detector = structured_mock
     agent.llm_flash = flash_mock
-    agent.graph = MagicMock()
+    agent.ocr_residual_threshold = ocr_residual_threshold
 
     return agent
+
+
+def parse_sse_events(raw: str) -> list[dict]:
+    """Parse raw SSE text into a list of {event, data} dicts."""
+    events = []
+    for block in raw.split("\n\n"):
+        block = block.strip()
+        if not block or block.startswith(":"):
+            continue
+        event_name = "message"
+        data_lines = []
+        for line in block.splitlines():
+            if line.startswith("event:"):
+                event_name = line[len("event:") :].strip()
+            elif line.startswith("data:"):
+                data_lines.append(line[len("data:") :].strip())
+        if data_lines:
+            payload = json.loads("\n".join(data_lines))
+            events.append({"event": event_name, "data": payload})
+    return events
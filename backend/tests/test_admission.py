@@ -0,0 +1,121 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from llm.admission import (
+    AdmissionController,
+    AdmissionRejectedError,
+    parse_model_limits,
+)
+
+
+def controller(**overrides) -> AdmissionController:
+    options = {
+        "limits": {"pro": 1},
+        "key_rate": 0,
+        "max_wait": 1.0,
+        "max_queue": 16,
+    }
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+def test_parse_model_limits():
+    assert parse_model_limits("a=2, b=10,") == {"a": 2, "b": 10}
+    with pytest.raises(ValueError):
+        parse_model_limits("a=0")
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_served_round_robin_across_keys():
+    gate = controller()
+    holder = await gate.acquire("busy", "pro")
+    order = []
+
+    async def waiter(key: str, label: str):
+        async with await gate.acquire(key, "pro"):
+            order.append(label)
+
+    tasks = [
+        asyncio.create_task(waiter("busy", "busy-1")),
+        asyncio.create_task(waiter("busy", "busy-2")),
+        asyncio.create_task(waiter("quiet", "quiet-1")),
+    ]
+    await asyncio.sleep(0)
+    assert gate.stats()["queued"] == 3
+
+    holder.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ["busy-1", "quiet-1", "busy-2"]
+    assert gate.stats()["models"]["pro"]["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_waiting_past_max_wait_is_rejected_with_retry_after():
+    gate = controller(max_wait=0.02)
+    await gate.acquire("a", "pro")
+
+    with pytest.raises(AdmissionRejectedError) as excinfo:
+        await gate.acquire("b", "pro")
+
+    assert excinfo.value.reason == "queue_timeout"
+    assert int(excinfo.value.retry_after_header) >= 1
+    assert gate.stats()["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_immediately():
+    gate = controller(max_queue=1)
+    await gate.acquire("a", "pro")
+    queued = asyncio.create_task(gate.acquire("b", "pro"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejectedError, match="queue_full"):
+        await gate.acquire("c", "pro")
+    queued.cancel()
+
+
+@pytest.mark.asyncio
+async def test_key_bucket_spaces_out_bursts_and_rejects_beyond_max_wait():
+    gate = controller(limits={}, default_limit=10, key_rate=50, key_burst=1)
+    loop = asyncio.get_running_loop()
+
+    started = loop.time()
+    await gate.acquire("k", "flash")
+    await gate.acquire("k", "flash")
+    assert loop.time() - started >= 0.015
+
+    strict = controller(key_rate=1, key_burst=1, max_wait=0.1)
+    await strict.acquire("k", "pro")
+    with pytest.raises(AdmissionRejectedError) as excinfo:
+        await strict.acquire("k", "other")
+    assert excinfo.value.reason == "rate_limited"
+    # Another key has its own bucket.
+    await strict.acquire("other-key", "other")
+
+
+class TestAdmissionEndpoints:
+    def test_saturated_model_returns_429_with_retry_after(self, client):
+        rejection = AdmissionRejectedError("queue_full", 7.2)
+        with patch("routers.routes.admission.acquire", side_effect=rejection):
+            resp = client.post(
+                "/api/analyze/stream",
+                json={"text": "Bonjour le monde", "user_language": "EN"},
+            )
+
+        assert resp.status_code == 429
+        assert resp.headers["retry-after"] == "8"
+
+    def test_stats_expose_queue_depth(self, client):
+        client.post("/api/analyze", json={"text": "Salut", "user_language": "EN"})
+
+        stats = client.get("/api/admission/stats").json()
+
+        assert stats["queued"] == 0
+        assert stats["models"]["gemini-2.5-flash"]["admitted"] >= 1
+        metrics = client.get("/api/metrics").text
+        assert (
+            'logosai_admission_models_in_flight{model="gemini-2.5-flash"} 0' in metrics
+        )
@@ -0,0 +1,71 @@
+from unittest.mock import MagicMock
+
+from llm.registry import AgentRegistry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_registry(**kwargs) -> tuple[AgentRegistry, MagicMock, FakeClock]:
+    factory = MagicMock(side_effect=lambda **_: MagicMock())
+    clock = FakeClock()
+    registry = AgentRegistry(factory=factory, clock=clock, **kwargs)
+    return registry, factory, clock
+
+
+def test_reuses_agent_for_same_key_and_model():
+    registry, factory, _ = make_registry()
+
+    first = registry.get("key-a", "gemini-2.5-flash")
+    second = registry.get("key-a", "gemini-2.5-flash")
+
+    assert first is second
+    assert factory.call_count == 1
+    assert registry.stats()["hits"] == 1
+    assert registry.stats()["misses"] == 1
+
+
+def test_models_for_same_key_share_lite_client():
+    registry, factory, _ = make_registry()
+
+    flash = registry.get("key-a", "gemini-2.5-flash")
+    registry.get("key-a", "gemini-2.5-pro")
+    registry.get("key-b", "gemini-2.5-pro")
+
+    lite_args = [call.kwargs["llm_lite"] for call in factory.call_args_list]
+    assert lite_args == [None, flash.llm_lite, None]
+
+
+def test_evicts_least_recently_used_when_full():
+    registry, factory, _ = make_registry(max_size=2)
+
+    registry.get("key-a", "gemini-2.5-flash")
+    registry.get("key-b", "gemini-2.5-flash")
+    registry.get("key-a", "gemini-2.5-flash")
+    registry.get("key-c", "gemini-2.5-flash")
+    registry.get("key-b", "gemini-2.5-flash")
+
+    stats = registry.stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 2
+    assert factory.call_count == 4
+
+
+def test_expires_idle_entries():
+    registry, factory, clock = make_registry(ttl_seconds=10)
+
+    registry.get("key-a", "gemini-2.5-flash")
+    clock.now = 9
+    registry.get("key-a", "gemini-2.5-flash")
+    clock.now = 18
+    registry.get("key-a", "gemini-2.5-flash")
+    clock.now = 29
+    registry.get("key-a", "gemini-2.5-flash")
+
+    assert factory.call_count == 2
+    assert registry.stats()["evictions"] == 1
@@ -1,31 +1,8 @@
-import json
-
 import pytest
 from fastapi.testclient import TestClient
 
 from app import app
-from tests.helpers import make_fake_agent
-
-
-def parse_sse_events(raw: str) -> list[dict]:
-    """Parse raw SSE text into a list of {event, data} dicts."""
-    events = []
-    for block in raw.split("\n\n"):
-        block = block.strip()
-        if not block or block.startswith(":"):
-            continue
-        event_name = "message"
-        data_lines = []
-        for line in block.splitlines():
-            if line.startswith("event:"):
-                event_name = line[len("event:") :].strip()
-            elif line.startswith("data:"):
-                data_lines.append(line[len("data:") :].strip())
-        if data_lines:
-            payload = json.loads("\n".join(data_lines))
-            events.append({"event": event_name, "data": payload})
-    return events
-
+from tests.helpers import make_fake_agent, parse_sse_events
 
 # ---------------------------------------------------------------------------
 # Agent unit tests (analyze_stream)
@@ -125,7 +102,7 @@ class TestStreamEndpoint:
         assert resp.status_code == 401
 
     def test_stream_error_yields_error_event(self, client, fake_agent):
-        async def failing_stream(_text, _lang):
+        async def failing_stream(_text, _lang, _detections=None, incremental=False):
             yield {"event": "stage", "stage": "detect"}
             raise RuntimeError("LLM exploded")
 
@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import pytest
+
+from llm.batch import DetectionMemo, run_unordered
+
+
+def sleeper(value: str, delay: float):
+    async def job():
+        await asyncio.sleep(delay)
+        if value == "fail":
+            raise RuntimeError("item failed")
+        return value
+
+    return job
+
+
+@pytest.mark.asyncio
+async def test_results_arrive_in_completion_order_and_failures_are_isolated():
+    jobs = [sleeper("slow", 0.05), sleeper("fail", 0.01), sleeper("fast", 0.0)]
+
+    results = [item async for item in run_unordered(jobs, concurrency=3)]
+
+    assert [index for index, _, _ in results] == [2, 1, 0]
+    assert results[0][1] == "fast"
+    assert isinstance(results[1][2], RuntimeError)
+    assert results[2] == (0, "slow", None)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_capped():
+    active = 0
+    peak = 0
+
+    async def job():
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    async for _ in run_unordered([job] * 6, concurrency=2):
+        pass
+
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_detection_memo_runs_each_text_once():
+    calls = []
+
+    async def detect():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "FR"
+
+    memo = DetectionMemo()
+    results = await asyncio.gather(*(memo.get("texte", detect) for _ in range(3)))
+
+    assert results == ["FR", "FR", "FR"]
+    assert len(calls) == 1
+    assert memo.shared == 2
+
+
+class TestBatchEndpoint:
+    def test_streams_one_line_per_item_and_isolates_failures(self, client, fake_agent):
+        original = fake_agent.analyze_stream
+
+        async def analyze_stream(text, user_language, detections=None, **_kwargs):
+            if text == "boom":
+                raise RuntimeError("LLM exploded")
+            async for event in original(text, user_language, detections):
+                yield event
+
+        fake_agent.analyze_stream = analyze_stream
+
+        resp = client.post(
+            "/api/analyze/batch",
+            json={
+                "items": [
+                    {"text": "Bonjour le monde", "user_language": "EN"},
+                    {"text": "boom", "user_language": "EN"},
+                    {"text": "Bonjour le monde", "user_language": "DE"},
+                ]
+            },
+        )
+
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        lines = {
+            line["index"]: line for line in map(json.loads, resp.text.splitlines())
+        }
+        assert set(lines) == {0, 1, 2}
+        assert lines[0]["success"] and lines[0]["result"] == "Hello world"
+        assert lines[2]["success"]
+        assert not lines[1]["success"]
+        assert "LLM exploded" in lines[1]["error"]
+
+    def test_empty_batch_is_rejected(self, client):
+        resp = client.post("/api/analyze/batch", json={"items": []})
+        assert resp.status_code == 422
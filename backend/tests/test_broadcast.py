@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from llm.broadcast import Broadcast, StreamCoalescer
+
+
+def make_producer(count: int, started: asyncio.Event | None = None, delay=0.0):
+    async def produce():
+        for i in range(count):
+            if started is not None and i == 2:
+                started.set()
+            await asyncio.sleep(delay)
+            yield {"event": "chunk", "delta": str(i)}
+
+    return produce
+
+
+async def collect(events, delay: float = 0.0) -> list[str]:
+    deltas = []
+    async for event in events:
+        await asyncio.sleep(delay)
+        deltas.append(event["delta"])
+    return deltas
+
+
+@pytest.mark.asyncio
+async def test_late_subscriber_gets_replay_then_live_events():
+    started = asyncio.Event()
+    broadcast = Broadcast(make_producer(6, started, delay=0.005)())
+    first = asyncio.create_task(collect(broadcast.subscribe()))
+
+    await started.wait()
+    second = await collect(broadcast.subscribe())
+
+    assert second == [str(i) for i in range(6)]
+    assert await first == second
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_does_not_stall_others():
+    broadcast = Broadcast(make_producer(20)(), queue_size=2)
+
+    fast, slow = await asyncio.gather(
+        collect(broadcast.subscribe()),
+        collect(broadcast.subscribe(), delay=0.002),
+    )
+
+    assert fast == slow == [str(i) for i in range(20)]
+
+
+@pytest.mark.asyncio
+async def test_producer_errors_reach_every_subscriber():
+    async def failing():
+        yield {"event": "chunk", "delta": "partial"}
+        raise RuntimeError("LLM exploded")
+
+    broadcast = Broadcast(failing())
+
+    results = await asyncio.gather(
+        collect(broadcast.subscribe()),
+        collect(broadcast.subscribe()),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_coalescer_shares_one_upstream_per_key():
+    coalescer = StreamCoalescer()
+    calls = 0
+
+    def produce():
+        nonlocal calls
+        calls += 1
+        return make_producer(3, delay=0.005)()
+
+    results = await asyncio.gather(
+        collect(coalescer.subscribe("same", produce)),
+        collect(coalescer.subscribe("same", produce)),
+        collect(coalescer.subscribe("other", produce)),
+    )
+
+    assert calls == 2
+    assert results == [["0", "1", "2"]] * 3
+    assert coalescer.stats() == {
+        "in_flight": 0,
+        "subscribers": 0,
+        "started": 2,
+        "joined": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_upstream_is_cancelled_when_every_subscriber_leaves():
+    broadcast = Broadcast(make_producer(100, delay=0.01)())
+
+    async for _ in broadcast.subscribe():
+        break
+    await asyncio.sleep(0.02)
+
+    assert broadcast.done
+    assert len(broadcast.history) < 100
@@ -0,0 +1,204 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from llm.admission import AdmissionController
+from llm.batch import DetectionMemo
+from llm.cache import make_cache_key, result_cache
+from llm.metrics import analyses_cancelled, cancelled_tokens
+from routers.resumable import ResumableStream
+from routers.routes import (
+    analysis_sse_events,
+    analyze_and_record,
+    analyze_batch_item,
+)
+from schemas.analyze import AnalysisRequest
+from tests.helpers import FakeLLMResponse, make_fake_agent
+
+
+async def read_one_frame(stream: ResumableStream) -> None:
+    frames = stream.frames()
+    await anext(frames)
+    await frames.aclose()
+
+
+def hanging_agent(upstream: dict):
+    """An agent whose interpretation streams one chunk, then stalls."""
+    agent = make_fake_agent()
+    upstream.update(started=asyncio.Event(), closed=False)
+
+    async def astream(_messages):
+        try:
+            yield FakeLLMResponse("partial output ")
+            upstream["started"].set()
+            await asyncio.sleep(10)
+            yield FakeLLMResponse("never")
+        finally:
+            upstream["closed"] = True
+
+    agent.llm_flash.astream = astream
+    return agent
+
+
+def sse_stream(agent, text: str, idle_grace: float) -> ResumableStream:
+    request = AnalysisRequest(text=text, user_language="EN")
+    key = make_cache_key(request.text, request.user_language, request.model)
+    return ResumableStream(
+        analysis_sse_events(agent, request, key, "owner"), idle_grace=idle_grace
+    )
+
+
+@pytest.mark.asyncio
+async def test_abandoned_stream_cancels_upstream_and_counts_waste():
+    upstream: dict = {}
+    agent = hanging_agent(upstream)
+    before = analyses_cancelled.value(model=agent.model, stage="interpret")
+    output_before = cancelled_tokens.value(model=agent.model, direction="output")
+
+    stream = sse_stream(agent, "Bonjour tout le monde", idle_grace=0.01)
+    await read_one_frame(stream)
+    await asyncio.wait_for(upstream["started"].wait(), 1)
+    await asyncio.sleep(0.05)
+
+    assert stream.abandoned and stream.done
+    assert upstream["closed"]
+    assert analyses_cancelled.value(model=agent.model, stage="interpret") == before + 1
+    assert cancelled_tokens.value(model=agent.model, direction="output") > (
+        output_before
+    )
+
+
+@pytest.mark.asyncio
+async def test_reconnect_within_grace_keeps_the_stream():
+    async def events():
+        for index in range(3):
+            await asyncio.sleep(0.02)
+            yield "chunk", {"delta": str(index)}
+
+    stream = ResumableStream(events(), idle_grace=0.05)
+    await read_one_frame(stream)
+    await asyncio.sleep(0.01)
+    frames = [frame async for frame in stream.frames()]
+
+    assert not stream.abandoned
+    assert stream.last_seq == 3
+    assert len(frames) == 4
+
+
+@pytest.mark.asyncio
+async def test_shared_upstream_survives_one_client_leaving():
+    upstream: dict = {}
+    agent = hanging_agent(upstream)
+
+    leaving = sse_stream(agent, "Texte partagé", idle_grace=0.01)
+    staying = sse_stream(agent, "Texte partagé", idle_grace=10)
+    await read_one_frame(leaving)
+    await asyncio.wait_for(upstream["started"].wait(), 1)
+    await asyncio.sleep(0.05)
+
+    assert leaving.abandoned
+    assert not staying.done
+    assert not upstream["closed"]
+    staying.cancel()
+    await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_cache_write_finishes_when_the_client_leaves_during_it():
+    agent = make_fake_agent()
+    request = AnalysisRequest(text="Guten Morgen", user_language="EN")
+    key = make_cache_key(request.text, request.user_language, request.model)
+    writing = asyncio.Event()
+    real_aput = result_cache.aput
+
+    async def slow_aput(*args):
+        writing.set()
+        await asyncio.sleep(0.02)
+        await real_aput(*args)
+
+    async def consume():
+        async for _ in analyze_and_record(agent, request, key, "owner"):
+            pass
+
+    with patch.object(result_cache, "aput", slow_aput):
+        task = asyncio.create_task(consume())
+        await asyncio.wait_for(writing.wait(), 1)
+        task.cancel()
+        await asyncio.sleep(0.05)
+
+    assert task.cancelled()
+    assert result_cache.get(key).result == "Hello world"
+
+
+def paused_agent(resume: asyncio.Event):
+    """An agent whose interpretation streams one chunk, then waits for ``resume``."""
+    agent = make_fake_agent()
+
+    async def astream(_messages):
+        yield FakeLLMResponse("partial output ")
+        await resume.wait()
+        yield FakeLLMResponse("and the rest")
+
+    agent.llm_flash.astream = astream
+    return agent
+
+
+@pytest.mark.asyncio
+async def test_lease_is_held_until_the_upstream_ends_not_the_starting_stream():
+    resume = asyncio.Event()
+    agent = paused_agent(resume)
+    gate = AdmissionController(limits={agent.model: 1}, key_rate=0)
+    request = AnalysisRequest(text="Bonsoir à tous les voisins", user_language="EN")
+    key = make_cache_key(request.text, request.user_language, request.model)
+    lease = await gate.acquire("owner", agent.model)
+
+    starter = analysis_sse_events(agent, request, key, "owner", lease=lease)
+    while (await anext(starter))[0] != "chunk":
+        pass
+    joiner = asyncio.create_task(
+        collect(analysis_sse_events(agent, request, key, "other-owner"))
+    )
+    await asyncio.sleep(0.01)
+    await starter.aclose()
+
+    # The joiner keeps the analysis running, so it keeps the starter's slot.
+    assert gate.stats()["in_flight"] == 1
+    resume.set()
+    events = await asyncio.wait_for(joiner, 1)
+    assert events[-1] == ("done", {"result": "partial output and the rest"})
+    assert gate.stats()["in_flight"] == 0
+
+
+async def collect(events) -> list:
+    return [event async for event in events]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_batch_item_leaves_the_lease_to_the_shared_upstream(
+    monkeypatch,
+):
+    resume = asyncio.Event()
+    agent = paused_agent(resume)
+    gate = AdmissionController(limits={agent.model: 2}, key_rate=0)
+    monkeypatch.setattr("routers.routes.admission", gate)
+    request = AnalysisRequest(text="Bonne nuit à tous les voisins", user_language="EN")
+    detections = DetectionMemo()
+
+    starter = asyncio.create_task(
+        analyze_batch_item(agent, request, detections, "owner")
+    )
+    await asyncio.sleep(0.01)
+    joiner = asyncio.create_task(
+        analyze_batch_item(agent, request, detections, "other-owner")
+    )
+    await asyncio.sleep(0.01)
+    starter.cancel()
+    await asyncio.sleep(0.01)
+
+    # The joiner was never admitted; the starter's slot stays with the upstream.
+    assert gate.stats()["in_flight"] == 1
+    resume.set()
+    assert await asyncio.wait_for(joiner, 1) == "partial output and the rest"
+    assert gate.stats()["in_flight"] == 0
+    detections.close()
@@ -0,0 +1,105 @@
+import pytest
+
+from llm.cleanup import (
+    CleanupStats,
+    clean_ocr_text,
+    cleanup,
+    residual_noise_score,
+)
+from tests.helpers import FakeLLMResponse, make_fake_agent
+
+NOISY = (
+    "The commit­tee met on Tues-\nday to dis­cuss the ofﬁcial report ,, "
+    "which had been\ndelayed by the strike | in the harbour. Members agreed "
+    "that the cafÃ© l0an should be repaid.\n\nA new paragraph."
+)
+
+
+def test_clean_ocr_text_repairs_mechanical_damage():
+    cleaned = clean_ocr_text(NOISY)
+
+    assert cleaned == (
+        "The committee met on Tuesday to discuss the official report, which had "
+        "been delayed by the strike in the harbour. Members agreed that the "
+        "café loan should be repaid.\n\nA new paragraph."
+    )
+
+
+def test_clean_ocr_text_keeps_short_lines_and_clean_text():
+    verse = "Il pleure dans mon cœur\ncomme il pleut sur la ville"
+    assert clean_ocr_text(verse) == verse
+    clean = "Привет, мир! Это обычный текст без ошибок."
+    assert clean_ocr_text(clean) == clean
+
+
+def test_clean_ocr_text_keeps_math_code_and_alphanumeric_tokens():
+    for text in (
+        "If a < b and c > d, then x ^ 2 ~ 5.",
+        "> A quoted line stays quoted.",
+        "Run abc123def on the mp3 files in v1.3 or host1.local/l0g.",
+        "def f(x): { return x_1 }",
+    ):
+        assert clean_ocr_text(text) == text
+    assert clean_ocr_text("the strike ~|^ in the harbour") == (
+        "the strike in the harbour"
+    )
+
+
+def test_residual_noise_flags_split_words():
+    intact = "The committee met on Tuesday to discuss the official report."
+    split = "Th e committee m et on Tu esday t o discuss th e official rep ort."
+
+    assert residual_noise_score(intact) < 0.2
+    assert residual_noise_score(split) > 0.2
+    # Acronyms and initials are words, not fragments.
+    assert residual_noise_score("J. R. Smith joined the UN in 1990.") < 0.2
+
+
+def test_cleanup_decides_against_threshold():
+    result = cleanup(NOISY, threshold=0.2)
+
+    assert not result.needs_llm
+    assert result.noise_before > result.noise_after
+    assert cleanup(NOISY, threshold=0.0).needs_llm
+
+
+def capture_interpreted(agent) -> list[str]:
+    seen = []
+
+    async def astream(messages):
+        seen.append(messages[-1].content)
+        yield FakeLLMResponse("ok")
+
+    agent.llm_flash.astream = astream
+    return seen
+
+
+@pytest.mark.asyncio
+async def test_correct_stage_skips_llm_when_cleanup_suffices():
+    agent = make_fake_agent(needs_correction=True, ocr_residual_threshold=0.2)
+    agent.cleanup_stats = CleanupStats()
+    interpreted = capture_interpreted(agent)
+
+    events = [ev async for ev in agent.analyze_stream(NOISY, "EN")]
+
+    assert "correct" in [e.get("stage") for e in events]
+    agent.llm_lite.ainvoke.assert_not_awaited()
+    assert interpreted == [clean_ocr_text(NOISY)]
+    stats = agent.cleanup_stats.stats()
+    assert (stats["cleaned"], stats["llm_avoided"]) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_correct_stage_calls_llm_on_residual_noise():
+    agent = make_fake_agent(
+        needs_correction=True, corrected_text="fixed", ocr_residual_threshold=0.2
+    )
+    agent.cleanup_stats = CleanupStats()
+    interpreted = capture_interpreted(agent)
+
+    text = "Th e committee m et on Tu esday t o discuss th e official rep ort."
+    [ev async for ev in agent.analyze_stream(text, "EN")]
+
+    agent.llm_lite.ainvoke.assert_awaited_once()
+    assert interpreted == ["fixed"]
+    assert agent.cleanup_stats.stats()["llm_required"] == 1
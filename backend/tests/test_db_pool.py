@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from db.pool import PoolMetrics, instrumented
+
+
+def make_engine(metrics: PoolMetrics):
+    return create_engine(
+        "sqlite://",
+        poolclass=instrumented(QueuePool, metrics),
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.01,
+    )
+
+
+def test_checkouts_in_use_and_overflow_are_reported():
+    metrics = PoolMetrics()
+    engine = make_engine(metrics)
+
+    first, second = engine.connect(), engine.connect()
+    stats = metrics.stats()
+    assert stats["checkouts"] == 2
+    assert stats["in_use"] == 2
+    assert stats["overflow"] == 1
+    assert stats["overflow_events"] == 1
+
+    first.close()
+    second.close()
+    assert metrics.stats()["in_use"] == 0
+
+
+def test_exhausted_pool_records_timeout_and_wait():
+    metrics = PoolMetrics()
+    engine = make_engine(metrics)
+    held = [engine.connect(), engine.connect()]
+
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+
+    stats = metrics.stats()
+    assert stats["timeouts"] == 1
+    assert stats["wait_ms_max"] >= 10
+    for connection in held:
+        connection.close()
+
+
+def test_metrics_survive_engine_dispose():
+    metrics = PoolMetrics()
+    engine = make_engine(metrics)
+    engine.connect().close()
+    engine.dispose()
+    engine.connect().close()
+
+    assert metrics.stats()["checkouts"] == 2
@@ -0,0 +1,67 @@
+import pytest
+
+from llm.detector import detect_language, detect_text, ocr_noise_score
+from tests.helpers import make_fake_agent
+
+
+@pytest.mark.parametrize(
+    ("text", "language"),
+    [
+        (
+            "The committee said that the report would be published by the end of it.",
+            "EN",
+        ),
+        ("Die Regierung hat mitgeteilt, dass die neuen Regeln ab Januar gelten.", "DE"),
+        (
+            "Le gouvernement a annoncé que les mesures seront appliquées dès lundi.",
+            "FR",
+        ),
+        ("El gobierno ha dicho que las medidas se aplicarán desde el lunes.", "ES"),
+        ("Il governo ha detto che le misure saranno applicate da lunedì.", "IT"),
+        ("Правительство сообщило, что новые правила вступят в силу в январе.", "RU"),
+        ("政府は新しい規則が一月から適用されると発表しました。", "JA"),
+        ("政府宣布新的规定将从一月开始实施，有关部门将负责监督执行。", "ZH"),
+        ("أعلنت الحكومة أن القواعد الجديدة ستطبق اعتبارا من يناير المقبل.", "AR"),
+    ],
+)
+def test_detects_supported_languages(text, language):
+    detected, confidence = detect_language(text)
+    assert detected == language
+    assert confidence > 0.5
+
+
+def test_short_ambiguous_text_has_low_confidence():
+    assert detect_text("Bonjour le monde").confidence < 0.5
+
+
+def test_ocr_noise_score_separates_clean_and_damaged_text():
+    clean = "The board approved the plan.\nIt will take effect next year."
+    damaged = (
+        "The bo ard ap-\nproved the pl4n ,, which || will\ntake ef fect next\nyear"
+    )
+
+    assert ocr_noise_score(clean) < 0.1
+    assert ocr_noise_score(damaged) > 0.6
+
+
+@pytest.mark.asyncio
+async def test_confident_local_detection_skips_llm():
+    agent = make_fake_agent(language="FR")
+    text = "The committee said that the report would be published by the end of it."
+
+    events = [ev async for ev in agent.analyze_stream(text, "EN")]
+
+    agent.detector.ainvoke.assert_not_called()
+    assert [e["stage"] for e in events if e["event"] == "stage"] == [
+        "detect",
+        "interpret",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_low_confidence_falls_back_to_llm():
+    agent = make_fake_agent()
+
+    [ev async for ev in agent.analyze_stream("Bonjour", "EN")]
+
+    agent.detector.ainvoke.assert_awaited_once()
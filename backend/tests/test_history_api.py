@@ -0,0 +1,149 @@
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app import app
+from db.history import (
+    decode_cursor,
+    encode_cursor,
+    history_page_query,
+    list_history,
+)
+from llm.registry import hash_api_key
+from routers.routes import get_history_db
+
+OWNER = hash_api_key("test-key")
+
+
+def compile_sql(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def fake_rows(count: int) -> list[SimpleNamespace]:
+    return [
+        SimpleNamespace(
+            id=count - i,
+            preview=f"text {i}",
+            target_language="EN",
+            model="gemini-2.5-flash",
+            timestamp=datetime(2026, 1, 1, 12, 0, count - i),
+        )
+        for i in range(count)
+    ]
+
+
+def test_cursor_round_trips():
+    timestamp = datetime(2026, 3, 4, 5, 6, 7, 891011)
+    assert decode_cursor(encode_cursor(timestamp, 42)) == (timestamp, 42)
+
+
+def test_page_query_uses_keyset_and_skips_result():
+    cursor = encode_cursor(datetime(2026, 1, 1), 7)
+    sql = compile_sql(history_page_query(OWNER, 20, cursor, "hello"))
+
+    assert "history.owner = " in sql
+    assert "(history.timestamp, history.id) <" in sql
+    assert "OFFSET" not in sql
+    assert "history.result" not in sql
+    assert "websearch_to_tsquery" in sql
+    assert "ORDER BY history.timestamp DESC, history.id DESC" in sql
+
+
+def test_list_history_returns_cursor_of_last_item_when_more_rows_exist():
+    session = MagicMock()
+    rows = fake_rows(3)
+    session.execute.return_value.all.return_value = rows
+
+    page = list_history(session, OWNER, limit=2)
+
+    assert [item["id"] for item in page["items"]] == [3, 2]
+    assert decode_cursor(page["next_cursor"]) == (rows[1].timestamp, 2)
+
+
+def test_list_history_last_page_has_no_cursor():
+    session = MagicMock()
+    session.execute.return_value.all.return_value = fake_rows(2)
+
+    assert list_history(session, OWNER, limit=2)["next_cursor"] is None
+
+
+class TestHistoryEndpoints:
+    @pytest.fixture()
+    def session(self):
+        session = MagicMock()
+        session.execute = AsyncMock(return_value=MagicMock(all=lambda: []))
+        session.get = AsyncMock(return_value=None)
+        session.run_sync = AsyncMock()
+        return session
+
+    @pytest.fixture()
+    def client(self, session):
+        app.dependency_overrides[get_history_db] = lambda: session
+        yield TestClient(app, headers={"X-Gemini-Key": "test-key"})
+        app.dependency_overrides.clear()
+
+    def test_invalid_cursor_is_rejected(self, client):
+        response = client.get("/api/history", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+
+    def test_history_is_unavailable_without_database(self, monkeypatch):
+        monkeypatch.delenv("POSTGRES_DB", raising=False)
+        response = TestClient(app).get(
+            "/api/history", headers={"X-Gemini-Key": "test-key"}
+        )
+        assert response.status_code == 503
+
+    @pytest.mark.parametrize("path", ["/api/history", "/api/history/1"])
+    def test_history_requires_a_key(self, client, session, path):
+        response = client.get(path, headers={"X-Gemini-Key": ""})
+
+        assert response.status_code == 401
+        session.execute.assert_not_called()
+        session.get.assert_not_called()
+
+    def test_listing_is_filtered_on_the_callers_key(self, client, session):
+        assert client.get("/api/history").json() == {"items": [], "next_cursor": None}
+
+        [statement] = session.execute.call_args.args
+        assert OWNER in statement.compile().params.values()
+
+    def test_entry_of_another_key_is_not_found(self, client, session):
+        session.get.return_value = SimpleNamespace(owner=hash_api_key("other-key"))
+
+        response = client.get("/api/history/1")
+
+        assert response.status_code == 404
+        session.run_sync.assert_not_called()
+
+    def test_entry_is_returned_to_its_owner(self, client, session):
+        session.get.return_value = SimpleNamespace(
+            owner=OWNER, dictionary_ids={None}, to_dict=lambda: {"id": 1}
+        )
+
+        assert client.get("/api/history/1").json() == {"id": 1}
+
+    def test_delete_is_scoped_to_the_callers_key(self, client, session):
+        session.run_sync.return_value = False
+        assert client.delete("/api/history/1").status_code == 404
+        session.commit = AsyncMock()
+
+        session.run_sync.return_value = True
+        assert client.delete("/api/history/1").status_code == 204
+
+        _, owner, row_id = session.run_sync.call_args.args
+        assert (owner, row_id) == (OWNER, 1)
+        session.commit.assert_awaited_once()
+        assert (
+            client.delete("/api/history/1", headers={"X-Gemini-Key": ""}).status_code
+            == 401
+        )
+
+    def test_storage_report_is_admin_only(self, client, monkeypatch):
+        assert client.get("/api/history/storage").status_code == 404
+
+        monkeypatch.setattr("routers.routes.ADMIN_TOKEN", "secret")
+        assert client.get("/api/history/storage").status_code == 403
@@ -0,0 +1,156 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Table,
+    Text,
+    create_engine,
+    insert,
+    select,
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from db import blobs
+from db.blobs import content_hash, store_blobs
+from db.compression import HistoryCodec, summarize_storage
+from db.history import delete_history, history_page_query
+from db.models import History, HistoryBlob, HistoryDictionary
+
+INTERPRETATIONS = [
+    f"## Overview\n\nThe passage about the {topic} opens with a concession. "
+    f"### Key Vocabulary\n\n**{topic}** is used figuratively; note the register."
+    for topic in ("harbour", "treaty", "harvest", "sonnet", "tribunal", "market")
+] * 20
+
+
+def test_codec_round_trips_with_and_without_a_dictionary():
+    codec = HistoryCodec()
+    text = "Le comité s'est réuni mardi. 委員会は火曜日に開かれた。"
+    plain, plain_id = codec.compress(text)
+
+    codec.add_dictionary(3, codec.train(INTERPRETATIONS, size=4096))
+    trained, trained_id = codec.compress(INTERPRETATIONS[0])
+
+    assert (plain_id, trained_id) == (None, 3)
+    assert codec.decompress(plain, plain_id) == text
+    assert codec.decompress(trained, trained_id) == INTERPRETATIONS[0]
+    assert len(trained) < len(HistoryCodec().compress(INTERPRETATIONS[0])[0])
+    assert codec.plain_blobs == 1
+
+
+def test_summarize_storage_separates_dedup_and_compression():
+    report = summarize_storage(1000, 500, 90, 10)
+
+    assert report["dedup_ratio"] == 2.0
+    assert report["compression_ratio"] == 5.0
+    assert report["total_ratio"] == 10.0
+    assert report["saved_bytes"] == 900
+
+
+def test_store_blobs_compresses_new_texts_once_and_counts_references(monkeypatch):
+    codec = HistoryCodec()
+    codec.loaded = True
+    monkeypatch.setattr(blobs, "history_codec", codec)
+    db = MagicMock()
+    db.scalars.return_value = [content_hash("seen before")]
+
+    texts = ["new text", "seen before", "new text"]
+    hashes = store_blobs(db, texts)
+
+    assert hashes == [content_hash(text) for text in texts]
+    [lookup] = db.scalars.call_args.args
+    # Locked, so a concurrent release cannot delete a blob about to gain a reference.
+    assert "FOR UPDATE" in str(lookup.compile(dialect=postgresql.dialect()))
+    (_, increments), (_, inserted) = [c.args for c in db.execute.call_args_list]
+    assert increments == [{"blob_hash": content_hash("seen before"), "references": 1}]
+    assert [(row["hash"], row["refcount"]) for row in inserted] == [
+        (content_hash("new text"), 2)
+    ]
+    assert codec.decompress(inserted[0]["data"], None) == "new text"
+    assert codec.compressed == 1
+
+
+def test_history_texts_decompress_from_their_blobs():
+    codec = HistoryCodec()
+
+    def blob(text: str) -> HistoryBlob:
+        data, _ = codec.compress(text)
+        return HistoryBlob(hash=content_hash(text), data=data, size=len(text))
+
+    row = History(
+        id=1,
+        prompt_blob=blob("Bonjour"),
+        result_blob=blob("A greeting."),
+        target_language="EN",
+        timestamp=datetime(2026, 1, 1),
+    )
+
+    assert row.to_dict()["prompt"] == "Bonjour"
+    assert row.to_dict()["result"] == "A greeting."
+    assert row.dictionary_ids == {None}
+
+
+def test_page_query_reads_the_stored_preview_only():
+    sql = str(history_page_query("owner", 20).compile(dialect=postgresql.dialect()))
+
+    assert "history.preview" in sql
+    assert "history_blob" not in sql
+
+
+def blob_store() -> Session:
+    """In-memory database with the blob tables and the History columns that
+    reference them."""
+    metadata = MetaData()
+    HistoryDictionary.__table__.to_metadata(metadata)
+    HistoryBlob.__table__.to_metadata(metadata)
+    Table(
+        "history",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("owner", Text),
+        Column("prompt_hash", Text),
+        Column("result_hash", Text),
+    )
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    return Session(engine)
+
+
+def test_deleting_rows_releases_their_blobs_and_drops_unreferenced_ones():
+    db = blob_store()
+    texts = {"prompt": 2, "first result": 1, "second result": 1}
+    db.execute(
+        insert(HistoryBlob),
+        [
+            {"hash": content_hash(t), "data": b"", "size": len(t), "refcount": n}
+            for t, n in texts.items()
+        ],
+    )
+    db.execute(
+        insert(History.__table__),
+        [
+            {
+                "id": i,
+                "owner": "owner",
+                "prompt_hash": content_hash("prompt"),
+                "result_hash": content_hash(result),
+            }
+            for i, result in ((1, "first result"), (2, "second result"))
+        ],
+    )
+
+    def refcounts() -> dict[str, int]:
+        rows = db.execute(select(HistoryBlob.hash, HistoryBlob.refcount))
+        return {blob_hash: refcount for blob_hash, refcount in rows}
+
+    assert not delete_history(db, "someone else", 1)
+    assert delete_history(db, "owner", 1)
+    assert refcounts() == {content_hash("prompt"): 1, content_hash("second result"): 1}
+
+    assert delete_history(db, "owner", 2)
+    assert refcounts() == {}
+    assert not delete_history(db, "owner", 2)
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+
+import pytest
+
+from db.writer import HistoryWriter
+from llm.cache import make_cache_key
+from llm.similarity import near_duplicates
+from routers.routes import analyze_and_record
+from schemas.analyze import AnalysisRequest
+from tests.helpers import make_fake_agent
+
+
+class RecordingSink:
+    def __init__(self, gate: threading.Event | None = None, fail: bool = False):
+        self.batches: list[list[dict]] = []
+        self.gate = gate
+        self.fail = fail
+
+    def __call__(self, rows: list[dict]) -> None:
+        if self.gate is not None:
+            self.gate.wait(timeout=5)
+        if self.fail:
+            raise RuntimeError("database is down")
+        self.batches.append(rows)
+
+
+@pytest.mark.asyncio
+async def test_rows_are_flushed_in_batches_by_size():
+    sink = RecordingSink()
+    writer = HistoryWriter(batch_size=3, flush_interval=5)
+    writer.start(sink)
+
+    for i in range(6):
+        assert await writer.submit({"prompt": str(i)})
+    while writer.written < 6:
+        await asyncio.sleep(0.01)
+    await writer.stop()
+
+    assert [len(batch) for batch in sink.batches] == [3, 3]
+    assert writer.stats()["batches"] == 2
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_is_flushed_after_interval():
+    sink = RecordingSink()
+    writer = HistoryWriter(batch_size=100, flush_interval=0.02)
+    writer.start(sink)
+
+    await writer.submit({"prompt": "a"})
+    await asyncio.sleep(0.1)
+
+    assert sink.batches == [[{"prompt": "a"}]]
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_rows_and_stop_drains_the_rest():
+    gate = threading.Event()
+    sink = RecordingSink(gate)
+    writer = HistoryWriter(max_queue=2, batch_size=1, flush_interval=5)
+    writer.start(sink)
+
+    # The first row is taken by the flusher, which then blocks in the sink.
+    await writer.submit({"prompt": "0"})
+    await asyncio.sleep(0.01)
+    accepted = [await writer.submit({"prompt": str(i)}) for i in range(1, 5)]
+
+    assert accepted == [True, True, False, False]
+    assert writer.stats()["dropped"] == 2
+
+    gate.set()
+    await writer.stop()
+    assert [row["prompt"] for batch in sink.batches for row in batch] == [
+        "0",
+        "1",
+        "2",
+    ]
+    assert not writer.running
+
+
+@pytest.mark.asyncio
+async def test_block_policy_waits_for_room():
+    gate = threading.Event()
+    writer = HistoryWriter(
+        max_queue=1, batch_size=1, flush_interval=5, policy="block", block_timeout=1
+    )
+    writer.start(RecordingSink(gate))
+    await writer.submit({"prompt": "0"})
+    await asyncio.sleep(0.01)
+    await writer.submit({"prompt": "1"})
+
+    blocked = asyncio.create_task(writer.submit({"prompt": "2"}))
+    await asyncio.sleep(0.05)
+    assert not blocked.done()
+
+    gate.set()
+    assert await blocked
+    await writer.stop()
+    assert writer.stats()["written"] == 3
+
+
+@pytest.mark.asyncio
+async def test_sink_failures_are_counted_not_raised():
+    writer = HistoryWriter(batch_size=2, flush_interval=0.01)
+    writer.start(RecordingSink(fail=True))
+    await writer.submit({"prompt": "a"})
+    await writer.stop()
+
+    assert writer.stats()["failed"] == 1
+    assert writer.stats()["written"] == 0
+
+
+@pytest.mark.asyncio
+async def test_finished_analysis_is_submitted_with_timings(monkeypatch):
+    agent = make_fake_agent(chunks=["Result"])
+    writer = HistoryWriter(batch_size=10, flush_interval=5)
+    sink = RecordingSink()
+    writer.start(sink)
+    monkeypatch.setattr("routers.routes.history_writer", writer)
+
+    request = AnalysisRequest(text="Hello world", user_language="en")
+    key = make_cache_key(request.text, request.user_language, request.model)
+    async for _ in analyze_and_record(agent, request, key, "owner-hash"):
+        pass
+    await writer.stop()
+
+    [[row]] = sink.batches
+    assert row["owner"] == "owner-hash"
+    assert row["prompt"] == "Hello world"
+    assert row["result"] == "Result"
+    assert row["target_language"] == "EN"
+    assert row["model"] == request.model
+    assert set(row["stage_timings"]) == {"detect", "interpret"}
+    assert row["cache_key"] == key
+    assert len(row["signature"]) == near_duplicates.signature_size
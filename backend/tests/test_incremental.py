@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+
+from llm.cache import ResultCache, make_cache_key
+from llm.metrics import incremental_sections
+from llm.segmentation import SEGMENT_SEPARATOR, split_sections
+from tests.helpers import FakeLLMResponse, make_fake_agent
+
+PARAGRAPHS = [
+    "Chapitre premier",
+    "Le matin était clair et la ville dormait encore sous la brume du fleuve.",
+    "Marie traversa le pont sans se retourner. Son carnet était serré contre elle.",
+    "Au marché, les marchands installaient déjà leurs étals de fruits et de fleurs.",
+]
+
+
+def test_sections_keep_their_boundaries_when_a_paragraph_changes():
+    text = "\n\n".join(PARAGRAPHS)
+    edited = "\n\n".join([*PARAGRAPHS[:2], "Marie partit.", *PARAGRAPHS[3:]])
+
+    sections = split_sections(text, min_tokens=10, max_tokens=100)
+    edited_sections = split_sections(edited, min_tokens=10, max_tokens=100)
+
+    # The short heading joins the paragraph after it.
+    assert sections[0] == "\n\n".join(PARAGRAPHS[:2])
+    assert len(sections) == 3
+    # A paragraph shortened below the minimum joins its neighbour; the sections
+    # before it are untouched.
+    assert edited_sections[0] == sections[0]
+    assert edited_sections[1] == "Marie partit.\n\n" + PARAGRAPHS[3]
+
+
+def test_incremental_results_have_their_own_cache_key():
+    text = "\n\n".join(PARAGRAPHS)
+
+    assert make_cache_key(text, "EN", "m") != make_cache_key(
+        text, "EN", "m", incremental=True
+    )
+
+
+def incremental_agent():
+    agent = make_fake_agent()
+    agent.incremental_min_section_tokens = 10
+    agent.section_cache = ResultCache()
+    interpreted: list[str] = []
+
+    async def astream(messages):
+        interpreted.append(messages[-1].content)
+        yield FakeLLMResponse(f"<{messages[-1].content[:12]}>")
+
+    agent.llm_flash.astream = astream
+    return agent, interpreted
+
+
+@pytest.mark.asyncio
+async def test_resubmission_reinterprets_only_the_changed_section():
+    agent, interpreted = incremental_agent()
+    text = "\n\n".join(PARAGRAPHS)
+    first = [ev async for ev in agent.analyze_stream(text, "EN", incremental=True)]
+    # Three sections and the synthesis.
+    assert len(interpreted) == 4
+
+    interpreted.clear()
+    reused = incremental_sections.value(model=agent.model, outcome="reused")
+    # Outside the paragraph's first sentence, so the outline is unchanged too.
+    edited = text.replace("Son carnet", "Un livre")
+    events = [ev async for ev in agent.analyze_stream(edited, "EN", incremental=True)]
+
+    assert interpreted == [PARAGRAPHS[2].replace("Son carnet", "Un livre")]
+    stages = [e for e in events if e["event"] == "stage"]
+    assert [(e.get("segment"), e.get("cached", False)) for e in stages] == [
+        (None, False),
+        (1, True),
+        (2, False),
+        (3, True),
+        (None, True),
+    ]
+    assert incremental_sections.value(model=agent.model, outcome="reused") == (
+        reused + 2
+    )
+
+    sections = events[-1]["result"].split(SEGMENT_SEPARATOR)
+    first_sections = first[-1]["result"].split(SEGMENT_SEPARATOR)
+    assert len(sections) == 4
+    assert sections[0] == first_sections[0]
+    assert sections[3] == first_sections[3]
+
+
+@pytest.mark.asyncio
+async def test_unchanged_sections_stream_while_the_changed_one_is_interpreted():
+    agent, _ = incremental_agent()
+    text = "\n\n".join(PARAGRAPHS)
+    first = [ev async for ev in agent.analyze_stream(text, "EN", incremental=True)]
+    cached = SEGMENT_SEPARATOR.join(first[-1]["result"].split(SEGMENT_SEPARATOR)[:2])
+
+    async def stalled(_messages):
+        await asyncio.sleep(10)
+        yield FakeLLMResponse("never")
+
+    agent.llm_flash.astream = stalled
+    edited = text.replace("étals de fruits", "étals de légumes")
+    events = agent.analyze_stream(edited, "EN", incremental=True)
+    streamed = ""
+
+    async def until_cached_sections():
+        nonlocal streamed
+        async for event in events:
+            if event["event"] == "chunk":
+                streamed += event["delta"]
+            if streamed == cached:
+                return
+
+    # The edited third section is still being interpreted.
+    await asyncio.wait_for(until_cached_sections(), 1)
+    await events.aclose()
+
+
+@pytest.mark.asyncio
+async def test_fixing_ocr_in_the_first_paragraph_reinterprets_only_that_section():
+    agent, interpreted = incremental_agent()
+    clean = PARAGRAPHS[1] + " Les rues étaient vides et les quais déserts."
+    noisy = PARAGRAPHS[1] + " Les ru3s ét4ient v1des | et les qu~ais dés3rts."
+    text = "\n\n".join([PARAGRAPHS[0], noisy, *PARAGRAPHS[2:]])
+    [ev async for ev in agent.analyze_stream(text, "EN", incremental=True)]
+    assert "corrected" in interpreted
+    agent.llm_lite.ainvoke.assert_awaited_once()
+
+    interpreted.clear()
+    fixed = text.replace(noisy, clean)
+    events = [ev async for ev in agent.analyze_stream(fixed, "EN", incremental=True)]
+
+    assert interpreted == [f"{PARAGRAPHS[0]}\n\n{clean}"]
+    agent.llm_lite.ainvoke.assert_awaited_once()
+    stages = [e for e in events if e["event"] == "stage"]
+    assert [(e.get("segment"), e.get("cached", False)) for e in stages] == [
+        (None, False),
+        (1, False),
+        (2, True),
+        (3, True),
+        (None, True),
+    ]
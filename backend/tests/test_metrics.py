@@ -0,0 +1,101 @@
+from llm.metrics import MetricsRegistry, stage_duration, time_to_first_chunk
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry("test")
+    histogram = registry.histogram(
+        "latency_seconds", "Latency.", ("model",), buckets=(0.1, 1)
+    )
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, model="m")
+
+    text = registry.render()
+
+    assert 'test_latency_seconds_bucket{model="m",le="0.1"} 2' in text
+    assert 'test_latency_seconds_bucket{model="m",le="1"} 3' in text
+    assert 'test_latency_seconds_bucket{model="m",le="+Inf"} 4' in text
+    assert 'test_latency_seconds_sum{model="m"} 3.65' in text
+    assert 'test_latency_seconds_count{model="m"} 4' in text
+
+
+def test_counters_and_stats_gauges_render():
+    registry = MetricsRegistry("test")
+    registry.counter("errors_total", "Errors.", ("model",)).inc(model='a"b')
+    registry.register_stats(
+        "cache",
+        lambda: {"hits": 3, "ratio": 0.5, "policy": "drop", "pool": {"n": 1}},
+        counters=("hits",),
+    )
+
+    text = registry.render()
+
+    assert 'test_errors_total{model="a\\"b"} 1' in text
+    assert "# TYPE test_cache_hits_total counter\ntest_cache_hits_total 3" in text
+    assert "# TYPE test_cache_ratio gauge" in text
+    assert "test_cache_ratio 0.5" in text
+    assert "test_cache_pool_n 1" in text
+    assert "policy" not in text
+
+
+def test_stats_keys_that_are_data_render_as_labels():
+    registry = MetricsRegistry("test")
+    registry.register_stats(
+        "upstream",
+        lambda: {
+            "breakers": {
+                "gemini-2.5-pro": {"open": 1, "opened": 2},
+                "gemini-2.5-flash": {"open": 0, "opened": 0},
+            },
+            "hedge_delay_ms": {"gemini-2.5-pro": {"detect": 120.5}},
+        },
+        counters=("opened",),
+        labels={"breakers": "model", "hedge_delay_ms": ("model", "call")},
+    )
+
+    text = registry.render()
+
+    assert text.count("# TYPE test_upstream_breakers_opened_total counter") == 1
+    assert (
+        "# TYPE test_upstream_breakers_open gauge\n"
+        'test_upstream_breakers_open{model="gemini-2.5-pro"} 1\n'
+        'test_upstream_breakers_open{model="gemini-2.5-flash"} 0'
+    ) in text
+    assert 'test_upstream_breakers_opened_total{model="gemini-2.5-pro"} 2' in text
+    assert (
+        'test_upstream_hedge_delay_ms{model="gemini-2.5-pro",call="detect"} 120.5'
+        in text
+    )
+    assert "gemini_2_5" not in text
+
+
+def test_metrics_endpoint_reports_stream_latencies(client):
+    before = stage_duration.count(model="gemini-2.5-flash", stage="interpret")
+    ttfc_before = time_to_first_chunk.count(model="gemini-2.5-flash", cached="false")
+
+    client.post(
+        "/api/analyze/stream", json={"text": "Bonjour le monde", "user_language": "EN"}
+    )
+    resp = client.get("/api/metrics")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert "logosai_stage_duration_seconds_bucket" in resp.text
+    assert (
+        stage_duration.count(model="gemini-2.5-flash", stage="interpret") == before + 1
+    )
+    assert (
+        time_to_first_chunk.count(model="gemini-2.5-flash", cached="false")
+        == ttfc_before + 1
+    )
+
+
+def test_metrics_endpoint_declares_each_metric_once(client):
+    client.post(
+        "/api/analyze/stream", json={"text": "Bonjour le monde", "user_language": "EN"}
+    )
+
+    text = client.get("/api/metrics").text
+
+    names = [line.split()[2] for line in text.splitlines() if line.startswith("# TYPE")]
+    assert "logosai_streams_abandoned_total" in names
+    assert sorted(names) == sorted(set(names))
@@ -0,0 +1,205 @@
+import asyncio
+
+import pytest
+
+from llm.cache import CachedResult, make_cache_key, result_cache
+from llm.registry import hash_api_key
+from llm.similarity import (
+    NearDuplicateIndex,
+    analysis_scope,
+    estimate_similarity,
+    minhash_signature,
+    near_duplicates,
+)
+from tests.helpers import parse_sse_events
+
+ARTICLE = (
+    "Le conseil municipal a voté mardi soir le budget de la nouvelle "
+    "médiathèque, après trois heures de débats. L'opposition dénonce un projet "
+    "« trop coûteux » pour une commune de cette taille, tandis que le maire "
+    "défend un équipement attendu depuis dix ans par les habitants du quartier. "
+    "Les travaux doivent commencer au printemps et durer deux ans ; le "
+    "financement repose pour moitié sur une subvention régionale déjà accordée. "
+    "Plusieurs associations ont demandé que les horaires d'ouverture tiennent "
+    "compte des familles et des étudiants, qui réclament des salles de travail."
+)
+# The same article pasted from another site: other quotes, spacing and line
+# breaks, and a footer.
+REPOSTED = (
+    ARTICLE.replace("« trop coûteux »", '"trop coûteux"')
+    .replace("L'opposition", "L’opposition")
+    .replace(". ", ".\n\n")
+    .replace(" ", "  ")
+    + "\n\nPartagez cet article avec vos proches."
+)
+OTHER = (
+    "The harbour authority announced on Monday that the northern pier will "
+    "close for repairs. Fishing crews will move to the southern quay until the "
+    "work ends, which the authority expects before the summer season."
+)
+
+
+OWNER = hash_api_key("test-key")
+
+
+def key(text: str, language: str = "EN") -> str:
+    return make_cache_key(text, language, "gemini-2.5-flash")
+
+
+def test_reformatted_text_keeps_its_signature_and_a_footer_barely_moves_it():
+    reformatted = ARTICLE.replace(" ", "\n").replace("'", "’").upper()
+
+    assert minhash_signature(reformatted) == minhash_signature(ARTICLE)
+    assert (
+        estimate_similarity(minhash_signature(ARTICLE), minhash_signature(REPOSTED))
+        >= 0.8
+    )
+    assert (
+        estimate_similarity(minhash_signature(ARTICLE), minhash_signature(OTHER)) < 0.2
+    )
+    assert minhash_signature("« … »") is None
+
+
+def test_index_matches_within_the_same_scope_above_the_threshold():
+    index = NearDuplicateIndex(threshold=0.8)
+    english = analysis_scope(OWNER, "en", "gemini-2.5-flash")
+    index.add_text(ARTICLE, english, key(ARTICLE))
+    index.add_text(ARTICLE, english, key(ARTICLE))
+    index.add_text(OTHER, english, key(OTHER))
+
+    [match] = index.find_text(REPOSTED, english)
+    assert match.cache_key == key(ARTICLE)
+    assert match.similarity >= 0.8
+    assert (
+        index.find_text(REPOSTED, analysis_scope(OWNER, "FR", "gemini-2.5-flash")) == []
+    )
+    assert (
+        index.find_text(REPOSTED, analysis_scope("other", "en", "gemini-2.5-flash"))
+        == []
+    )
+    assert index.find_text(REPOSTED, english, threshold=1.0) == []
+
+
+def test_merged_runs_are_searched_and_evicted_documents_forgotten():
+    index = NearDuplicateIndex(max_documents=32, merge_min=8)
+    scope = analysis_scope(OWNER, "EN", "m")
+    texts = [f"{OTHER} Report number {i} of the series." for i in range(40)]
+    for text in texts:
+        index.add_text(text, scope, key(text))
+
+    assert len(index) <= 32 and index.evicted >= 8
+    assert index.merges > 0
+    latest = index.find_text(texts[-1], scope, threshold=0.99)
+    assert [m.cache_key for m in latest] == [key(texts[-1])]
+    assert index.find_text(texts[0], scope, threshold=0.99) == []
+
+
+def seed_analysis(text: str, result: str, owner: str = OWNER) -> None:
+    cache_key = key(text)
+    result_cache.put(cache_key, CachedResult(result, "EN", "gemini-2.5-flash"))
+    near_duplicates.add_text(
+        text, analysis_scope(owner, "EN", "gemini-2.5-flash"), cache_key
+    )
+
+
+def test_stream_previews_a_near_duplicate_while_analyzing_afresh(client):
+    seed_analysis(ARTICLE, "Earlier analysis")
+
+    request = {"text": REPOSTED, "near_duplicates": "preview"}
+    resp = client.post("/api/analyze/stream", json=request)
+    events = parse_sse_events(resp.text)
+
+    first = events[0]
+    assert first["event"] == "near_duplicate"
+    assert first["data"]["result"] == "Earlier analysis"
+    assert not first["data"]["reused"]
+    assert events[-1]["data"] == {"result": "Hello world"}
+    # The fresh analysis is indexed in turn.
+    assert near_duplicates.stats()["documents"] == 2
+
+
+def test_near_duplicates_are_only_looked_up_on_request(client):
+    seed_analysis(ARTICLE, "Earlier analysis")
+    queries = near_duplicates.stats()["queries"]
+
+    events = parse_sse_events(
+        client.post("/api/analyze/stream", json={"text": REPOSTED}).text
+    )
+
+    assert "near_duplicate" not in [event["event"] for event in events]
+    assert near_duplicates.stats()["queries"] == queries
+    # The fresh analysis is still indexed for later requests that opt in.
+    assert near_duplicates.stats()["documents"] == 2
+
+
+@pytest.mark.asyncio
+async def test_merges_run_on_the_background_task_once_started():
+    index = NearDuplicateIndex(merge_min=4)
+    scope = analysis_scope(OWNER, "EN", "m")
+    index.start()
+    try:
+        for i in range(4):
+            index.add_text(f"{OTHER} Report {i}.", scope, key(str(i)))
+        # The addition that made the merge due returned without running it.
+        assert index.merges == 0
+
+        async with asyncio.timeout(1):
+            while not index.merges:
+                await asyncio.sleep(0.001)
+        [match] = index.find_text(f"{OTHER} Report 3.", scope, threshold=0.99)
+        assert match.cache_key == key("3")
+    finally:
+        await index.stop()
+
+
+def test_reuse_answers_from_the_near_duplicate_without_analyzing(client, fake_agent):
+    seed_analysis(ARTICLE, "Earlier analysis")
+    request = {"text": REPOSTED, "near_duplicates": "reuse"}
+
+    resp = client.post("/api/analyze", json=request)
+    events = parse_sse_events(client.post("/api/analyze/stream", json=request).text)
+
+    assert resp.json()["result"] == "Earlier analysis"
+    assert float(resp.headers["X-Near-Duplicate-Similarity"]) >= 0.8
+    assert events[0]["data"]["reused"]
+    assert events[-1]["data"] == {"result": "Earlier analysis"}
+    fake_agent.detector.ainvoke.assert_not_called()
+
+
+def test_similar_endpoint_returns_matches_above_the_threshold(client):
+    seed_analysis(ARTICLE, "Earlier analysis")
+
+    matches = client.post("/api/analyze/similar", json={"text": REPOSTED}).json()
+    strict = client.post(
+        "/api/analyze/similar", params={"threshold": 1}, json={"text": REPOSTED}
+    ).json()
+
+    assert [m["result"] for m in matches["matches"]] == ["Earlier analysis"]
+    assert strict == {"matches": []}
+
+
+def test_similar_endpoint_requires_a_key(client):
+    seed_analysis(ARTICLE, "Earlier analysis")
+    queries = near_duplicates.stats()["queries"]
+
+    resp = client.post(
+        "/api/analyze/similar", headers={"X-Gemini-Key": ""}, json={"text": REPOSTED}
+    )
+
+    assert resp.status_code == 401
+    assert near_duplicates.stats()["queries"] == queries
+
+
+def test_analyses_of_another_key_are_never_matched(client):
+    seed_analysis(ARTICLE, "Someone else's analysis", owner=hash_api_key("other"))
+
+    matches = client.post("/api/analyze/similar", json={"text": REPOSTED}).json()
+    events = parse_sse_events(
+        client.post(
+            "/api/analyze/stream", json={"text": REPOSTED, "near_duplicates": "reuse"}
+        ).text
+    )
+
+    assert matches == {"matches": []}
+    assert "near_duplicate" not in [event["event"] for event in events]
+    assert events[-1]["data"] == {"result": "Hello world"}
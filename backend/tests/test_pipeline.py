@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from llm.pipeline import Stage, StageTimeoutError, run_stages
+from tests.helpers import make_fake_agent
+
+
+async def slow_stage(_context):
+    await asyncio.sleep(1)
+
+
+async def chatty_stage(_context):
+    for i in range(3):
+        await asyncio.sleep(0.01)
+        yield {"event": "chunk", "delta": str(i)}
+
+
+@pytest.mark.asyncio
+async def test_stages_are_announced_and_skipped_declaratively():
+    stages = [
+        Stage("detect", chatty_stage),
+        Stage("correct", slow_stage, when=lambda _ctx: False),
+        Stage("interpret", chatty_stage, announce=False),
+    ]
+
+    events = [event async for event in run_stages(stages, context=None)]
+
+    assert [e.get("stage") or e["delta"] for e in events] == [
+        "detect",
+        "0",
+        "1",
+        "2",
+        "0",
+        "1",
+        "2",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stage_timeout_raises_stage_timeout_error():
+    stages = [Stage("correct", slow_stage, timeout=0.01)]
+
+    with pytest.raises(StageTimeoutError, match="'correct' timed out"):
+        async for _ in run_stages(stages, context=None):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_stage_budget_excludes_consumer_time():
+    stages = [Stage("interpret", chatty_stage, timeout=0.1)]
+
+    deltas = []
+    async for event in run_stages(stages, context=None):
+        await asyncio.sleep(0.05)
+        deltas.append(event.get("delta"))
+
+    assert deltas == [None, "0", "1", "2"]
+
+
+@pytest.mark.asyncio
+async def test_analyze_collects_the_streamed_result():
+    agent = make_fake_agent(chunks=["Bonjour", " monde"])
+
+    assert await agent.analyze("Bonjour le monde", "EN") == "Bonjour monde"
+
+
+class TestAnalyzeEndpoint:
+    def test_analyze_returns_result(self, client):
+        resp = client.post("/api/analyze", json={"text": "Bonjour"})
+
+        assert resp.json() == {"result": "Hello world", "success": True, "error": None}
+
+    def test_analyze_reports_failures(self, client, fake_agent):
+        fake_agent.detector.ainvoke.side_effect = RuntimeError("LLM exploded")
+
+        resp = client.post("/api/analyze", json={"text": "Bonjour"})
+
+        assert resp.json()["success"] is False
+        assert "LLM exploded" in resp.json()["error"]
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import app
+from routers import routes
+from routers.profiling import LoopLagMonitor, SamplingProfiler, render_collapsed
+
+
+def blocking_json_encode(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_monitor_records_blocking_interval_with_its_stack():
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.05)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        blocking_json_encode(0.2)
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+
+    report = monitor.report()
+    assert report["blocked"] == 1
+    (block,) = report["blocks"]
+    assert block["seconds"] >= 0.15 and not block["ongoing"]
+    assert "in blocking_json_encode" in block["stack"][-1]
+    assert any("test_monitor_records_blocking" in line for line in block["stack"])
+
+
+@pytest.mark.asyncio
+async def test_monitor_ignores_short_awaits():
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.05)
+    monitor.start()
+    try:
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+    finally:
+        await monitor.stop()
+
+    assert monitor.stats()["blocked"] == 0
+    assert monitor.stats()["beats"] > 0
+    assert not monitor.running
+
+
+def spin_until(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profiler_counts_collapsed_stacks_of_selected_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=spin_until, args=(stop,), name="spinner")
+    worker.start()
+    try:
+        counts = SamplingProfiler().sample(0.1, 0.002, {worker.ident})
+    finally:
+        stop.set()
+        worker.join()
+
+    assert sum(counts.values()) > 10
+    assert all(stack.startswith("spinner;") for stack in counts)
+    lines = render_collapsed(counts).splitlines()
+    stack, _, count = lines[0].rpartition(" ")
+    assert "spin_until (tests/test_profiling.py:" in stack and int(count) > 0
+
+
+def test_profile_endpoint_is_admin_only(monkeypatch):
+    client = TestClient(app)
+    assert client.get("/api/admin/profile").status_code == 404
+
+    monkeypatch.setattr(routes, "ADMIN_TOKEN", "s3cret")
+    headers = {"X-Admin-Token": "wrong"}
+    assert client.get("/api/admin/loop-lag", headers=headers).status_code == 403
+
+    response = client.get(
+        "/api/admin/profile",
+        params={"seconds": 0.05, "threads": "all"},
+        headers={"X-Admin-Token": "s3cret"},
+    )
+    assert response.status_code == 200
+    assert response.text.splitlines()[0].rpartition(" ")[2].isdigit()
@@ -0,0 +1,199 @@
+import asyncio
+import time
+
+import pytest
+
+from llm.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    Resilience,
+    backoff_delay,
+    is_rate_limited,
+    is_transient,
+)
+from tests.helpers import make_fake_agent
+
+
+class Unavailable(Exception):
+    code = 503
+
+
+class RateLimited(Exception):
+    code = 429
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def resilience(**overrides) -> Resilience:
+    options = {"attempts": 3, "hedge_percentile": 0, "backoff": lambda _attempt: 0}
+    options.update(overrides)
+    return Resilience(**options)
+
+
+def flaky(failures: int, result: str = "ok", error: Exception | None = None):
+    calls = []
+
+    async def request():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise error or Unavailable("try again")
+        return result
+
+    return request, calls
+
+
+def test_transient_errors_are_classified():
+    assert is_transient(Unavailable())
+    assert is_transient(ConnectionError())
+    assert not is_transient(ValueError("bad request"))
+    assert not is_transient(CircuitOpenError("m", 1))
+
+
+def test_backoff_is_jittered_and_capped():
+    delays = [backoff_delay(10, base=0.1, cap=2) for _ in range(50)]
+
+    assert all(0 <= delay <= 2 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+@pytest.mark.asyncio
+async def test_transient_failures_are_retried():
+    request, calls = flaky(2)
+
+    assert await resilience().call("m", "detect", request) == "ok"
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_non_transient_failures_are_not_retried():
+    request, calls = flaky(1, error=ValueError("invalid"))
+
+    with pytest.raises(ValueError):
+        await resilience().call("m", "detect", request)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_call_is_hedged_and_the_fast_copy_wins():
+    policy = resilience(hedge_percentile=50, hedge_min_samples=3, hedge_min_delay=0)
+    for _ in range(3):
+        await policy.call("m", "detect", flaky(0)[0], hedge=True)
+    assert policy.hedge_delay("m", "detect") < 0.05
+
+    calls = []
+
+    async def request():
+        calls.append(1)
+        # The first copy stalls; the hedged duplicate answers at once.
+        await asyncio.sleep(10 if len(calls) == 1 else 0)
+        return f"copy-{len(calls)}"
+
+    result = await asyncio.wait_for(
+        policy.call("m", "detect", request, hedge=True), timeout=1
+    )
+
+    assert result == "copy-2"
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_fails_fast_and_recovers_after_probe():
+    clock = FakeClock()
+    policy = resilience(
+        attempts=1,
+        breaker_factory=lambda model: CircuitBreaker(
+            model, failure_threshold=2, reset_seconds=30, clock=clock
+        ),
+    )
+    request, calls = flaky(2)
+    for _ in range(2):
+        with pytest.raises(Unavailable):
+            await policy.call("m", "correct", request)
+
+    with pytest.raises(CircuitOpenError):
+        await policy.call("m", "correct", request)
+    assert len(calls) == 2
+    assert policy.breaker("m").state == "open"
+
+    clock.now = 31
+    assert await policy.call("m", "correct", request) == "ok"
+    assert policy.breaker("m").state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_one_keys_rate_limits_do_not_open_the_circuit_for_others():
+    policy = resilience(
+        attempts=2,
+        breaker_factory=lambda model: CircuitBreaker(model, failure_threshold=2),
+    )
+    key_a, a_calls = flaky(10, error=RateLimited("quota exceeded"))
+    for _ in range(3):
+        with pytest.raises(RateLimited):
+            await policy.call("m", "detect", key_a)
+    key_b, b_calls = flaky(0)
+
+    assert len(a_calls) == 6
+    assert is_rate_limited(RateLimited()) and is_transient(RateLimited())
+    assert policy.breaker("m").state == "closed"
+    assert await policy.call("m", "detect", key_b) == "ok"
+    assert len(b_calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_retries_only_before_first_item():
+    attempts = []
+
+    def request(fail_after: int):
+        async def items():
+            attempts.append(1)
+            for index in range(3):
+                if index == fail_after and len(attempts) == 1:
+                    raise Unavailable("dropped")
+                yield index
+
+        return items
+
+    received = [i async for i in resilience().stream("m", "s", request(0))]
+    assert received == [0, 1, 2]
+    assert len(attempts) == 2
+
+    attempts.clear()
+    received = []
+    with pytest.raises(Unavailable):
+        async for item in resilience().stream("m", "s", request(1)):
+            received.append(item)
+    assert received == [0]
+    assert len(attempts) == 1
+
+
+@pytest.mark.asyncio
+async def test_agent_retries_transient_detection_failure():
+    agent = make_fake_agent()
+    agent.resilience = resilience()
+    agent.local_detect_min_confidence = 2.0
+    agent.detector.ainvoke.side_effect = [
+        Unavailable("overloaded"),
+        agent.detector.ainvoke.return_value,
+    ]
+
+    events = [event async for event in agent.analyze_stream("Bonjour", "EN")]
+
+    assert events[-1]["result"] == "Hello world"
+    assert agent.detector.ainvoke.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_agent_reports_open_circuit():
+    agent = make_fake_agent()
+    agent.resilience = resilience()
+    agent.resilience.breaker(agent.model).opened_at = time.monotonic()
+
+    with pytest.raises(CircuitOpenError):
+        async for _ in agent.analyze_stream("Bonjour le monde", "EN"):
+            pass
@@ -0,0 +1,71 @@
+from unittest.mock import MagicMock
+
+from llm.cache import CachedResult, ResultCache, make_cache_key
+from tests.helpers import parse_sse_events
+
+
+def test_cache_key_ignores_whitespace_noise():
+    a = make_cache_key("Bonjour  le\r\nmonde \n", "en", "gemini-2.5-flash")
+    b = make_cache_key("Bonjour le\nmonde", "EN", "gemini-2.5-flash")
+    c = make_cache_key("Bonjour le\nmonde", "EN", "gemini-2.5-pro")
+
+    assert a == b
+    assert a != c
+
+
+def test_memory_tier_is_bounded_by_characters():
+    cache = ResultCache(max_chars=10)
+    cache.put("a", CachedResult("12345", "EN", "m"))
+    cache.put("b", CachedResult("12345", "EN", "m"))
+    cache.get("a")
+    cache.put("c", CachedResult("12345", "EN", "m"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["chars"] == 10
+
+
+def test_store_hits_are_promoted_to_memory():
+    store = MagicMock()
+    store.get.return_value = CachedResult("stored", "EN", "m")
+    cache = ResultCache(store=store)
+
+    assert cache.get("k").result == "stored"
+    assert cache.get("k").result == "stored"
+    store.get.assert_called_once_with("k")
+    assert cache.stats()["store_hits"] == 1
+
+
+def test_store_failures_do_not_break_requests():
+    store = MagicMock()
+    store.get.side_effect = RuntimeError("db down")
+    store.put.side_effect = RuntimeError("db down")
+    cache = ResultCache(store=store)
+
+    cache.put("k", CachedResult("value", "EN", "m"))
+    assert cache.get("missing") is None
+    assert cache.get("k").result == "value"
+
+
+class TestCachedEndpoints:
+    def test_stream_replays_cached_result_without_llm(self, client, fake_agent):
+        first = client.post(
+            "/api/analyze/stream", json={"text": "Bonjour", "user_language": "EN"}
+        )
+        fake_agent.analyze_stream = MagicMock(side_effect=AssertionError("no LLM"))
+        second = client.post(
+            "/api/analyze/stream", json={"text": " Bonjour ", "user_language": "en"}
+        )
+
+        assert parse_sse_events(first.text)[-1] == parse_sse_events(second.text)[-1]
+        events = parse_sse_events(second.text)
+        assert [e["event"] for e in events] == ["stage", "chunk", "done"]
+        assert events[1]["data"]["delta"] == "Hello world"
+
+    def test_analyze_answers_hits_from_cache(self, client, fake_agent):
+        client.post("/api/analyze/stream", json={"text": "Hallo"})
+        fake_agent.analyze_stream = MagicMock(side_effect=AssertionError("no LLM"))
+
+        resp = client.post("/api/analyze", json={"text": "Hallo"})
+
+        assert resp.json() == {"result": "Hello world", "success": True, "error": None}
@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+
+from routers.resumable import (
+    ResumableStream,
+    StreamCapacityError,
+    StreamRegistry,
+    parse_event_id,
+)
+from tests.helpers import parse_sse_events
+
+
+async def numbered_events(count: int, delay: float = 0.0):
+    for i in range(count):
+        await asyncio.sleep(delay)
+        yield "chunk", {"delta": str(i)}
+
+
+def frame_ids(frames: list[str]) -> list[int]:
+    ids = []
+    for frame in frames:
+        for line in frame.splitlines():
+            if line.startswith("id: "):
+                ids.append(parse_event_id(line[4:])[1])
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_frames_have_increasing_ids_and_resume_after_last_event():
+    stream = ResumableStream(numbered_events(5))
+
+    full = [frame async for frame in stream.frames()]
+    resumed = [frame async for frame in stream.frames(after_seq=3)]
+
+    assert frame_ids(full) == [1, 2, 3, 4, 5]
+    assert frame_ids(resumed) == [4, 5]
+
+
+@pytest.mark.asyncio
+async def test_upstream_keeps_running_without_a_reader():
+    stream = ResumableStream(numbered_events(5, delay=0.001))
+
+    async for _ in stream.frames():
+        break
+    await asyncio.sleep(0.05)
+
+    assert stream.done
+    assert stream.last_seq == 5
+
+
+@pytest.mark.asyncio
+async def test_replay_buffer_is_bounded_in_bytes():
+    stream = ResumableStream(numbered_events(50), max_bytes=500)
+    await asyncio.sleep(0.01)
+
+    assert stream.first_available_seq > 1
+    assert not stream.can_resume(0)
+    assert stream.can_resume(stream.last_seq)
+
+
+@pytest.mark.asyncio
+async def test_finished_streams_expire_after_ttl():
+    now = [0.0]
+    registry = StreamRegistry(ttl_seconds=10, clock=lambda: now[0])
+    stream = registry.create(numbered_events(1))
+    await asyncio.sleep(0.01)
+
+    now[0] = 9
+    assert registry.get(stream.token) is stream
+    now[0] = 11
+    assert registry.get(stream.token) is None
+
+
+@pytest.mark.asyncio
+async def test_full_registry_refuses_new_streams_instead_of_cancelling_live_ones():
+    registry = StreamRegistry(max_streams=2)
+    live = [registry.create(numbered_events(1000, delay=0.01)) for _ in range(2)]
+
+    with pytest.raises(StreamCapacityError):
+        registry.create(numbered_events(1))
+    await asyncio.sleep(0.02)
+
+    assert not any(stream.done for stream in live)
+    assert registry.stats()["rejected"] == 1
+    for stream in live:
+        stream.cancel()
+
+
+@pytest.mark.asyncio
+async def test_finished_streams_make_room_first():
+    registry = StreamRegistry(max_streams=2)
+    finished = registry.create(numbered_events(1))
+    live = registry.create(numbered_events(1000, delay=0.01))
+    await asyncio.sleep(0.005)
+
+    newest = registry.create(numbered_events(1))
+
+    assert registry.get(finished.token) is None
+    assert registry.get(live.token) is live and not live.done
+    assert registry.get(newest.token) is newest
+    live.cancel()
+
+
+@pytest.mark.asyncio
+async def test_replay_bytes_are_bounded_across_streams():
+    registry = StreamRegistry(max_bytes=3000)
+    finished = registry.create(numbered_events(20))
+    await asyncio.sleep(0.01)
+    live = registry.create(numbered_events(100, delay=0.0005))
+    while not live.done:
+        await asyncio.sleep(0.005)
+        assert registry.stats()["bytes"] <= 3000
+
+    # The finished stream was dropped first, then the live one trimmed its own
+    # buffer rather than being cancelled.
+    assert registry.get(finished.token) is None
+    assert live.last_seq == 100 and not live.abandoned
+    assert live.first_available_seq > 1
+    assert registry.stats()["bytes"] == live.buffered_bytes
+
+
+class TestResumeEndpoints:
+    def test_stream_events_carry_ids_and_token_header(self, client):
+        resp = client.post("/api/analyze/stream", json={"text": "Bonjour"})
+
+        token = resp.headers["x-stream-token"]
+        assert f"id: {token}:1\n" in resp.text
+
+    def test_reconnect_with_last_event_id_resumes(self, client, fake_agent):
+        first = client.post("/api/analyze/stream", json={"text": "Bonjour"})
+        token = first.headers["x-stream-token"]
+
+        fake_agent.analyze_stream = None  # a resume must not start a new analysis
+        resumed = client.post(
+            "/api/analyze/stream",
+            json={"text": "Bonjour"},
+            headers={"Last-Event-ID": f"{token}:2"},
+        )
+        via_get = client.get(
+            f"/api/analyze/stream/{token}", headers={"Last-Event-ID": f"{token}:2"}
+        )
+
+        expected = parse_sse_events(first.text)[2:]
+        assert parse_sse_events(resumed.text) == expected
+        assert parse_sse_events(via_get.text) == expected
+
+    def test_unknown_stream_returns_410(self, client):
+        resp = client.get("/api/analyze/stream/unknown")
+
+        assert resp.status_code == 410
+
+    def test_full_registry_answers_503(self, client, monkeypatch):
+        monkeypatch.setattr(
+            "routers.routes.stream_registry", StreamRegistry(max_streams=0)
+        )
+
+        resp = client.post("/api/analyze/stream", json={"text": "Bonjour"})
+
+        assert resp.status_code == 503
+        assert "Retry-After" in resp.headers
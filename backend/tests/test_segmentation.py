@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from llm.segmentation import (
+    SEGMENT_SEPARATOR,
+    estimate_tokens,
+    split_segments,
+    stream_in_order,
+)
+from tests.helpers import FakeLLMResponse, make_fake_agent
+
+
+def test_segments_are_paragraph_aligned_and_within_budget():
+    paragraphs = [f"Paragraph {i}. " + "word " * 40 for i in range(10)]
+    text = "\n\n".join(paragraphs)
+
+    segments = split_segments(text, max_tokens=120)
+
+    assert len(segments) > 1
+    assert all(estimate_tokens(segment) <= 120 for segment in segments)
+    assert "\n\n".join(segments) == "\n\n".join(p.strip() for p in paragraphs)
+
+
+def test_oversized_paragraph_is_split_on_sentences():
+    paragraph = " ".join(f"Sentence number {i} is here." for i in range(50))
+
+    segments = split_segments(paragraph, max_tokens=40)
+
+    assert len(segments) > 1
+    assert all(segment.endswith(".") for segment in segments)
+
+
+@pytest.mark.asyncio
+async def test_stream_in_order_preserves_order_with_bounded_parallelism():
+    running = 0
+    peak = 0
+
+    def producer(index: int, delay: float):
+        async def produce():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(delay)
+            yield f"{index}a"
+            yield f"{index}b"
+            running -= 1
+
+        return produce
+
+    producers = [producer(0, 0.03), producer(1, 0.0), producer(2, 0.01)]
+    output = [item async for item in stream_in_order(producers, concurrency=2)]
+
+    assert output == [(0, "0a"), (0, "0b"), (1, "1a"), (1, "1b"), (2, "2a"), (2, "2b")]
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_long_text_mode_streams_segments_then_synthesis():
+    agent = make_fake_agent()
+    agent.long_text_min_tokens = 50
+    agent.long_text_segment_tokens = 60
+
+    async def echo_astream(messages):
+        system, human = messages
+        label = "synthesis" if "You are concluding" in system.content else human.content
+        yield FakeLLMResponse(label[:12])
+
+    agent.llm_flash.astream = echo_astream
+    text = "\n\n".join(f"Part {i} " + "lorem " * 30 for i in range(3))
+
+    events = [ev async for ev in agent.analyze_stream(text, "EN")]
+
+    segment_stages = [
+        (e["stage"], e.get("segment")) for e in events if e["event"] == "stage"
+    ]
+    assert segment_stages == [
+        ("detect", None),
+        ("interpret", 1),
+        ("interpret", 2),
+        ("interpret", 3),
+        ("synthesize", None),
+    ]
+    done = events[-1]["result"]
+    assert done.split(SEGMENT_SEPARATOR) == [
+        "Part 0 lorem",
+        "Part 1 lorem",
+        "Part 2 lorem",
+        "synthesis",
+    ]
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from llm.detector import detect_text
+from llm.speculation import SPECULATE_NOISY, SpeculationStats, should_speculate
+from tests.helpers import FakeLLMResponse, make_fake_agent
+
+
+def make_speculating_agent(**kwargs):
+    agent = make_fake_agent(**kwargs)
+    agent.speculation_policy = "always"
+    agent.speculation_stats = SpeculationStats()
+    return agent
+
+
+@pytest.mark.asyncio
+async def test_speculative_correction_is_used_when_needed():
+    agent = make_speculating_agent(needs_correction=True, corrected_text="fixed")
+
+    events = [ev async for ev in agent.analyze_stream("txte", "EN")]
+
+    assert [e["stage"] for e in events if e["event"] == "stage"] == [
+        "detect",
+        "correct",
+        "interpret",
+    ]
+    agent.llm_lite.ainvoke.assert_awaited_once()
+    stats = agent.speculation_stats.stats()
+    assert (stats["launched"], stats["used"], stats["wasted"]) == (1, 1, 0)
+
+
+@pytest.mark.asyncio
+async def test_speculative_correction_is_cancelled_when_not_needed():
+    agent = make_speculating_agent(needs_correction=False)
+    started = asyncio.Event()
+
+    async def slow_correction(_messages):
+        started.set()
+        await asyncio.sleep(10)
+        return FakeLLMResponse("never")
+
+    async def slow_detection(_messages):
+        await started.wait()
+        return agent.detector.ainvoke.return_value
+
+    agent.llm_lite.ainvoke.side_effect = slow_correction
+    agent.detector.ainvoke.side_effect = slow_detection
+
+    events = [ev async for ev in agent.analyze_stream("txte", "EN")]
+
+    assert "correct" not in [e.get("stage") for e in events]
+    stats = agent.speculation_stats.stats()
+    assert (stats["launched"], stats["used"], stats["wasted"]) == (1, 0, 1)
+
+
+def test_noisy_policy_only_fires_on_noisy_text():
+    clean = detect_text("A clean sentence.")
+    noisy = detect_text("bro-\nken || l1ne ,, wi th\nstray ¦ symbols")
+
+    assert not should_speculate(SPECULATE_NOISY, clean)
+    assert should_speculate(SPECULATE_NOISY, noisy)
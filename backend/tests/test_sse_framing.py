@@ -0,0 +1,154 @@
+import asyncio
+import zlib
+
+import pytest
+
+from routers.sse import accepts_gzip, coalesce_chunks, gzip_frames
+from tests.helpers import parse_sse_events
+
+
+async def timed_events(script):
+    """Yield events from ``(delay_before, event)`` pairs."""
+    for delay, event in script:
+        await asyncio.sleep(delay)
+        yield event
+
+
+def chunk(delta: str) -> dict:
+    return {"event": "chunk", "delta": delta}
+
+
+async def collect(events) -> list[dict]:
+    return [event async for event in events]
+
+
+@pytest.mark.asyncio
+async def test_first_chunk_passes_through_and_burst_is_merged():
+    script = [(0, chunk("a")), (0, chunk("b")), (0, chunk("c")), (0, chunk("d"))]
+
+    events = await collect(coalesce_chunks(timed_events(script), window=0.05))
+
+    assert [e["delta"] for e in events] == ["a", "bcd"]
+
+
+@pytest.mark.asyncio
+async def test_pending_text_is_flushed_when_upstream_goes_quiet():
+    script = [(0, chunk("a")), (0, chunk("b")), (0.3, chunk("c"))]
+    loop = asyncio.get_running_loop()
+    arrivals = []
+
+    async for event in coalesce_chunks(timed_events(script), window=0.02):
+        arrivals.append((event["delta"], loop.time()))
+
+    assert [delta for delta, _ in arrivals] == ["a", "b", "c"]
+    # "b" went out when its window expired, not when "c" finally arrived.
+    assert arrivals[2][1] - arrivals[1][1] > 0.2
+
+
+@pytest.mark.asyncio
+async def test_byte_budget_and_other_events_flush_early():
+    script = [
+        (0, chunk("x")),
+        (0, chunk("12345")),
+        (0, chunk("67890")),
+        (0, chunk("y")),
+        (0, {"event": "stage", "stage": "synthesize"}),
+        (0, chunk("z")),
+    ]
+
+    events = await collect(
+        coalesce_chunks(timed_events(script), window=10, max_bytes=10)
+    )
+
+    assert events == [
+        chunk("x"),
+        chunk("1234567890"),
+        chunk("y"),
+        {"event": "stage", "stage": "synthesize"},
+        chunk("z"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_upstream_error_is_raised_after_pending_text():
+    async def failing():
+        yield chunk("a")
+        yield chunk("b")
+        raise RuntimeError("boom")
+
+    seen = []
+    with pytest.raises(RuntimeError, match="boom"):
+        async for event in coalesce_chunks(failing(), window=10):
+            seen.append(event["delta"])
+    assert seen == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_gzip_frames_are_decodable_one_at_a_time():
+    async def frames():
+        for i in range(3):
+            yield f'event: chunk\ndata: {{"delta": "{i}"}}\n\n'
+
+    decoder = zlib.decompressobj(31)
+    decoded = [
+        decoder.decompress(piece).decode() async for piece in gzip_frames(frames())
+    ]
+
+    assert decoded[:3] == [
+        f'event: chunk\ndata: {{"delta": "{i}"}}\n\n' for i in range(3)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_closing_gzip_frames_closes_the_source_at_once():
+    closed = []
+
+    async def frames():
+        try:
+            while True:
+                yield "event: chunk\ndata: {}\n\n"
+        finally:
+            closed.append(True)
+
+    compressed = gzip_frames(frames())
+    await anext(compressed)
+    await compressed.aclose()
+
+    assert closed == [True]
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        ("gzip, deflate, br", True),
+        ("br;q=1.0, gzip;q=0.5", True),
+        ("gzip;q=0", False),
+        ("identity", False),
+        (None, False),
+    ],
+)
+def test_accepts_gzip(header, expected):
+    assert accepts_gzip(header) is expected
+
+
+class TestCompressedStream:
+    def test_stream_is_gzipped_when_client_accepts_it(self, client):
+        resp = client.post(
+            "/api/analyze/stream",
+            json={"text": "Bonjour le monde", "user_language": "EN"},
+            headers={"Accept-Encoding": "gzip"},
+        )
+
+        assert resp.headers["content-encoding"] == "gzip"
+        events = parse_sse_events(resp.text)
+        assert events[-1]["data"]["result"] == "Hello world"
+
+    def test_stream_is_plain_without_gzip(self, client):
+        resp = client.post(
+            "/api/analyze/stream",
+            json={"text": "Bonjour le monde", "user_language": "EN"},
+            headers={"Accept-Encoding": "identity"},
+        )
+
+        assert "content-encoding" not in resp.headers
+        assert parse_sse_events(resp.text)[-1]["event"] == "done"
@@ -0,0 +1,105 @@
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from routers.encoding import preferred_encoding
+from routers.static import AssetIndex
+
+INDEX_HTML = b"<!doctype html><div id=root></div>"
+APP_JS = b"console.log('logosai');" * 20
+
+
+@pytest.fixture()
+def dist(tmp_path):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_bytes(INDEX_HTML)
+    (tmp_path / "assets" / "app.js").write_bytes(APP_JS)
+    (tmp_path / "assets" / "app.js.gz").write_bytes(gzip.compress(APP_JS))
+    (tmp_path / "assets" / "app.js.br").write_bytes(b"brotli-bytes")
+    return tmp_path
+
+
+@pytest.fixture()
+def static_client(dist, monkeypatch):
+    monkeypatch.setattr(app_module, "frontend_assets", AssetIndex.scan(dist))
+    return TestClient(app_module.app)
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        ("gzip, deflate, br", "br"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("gzip;q=0, br;q=0", None),
+        ("*", "br"),
+        ("identity", None),
+        (None, None),
+    ],
+)
+def test_preferred_encoding(header, expected):
+    assert preferred_encoding(header, ("br", "gzip")) == expected
+
+
+def test_scan_indexes_files_and_attaches_variants(dist):
+    index = AssetIndex.scan(dist)
+
+    assert set(index.assets) == {"index.html", "assets/app.js"}
+    assert set(index.get("/assets/app.js").encoded) == {"br", "gzip"}
+    assert index.get("../secret.txt") is None
+
+
+def test_scan_of_missing_directory_is_empty(tmp_path):
+    index = AssetIndex.scan(tmp_path / "missing")
+
+    assert index.index_html is None
+    assert not index.assets
+
+
+class TestFrontendServing:
+    def test_precompressed_variant_follows_accept_encoding(self, static_client):
+        resp = static_client.get("/assets/app.js", headers={"Accept-Encoding": "gzip"})
+
+        assert resp.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in resp.headers["vary"]
+        assert resp.content == APP_JS
+        assert "immutable" in resp.headers["cache-control"]
+
+    def test_identity_is_served_without_compression(self, static_client):
+        resp = static_client.get(
+            "/assets/app.js", headers={"Accept-Encoding": "identity"}
+        )
+
+        assert "content-encoding" not in resp.headers
+        assert resp.content == APP_JS
+
+    def test_etag_differs_per_encoding(self, static_client):
+        plain = static_client.get(
+            "/assets/app.js", headers={"Accept-Encoding": "identity"}
+        )
+        gzipped = static_client.get(
+            "/assets/app.js", headers={"Accept-Encoding": "gzip"}
+        )
+
+        assert plain.headers["etag"] != gzipped.headers["etag"]
+        assert not plain.headers["etag"].startswith("W/")
+
+    def test_matching_etag_returns_304(self, static_client):
+        etag = static_client.get("/").headers["etag"]
+
+        resp = static_client.get("/", headers={"If-None-Match": f'"other", {etag}'})
+
+        assert resp.status_code == 304
+        assert resp.content == b""
+        assert resp.headers["etag"] == etag
+
+    def test_index_is_served_for_client_routes(self, static_client):
+        resp = static_client.get("/history/42")
+
+        assert resp.status_code == 200
+        assert resp.content == INDEX_HTML
+        assert resp.headers["cache-control"] == "no-cache"
+
+    def test_missing_asset_is_404(self, static_client):
+        assert static_client.get("/assets/missing.js").status_code == 404
@@ -0,0 +1,109 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import app
+from routers.warmup import WarmUp
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_importing_the_app_defers_llm_and_db_stacks():
+    probe = (
+        "import sys, app; "
+        "print(sorted(m for m in ('llm.agent', 'langchain_google_genai', "
+        "'sqlalchemy', 'db.session') if m in sys.modules))"
+    )
+    loaded = subprocess.run(
+        [sys.executable, "-c", probe],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip()
+
+    assert loaded == "[]"
+
+
+def test_settings_read_at_import_come_from_dotenv(tmp_path):
+    # Run without a script, load_dotenv() looks for .env from the working
+    # directory up.
+    (tmp_path / ".env").write_text("ADMIN_TOKEN=from-dotenv\n")
+    env = {k: v for k, v in os.environ.items() if k != "ADMIN_TOKEN"}
+    env["PYTHONPATH"] = str(BACKEND_DIR)
+    token = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import app; from routers.routes import ADMIN_TOKEN; print(ADMIN_TOKEN)",
+        ],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip()
+
+    assert token == "from-dotenv"
+
+
+@pytest.mark.asyncio
+async def test_components_report_warm_and_failed_steps():
+    warmup = WarmUp()
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+
+    async def broken():
+        raise RuntimeError("no database")
+
+    warmup.start("llm", slow)
+    warmup.start("db", broken)
+    await warmup.settled("db")
+
+    stats = warmup.stats()
+    assert not warmup.ready
+    assert stats["components"]["llm"]["state"] == "warming"
+    assert stats["components"]["db"]["state"] == "failed"
+    assert stats["components"]["db"]["error"] == "no database"
+    assert not await asyncio.to_thread(warmup.wait, "db", 1)
+
+    release.set()
+    await warmup.settled("llm")
+    assert warmup.stats()["components"]["llm"]["warm"] == 1
+    assert await asyncio.to_thread(warmup.wait, "llm", 1)
+
+
+@pytest.mark.asyncio
+async def test_stop_cancels_steps_and_releases_waiters():
+    warmup = WarmUp()
+    warmup.start("db", lambda: asyncio.sleep(10))
+    waiter = asyncio.create_task(asyncio.to_thread(warmup.wait, "db", 5))
+
+    await warmup.stop()
+
+    assert await asyncio.wait_for(waiter, 1) is False
+    assert warmup.stats()["components"]["db"]["state"] == "cancelled"
+
+
+def test_ready_endpoint_reports_warm_state():
+    with TestClient(app) as client:
+        deadline = time.monotonic() + 10
+        resp = client.get("/api/ready")
+        while resp.status_code == 503 and time.monotonic() < deadline:
+            time.sleep(0.05)
+            resp = client.get("/api/ready")
+
+        assert resp.status_code == 200
+        assert resp.json()["components"]["llm"]["state"] == "warm"
+        assert (
+            'logosai_warmup_components_warm{component="llm"} 1'
+            in client.get("/api/metrics").text
+        )
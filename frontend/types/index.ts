@@ -1,6 +1,6 @@
 export type AnalysisModel = 'gemini-2.5-flash' | 'gemini-2.5-pro';
 
-export type AnalysisStreamStage = 'detect' | 'correct' | 'interpret';
+export type AnalysisStreamStage = 'detect' | 'correct' | 'interpret' | 'synthesize';
 
 export interface HistoryItem {
   id: number;